@@ -0,0 +1,239 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# /api/v1 mirrors the HTML views and is built on the same query builders.
+#   fields=a,b,c   select only these columns (id is always included)
+#   include=shows  sideload every row's shows with one extra query
+#   genre=X        only rows with genre X (repeatable); facets=genres adds
+#                  per-genre counts over the filtered rows
+# Responses carry a content ETag (If-None-Match answers 304) and are
+# gzipped when the client accepts it.
+#----------------------------------------------------------------------------#
+import gzip
+import hashlib
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request
+
+from models import Venue, Artist, Show
+from queries import venue_areas, entity_rows, shows_by_owner, upcoming_shows_page
+import bookings
+import facets
+import geo
+import search
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_FIELDS = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+                'facebook_link', 'seeking_talent', 'seeking_description', 'image_link',
+                'latitude', 'longitude')
+ARTIST_FIELDS = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+                 'facebook_link', 'seeking_venue', 'seeking_description', 'image_link')
+MAX_LIMIT = 100
+MAX_SLOT_RANGE = timedelta(days=90)
+GZIP_MIN_BYTES = 500
+
+
+class BadRequest(Exception):
+    pass
+
+
+@api.errorhandler(BadRequest)
+def bad_request(error):
+    return jsonify({'error': str(error)}), 400
+
+
+def _not_found():
+    return jsonify({'error': 'not found'}), 404
+
+
+def _fields(allowed):
+    requested = request.args.get('fields')
+    if not requested:
+        return allowed
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadRequest('unknown fields: ' + ', '.join(unknown))
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return tuple(fields)
+
+
+def _includes():
+    includes = set(filter(None, request.args.get('include', '').split(',')))
+    if includes - {'shows'}:
+        raise BadRequest('only include=shows is supported')
+    return includes
+
+
+def _genres():
+    try:
+        return facets.parse_genres(request.args.getlist('genre'))
+    except ValueError as error:
+        raise BadRequest(str(error))
+
+
+def _with_facets(body, model, conditions):
+    requested = request.args.get('facets')
+    if requested and requested != 'genres':
+        raise BadRequest('only facets=genres is supported')
+    if requested:
+        body['facets'] = facets.genre_facets(model, conditions)
+    return jsonify(body)
+
+
+def _limit():
+    limit = request.args.get('limit', 30, type=int)
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _offset():
+    return max(0, request.args.get('offset', 0, type=int))
+
+
+def _datetime_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise BadRequest('%s must be an ISO 8601 datetime' % name)
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return dict((key, _serialize(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_serialize(item) for item in value]
+    return value
+
+
+def _entities(model, allowed, owner_column, other, prefix, ids=None, conditions=()):
+    rows = entity_rows(model, _fields(allowed), ids=ids,
+                       limit=None if ids else _limit(),
+                       offset=_offset(),
+                       conditions=conditions)
+    if 'shows' in _includes():
+        shows = shows_by_owner(owner_column, other, prefix, [row['id'] for row in rows])
+        for row in rows:
+            row['shows'] = shows.get(row['id'], [])
+    return rows
+
+
+def _listing(model, allowed, owner_column, other, prefix):
+    conditions = facets.conditions(model, _genres())
+    return _with_facets({'data': _serialize(_entities(
+        model, allowed, owner_column, other, prefix, conditions=conditions))}, model, conditions)
+
+
+#  Routes
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+def venues():
+    return _listing(Venue, VENUE_FIELDS, Show.venue_id, Artist, 'artist')
+
+
+@api.route('/venues/areas')
+def venue_area_list():
+    conditions = facets.conditions(Venue, _genres())
+    return _with_facets({'data': venue_areas(conditions)}, Venue, conditions)
+
+
+@api.route('/venues/nearby')
+def nearby_venues():
+    try:
+        lat, lon, radius = geo.nearby_args(request.args, current_app.config['NEARBY_RADIUS_KM'],
+                                           current_app.config['NEARBY_MAX_RADIUS_KM'])
+    except ValueError:
+        raise BadRequest('lat and lon are required degrees; radius is in km')
+    return jsonify(geo.nearby_venues(lat, lon, radius, current_app.config['SEARCH_RESULT_LIMIT']))
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    rows = _entities(Venue, VENUE_FIELDS, Show.venue_id, Artist, 'artist', ids=[venue_id])
+    if not rows:
+        return _not_found()
+    return jsonify({'data': _serialize(rows[0])})
+
+
+@api.route('/venues/<int:venue_id>/slots')
+def venue_slots(venue_id):
+    # ?from=...&to=... (ISO 8601, default the next seven days) and an
+    # optional min_minutes; ranges are capped at MAX_SLOT_RANGE.
+    start = _datetime_arg('from', datetime.utcnow().replace(second=0, microsecond=0))
+    end = _datetime_arg('to', start + timedelta(days=7))
+    if end <= start:
+        raise BadRequest('to must be after from')
+    if end - start > MAX_SLOT_RANGE:
+        raise BadRequest('at most %d days per request' % MAX_SLOT_RANGE.days)
+    min_minutes = request.args.get('min_minutes', 0, type=int)
+    if not entity_rows(Venue, ('id',), ids=[venue_id], limit=None):
+        return _not_found()
+    slots = bookings.available_slots(venue_id, start, end, timedelta(minutes=max(min_minutes, 0)))
+    return jsonify({'data': [{'start': _serialize(slot_start), 'end': _serialize(slot_end)}
+                             for slot_start, slot_end in slots]})
+
+
+@api.route('/artists')
+def artists():
+    return _listing(Artist, ARTIST_FIELDS, Show.artist_id, Venue, 'venue')
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    rows = _entities(Artist, ARTIST_FIELDS, Show.artist_id, Venue, 'venue', ids=[artist_id])
+    if not rows:
+        return _not_found()
+    return jsonify({'data': _serialize(rows[0])})
+
+
+@api.route('/shows')
+def shows():
+    data, next_cursor = upcoming_shows_page(_limit(), after=request.args.get('after'))
+    return jsonify({'data': _serialize(data), 'next_cursor': next_cursor})
+
+
+@api.route('/search/venues')
+def search_venues():
+    return jsonify(search.search_venues(
+        request.args.get('q', ''), current_app.config['SEARCH_RESULT_LIMIT'], _genres()))
+
+
+@api.route('/search/artists')
+def search_artists():
+    return jsonify(search.search_artists(
+        request.args.get('q', ''), current_app.config['SEARCH_RESULT_LIMIT'], _genres()))
+
+
+#  Conditional GET and compression
+#  ----------------------------------------------------------------
+
+@api.after_request
+def finalize(response):
+    if request.method != 'GET' or response.status_code != 200 or response.direct_passthrough:
+        return response
+
+    body = response.get_data()
+    compress = ('gzip' in request.headers.get('Accept-Encoding', '')
+                and len(body) >= GZIP_MIN_BYTES)
+    # The gzipped representation is a different entity, so it gets its own tag.
+    etag = hashlib.sha1(body).hexdigest() + ('-gzip' if compress else '')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+
+    if request.if_none_match.contains(etag):
+        response.status_code = 304
+        response.set_data(b'')
+        return response
+
+    if compress:
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,202 @@
+#----------------------------------------------------------------------------#
+# Artist views.
+#----------------------------------------------------------------------------#
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from sqlalchemy import select
+
+from models import Artist, Show, VenueMatch, db
+from queries import artist_detail, entity_rows
+import deletes
+import edits
+import facets
+import matchmaking
+import search
+import cache
+import tasks
+
+blueprint = Blueprint('artists', __name__)
+
+@blueprint.route('/artists')
+def artists():
+    # DONE: replace with real data returned from querying the database
+    data = []
+    genre_facets = []
+    try:
+        genres = facets.parse_genres(request.args.getlist('genre'))
+    except ValueError:
+        abort(400)
+    try:
+        conditions = facets.conditions(Artist, genres)
+        data = entity_rows(Artist, ('id', 'name'), conditions=conditions)
+        genre_facets = facets.genre_facets(Artist, conditions)
+    except Exception as error:
+        print(error)
+        pass
+
+    return render_template('pages/artists.html', artists=data, genres=genres, facets=genre_facets)
+
+
+@blueprint.route('/artists/search', methods=['POST'])
+def search_artists():
+    # Done: implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    search_term = request.form.get('search_term', '')
+    try:
+        genres = facets.parse_genres(request.form.getlist('genre'))
+    except ValueError:
+        abort(400)
+    response = search.search_artists(search_term, current_app.config['SEARCH_RESULT_LIMIT'], genres)
+
+    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''),
+                           genres=genres)
+
+
+@blueprint.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    # shows the venue page with the given venue_id
+    # Done: replace with real venue data from the venues table, using venue_id
+    past_page = max(1, request.args.get('past_page', 1, type=int))
+
+    def load():
+        return artist_detail(artist_id, past_limit=current_app.config.get('PAST_SHOWS_PER_PAGE'),
+                             past_page=past_page)
+
+    if past_page == 1:
+        data = cache.get_or_set(cache.page_cache(), cache.artist_key(artist_id), load)
+    else:
+        data = load()
+    if data is None:
+        abort(404)
+
+    return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    edits.read_primary()
+    response = edits.not_modified(Artist, artist_id)
+    if response is not None:
+        return response
+    artist = edits.load(Artist, artist_id, edits.ARTIST_FIELDS)
+    if artist is None:
+        abort(404)
+    from forms import ArtistForm
+    form = ArtistForm(formdata=None)
+
+    # DON: populate form with fields from artist with ID <artist_id>
+    for field in edits.ARTIST_FIELDS:
+        getattr(form, field).data = getattr(artist, field)
+    return edits.edit_page(render_template('forms/edit_artist.html', form=form, artist=artist,
+                                           version=artist.version), Artist, artist_id, artist.version)
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # Done: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    from forms import ArtistForm
+    form = ArtistForm()
+
+    try:
+        changes = edits.save(Artist, artist_id, edits.submitted(form, edits.ARTIST_FIELDS),
+                             edits.expected_version())
+        if matchmaking.SCORED_COLUMNS.intersection(changes):
+            tasks.enqueue('matches.artist_changed', artist_id=artist_id)
+        db.session.commit()
+    except edits.StaleEdit as stale:
+        db.session.rollback()
+        if stale.current is None:
+            abort(404)
+        flash('Artist ' + form.name.data + ' was changed by someone else while you were editing. '
+              'Check your changes and save again.')
+        return edits.edit_page(render_template(
+            'forms/edit_artist.html', form=form, artist={'id': artist_id, 'name': form.name.data},
+            version=stale.current), Artist, artist_id, stale.current, 409)
+
+    if changes:
+        search.invalidate()
+        venue_ids = []
+        if 'name' in changes or 'image_link' in changes:
+            # Venue pages show the artist's name and image on show and
+            # recommendation tiles.
+            venue_ids = db.session.execute(select(Show.venue_id).where(
+                Show.artist_id == artist_id).union(select(VenueMatch.c.venue_id).where(
+                    VenueMatch.c.artist_id == artist_id))).scalars().all()
+        cache.invalidate_pages(venue_ids=venue_ids, artist_ids=[artist_id])
+
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    from forms import ArtistForm
+    form = ArtistForm()
+
+    name = form.name.data
+    genres = form.genres.data
+    phone = form.phone.data
+    city = form.city.data
+    state = form.state.data
+    website = form.website.data
+    image_url = form.image_link.data
+    facebook_url = form.facebook_link.data
+    seeking_venue = form.seeking_venue.data
+    seeking_description = form.seeking_description.data
+
+    new_artist = Artist(name=name, genres=genres, city=city, state=state, phone=phone, website=website,
+                        image_link=image_url, facebook_link=facebook_url, seeking_venue=seeking_venue, seeking_description=seeking_description)
+
+    try:
+        db.session.add(new_artist)
+        db.session.flush()
+        tasks.enqueue('matches.artist_changed', artist_id=new_artist.id)
+        db.session.commit()
+        search.invalidate()
+        cache.invalidate_pages(artist_ids=[new_artist.id])
+        # on successful db insert, flash success
+        flash('Artist ' + name + ' was successfully listed!')
+    # Done on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    except Exception as error:
+        db.session.rollback()
+        flash('An error occurred. Artist ' + name + ' could not be listed.')
+        db.session.flush()
+        print(error)
+    return render_template('pages/home.html')
+
+
+#  Delete Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/<int:artist_id>', methods=['POST'])
+def delete_artist(artist_id):
+    # The artist's shows go with it (ON DELETE CASCADE); see deletes.py.
+    try:
+        deleted = deletes.delete_artists(Artist.id == artist_id)
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        print(error)
+        flash('An error occurred. Artist could not be removed.')
+        return redirect(url_for('artists.show_artist', artist_id=artist_id))
+    if not deleted:
+        abort(404)
+    flash('Artist is removed.')
+    return redirect(url_for('index'))
@@ -0,0 +1,248 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read pages (venues, artists, shows, the detail pages and search) are
+# served by async handlers that run the same query plans as the Flask views
+# on an async driver and pool, so a worker keeps serving other requests while
+# one waits on the database. Every other route, and anything these handlers
+# do not recognise, is passed through to the Flask app unchanged.
+#
+# The async handlers do not go through Flask's request hooks, so they are not
+# reflected in the Server-Timing header, request log or /_metrics.
+#----------------------------------------------------------------------------#
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.exceptions import HTTPException
+from flask import render_template, request, session, abort
+
+from app import create_app
+from models import Venue, Artist
+import cache
+import facets
+import queries
+import search
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(config):
+    if config.get('ASYNC_DATABASE_URI'):
+        return make_url(config['ASYNC_DATABASE_URI'])
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def async_engine_options(url, config):
+    options = {'pool_pre_ping': True}
+    if url.get_backend_name() == 'sqlite':
+        return options
+    options.update(pool_size=config['DB_POOL_SIZE'], max_overflow=config['DB_MAX_OVERFLOW'],
+                   pool_recycle=config['DB_POOL_RECYCLE'])
+    if config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {'server_settings': {
+            'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}}
+    return options
+
+
+app = create_app()
+database_url = async_database_url(app.config)
+engine = create_async_engine(database_url, **async_engine_options(database_url, app.config))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+
+wsgi = WsgiToAsgi(app)
+urls = app.url_map.bind('localhost')
+
+#----------------------------------------------------------------------------#
+# Handlers.
+#----------------------------------------------------------------------------#
+
+
+def _genres(values):
+    try:
+        return facets.parse_genres(values)
+    except ValueError:
+        abort(400)
+
+
+async def venues(session):
+    data = []
+    genre_facets = []
+    genres = _genres(request.args.getlist('genre'))
+    conditions = [facets.contains(Venue, genres)] if genres else []
+    try:
+        data = await queries.run_async(session, queries.venue_areas_plan(conditions))
+        genre_facets = await queries.run_async(session, facets.facets_plan(Venue, conditions))
+    except Exception as error:
+        print(error)
+        pass
+    return render_template('pages/venues.html', areas=data, genres=genres, facets=genre_facets)
+
+
+async def artists(session):
+    data = []
+    genre_facets = []
+    genres = _genres(request.args.getlist('genre'))
+    conditions = [facets.contains(Artist, genres)] if genres else []
+    try:
+        data = await queries.run_async(session, queries.entity_rows_plan(
+            Artist, ('id', 'name'), conditions=conditions))
+        genre_facets = await queries.run_async(session, facets.facets_plan(Artist, conditions))
+    except Exception as error:
+        print(error)
+        pass
+    return render_template('pages/artists.html', artists=data, genres=genres, facets=genre_facets)
+
+
+async def shows(session):
+    data = []
+    next_cursor = None
+    limit = request.args.get('limit', app.config['SHOWS_PER_PAGE'], type=int)
+    limit = max(1, min(limit, app.config['SHOWS_MAX_PER_PAGE']))
+    try:
+        data, next_cursor = await queries.run_async(
+            session, queries.upcoming_shows_plan(limit, after=request.args.get('after')))
+    except Exception as error:
+        print(error)
+        pass
+    return render_template("pages/shows.html", shows=data, next_cursor=next_cursor, limit=limit)
+
+
+async def _detail(session, plan, key, past_page):
+    def load():
+        return queries.run_async(session, plan(past_limit=app.config.get('PAST_SHOWS_PER_PAGE'),
+                                               past_page=past_page))
+
+    # Same cache entries as the Flask views, so writes invalidate both.
+    if past_page == 1:
+        data = await cache.get_or_set_async(cache.page_cache(), key, load)
+    else:
+        data = await load()
+    if data is None:
+        abort(404)
+    return data
+
+
+async def show_venue(session, venue_id):
+    past_page = max(1, request.args.get('past_page', 1, type=int))
+    data = await _detail(session, lambda **page: queries.venue_detail_plan(venue_id, **page),
+                         cache.venue_key(venue_id), past_page)
+    return render_template('pages/show_venue.html', venue=data)
+
+
+async def show_artist(session, artist_id):
+    past_page = max(1, request.args.get('past_page', 1, type=int))
+    data = await _detail(session, lambda **page: queries.artist_detail_plan(artist_id, **page),
+                         cache.artist_key(artist_id), past_page)
+    return render_template('pages/show_artist.html', artist=data)
+
+
+async def search_venues(session):
+    search_term = request.form.get('search_term', '')
+    genres = _genres(request.form.getlist('genre'))
+    response = await queries.run_async(session, search.postgres_search_plan(
+        Venue, search_term, app.config['SEARCH_RESULT_LIMIT'], genres))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                           genres=genres)
+
+
+async def search_artists(session):
+    search_term = request.form.get('search_term', '')
+    genres = _genres(request.form.getlist('genre'))
+    response = await queries.run_async(session, search.postgres_search_plan(
+        Artist, search_term, app.config['SEARCH_RESULT_LIMIT'], genres))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                           genres=genres)
+
+
+HANDLERS = {
+    'shows.shows': shows,
+    'venues.show_venue': show_venue,
+    'artists.show_artist': show_artist,
+}
+# The in-process search index and genre filtering used off Postgres are
+# synchronous, so search and the listings stay on the Flask views there.
+if database_url.get_backend_name() == 'postgresql':
+    HANDLERS.update({
+        'venues.venues': venues,
+        'artists.artists': artists,
+        'venues.search_venues': search_venues,
+        'artists.search_artists': search_artists,
+    })
+
+#----------------------------------------------------------------------------#
+# Application.
+#----------------------------------------------------------------------------#
+
+
+async def _read_body(receive):
+    body = b''
+    more = True
+    while more:
+        message = await receive()
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+    return body
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] != 'http':
+        return await wsgi(scope, receive, send)
+
+    try:
+        endpoint, args = urls.match(scope['path'], method=scope['method'])
+    except HTTPException:
+        endpoint = None
+    handler = HANDLERS.get(endpoint)
+    if handler is None:
+        return await wsgi(scope, receive, send)
+
+    body = await _read_body(receive)
+    headers = [(name.decode('latin-1'), value.decode('latin-1'))
+               for name, value in scope['headers']]
+    # The request context gives the handlers request.args/form, url_for and
+    # the Jinja environment; it is task-local, so awaiting inside it is safe.
+    with app.test_request_context(scope['path'], method=scope['method'],
+                                  query_string=scope['query_string'].decode('latin-1'),
+                                  headers=headers, data=body):
+        try:
+            async with Session() as db_session:
+                rv = await handler(db_session, **args)
+        except HTTPException as error:
+            rv = app.handle_http_exception(error)
+        except Exception as error:
+            # Logged and answered with the 500 page, as the Flask app does
+            # (re-raised when PROPAGATE_EXCEPTIONS is on, e.g. in debug).
+            rv = app.handle_exception(error)
+        response = app.make_response(rv)
+        # Rendering may consume flashed messages; persist the session.
+        if not app.session_interface.is_null_session(session):
+            app.session_interface.save_session(app, session, response)
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in response.headers.items()],
+    })
+    # HEAD responses keep GET's headers, Content-Length included, but no body.
+    body = b'' if scope['method'] == 'HEAD' else response.get_data()
+    await send({'type': 'http.response.body', 'body': body})
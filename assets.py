@@ -0,0 +1,182 @@
+#----------------------------------------------------------------------------#
+# Static asset bundles.
+#
+#   flask assets build
+#
+# Concatenates and minifies the stylesheets and scripts in BUNDLES into
+# static/dist/ under content-hashed names, writes .gz and .br variants next to
+# them and records the names in static/dist/manifest.json. Templates link a
+# bundle with asset_urls(name), which falls back to the source files until a
+# build exists. Built files are served from /static/dist/ with far-future
+# immutable caching, picking the precompressed variant the client accepts.
+#----------------------------------------------------------------------------#
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import abort, current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+# Sources in load order, relative to the static folder.
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'main.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+MAX_AGE = 365 * 24 * 60 * 60
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+#----------------------------------------------------------------------------#
+# Minifiers.
+#----------------------------------------------------------------------------#
+
+# Comments are dropped except /*! license headers.
+CSS_COMMENT_RE = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_SPACE_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+JS_LINE_COMMENT_RE = re.compile(r'^\s*//.*$', re.M)
+
+
+def minify_css(source):
+    source = CSS_COMMENT_RE.sub('', source)
+    source = CSS_SPACE_RE.sub(' ', source)
+    source = CSS_PUNCTUATION_RE.sub(r'\1', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    # Whole-line comments, indentation and blank lines only: line breaks are
+    # kept so automatic semicolon insertion sees the same code.
+    lines = (line.strip() for line in JS_LINE_COMMENT_RE.sub('', source).splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+#----------------------------------------------------------------------------#
+# Build.
+#----------------------------------------------------------------------------#
+
+def _write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def build(static_folder):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    sizes = {}
+    for name, sources in BUNDLES.items():
+        if name.endswith('.css'):
+            minify, separator = minify_css, '\n'
+        else:
+            minify, separator = minify_js, ';\n'
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                parts.append(minify(f.read()))
+        content = separator.join(parts).encode('utf-8')
+
+        stem, extension = os.path.splitext(name)
+        filename = '%s.%s%s' % (stem, hashlib.sha256(content).hexdigest()[:12], extension)
+        path = os.path.join(dist, filename)
+        _write(path, content)
+        sizes[name] = {'raw': len(content)}
+        compressed = gzip.compress(content, 9, mtime=0)
+        _write(path + '.gz', compressed)
+        sizes[name]['gzip'] = len(compressed)
+        if brotli is not None:
+            compressed = brotli.compress(content)
+            _write(path + '.br', compressed)
+            sizes[name]['br'] = len(compressed)
+        manifest[name] = filename
+
+    # Earlier builds are left in place for pages rendered before a deploy.
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest, sizes
+
+
+@assets_cli.command('build')
+def build_command():
+    manifest, sizes = build(current_app.static_folder)
+    for name in sorted(manifest):
+        click.echo('%s -> %s %s' % (name, manifest[name], json.dumps(sizes[name])))
+
+
+#----------------------------------------------------------------------------#
+# Templates and serving.
+#----------------------------------------------------------------------------#
+
+_manifests = {}
+
+
+def _manifest():
+    # Re-read when a build replaces the file, so running workers pick it up.
+    path = os.path.join(current_app.static_folder, DIST, MANIFEST)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _manifests.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = _manifests[path] = (mtime, json.load(f))
+    return cached[1]
+
+
+def asset_urls(name):
+    manifest = _manifest()
+    if name in manifest:
+        return [url_for('asset', filename=manifest[name])]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+def serve(filename):
+    if filename == MANIFEST:
+        abort(404)
+    directory = os.path.join(current_app.static_folder, DIST)
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and \
+                os.path.isfile(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix, max_age=MAX_AGE,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, max_age=MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    app.add_url_rule('%s/%s/<path:filename>' % (app.static_url_path, DIST), 'asset', serve)
+    app.jinja_env.globals['asset_urls'] = asset_urls
+    app.cli.add_command(assets_cli)
@@ -0,0 +1,114 @@
+#----------------------------------------------------------------------------#
+# WSGI vs. ASGI throughput on the read pages.
+#
+# Seeds the configured database, starts the Flask app (threaded werkzeug) and
+# asgi:application (uvicorn) as single-process servers in turn, and drives
+# the read pages from a pool of client threads at several concurrency levels.
+# The page cache is disabled in the servers so every request hits the
+# database.
+#
+#   DATABASE_URL=postgresql://localhost/fyyur python -m benchmarks.bench_async \
+#       --requests 2000 --concurrency 1 8 32 64
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from app import create_app
+from benchmarks.common import seeded
+
+SERVERS = {
+    'wsgi': [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--with-threads',
+             '--no-reload', '--port', '{port}'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--log-level', 'warning',
+             '--no-access-log', '--port', '{port}'],
+}
+
+
+def start(mode, port):
+    command = [part.format(port=port) for part in SERVERS[mode]]
+    env = dict(os.environ, FYYUR_CACHE_TYPE='null')
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urlopen('http://127.0.0.1:%d/' % port).read()
+            return server
+        except URLError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError('%s server did not start' % mode)
+
+
+def drive(port, paths, requests, concurrency):
+    latencies = []
+    errors = [0]
+
+    def fetch(path):
+        started = time.perf_counter()
+        try:
+            urlopen('http://127.0.0.1:%d%s' % (port, path)).read()
+        except URLError:
+            errors[0] += 1
+        latencies.append(time.perf_counter() - started)
+
+    # Warm-up pass so connection setup is not part of the measurement.
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(fetch, paths[:concurrency * 2]))
+    latencies[:] = []
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(fetch, paths[:requests]))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'latency_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        'errors': errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    results = {}
+    app = create_app()
+    with app.app_context(), seeded(venues=2000, artists=500, shows=40000,
+                                   commit=True) as (venue_ids, artist_ids):
+        # A mix of listing and detail pages, identical for both servers.
+        paths = [rng.choice([
+            '/venues', '/artists', '/shows',
+            '/venues/%d' % rng.choice(venue_ids),
+            '/artists/%d' % rng.choice(artist_ids),
+        ]) for _ in range(args.requests)]
+
+        for mode in SERVERS:
+            server = start(mode, args.port)
+            try:
+                results[mode] = [drive(args.port, paths, args.requests, concurrency)
+                                 for concurrency in args.concurrency]
+            finally:
+                server.terminate()
+                server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# datetime filter: dateutil reparse + babel per call vs. memoized patterns.
+#
+#   python -m benchmarks.bench_datetime
+#----------------------------------------------------------------------------#
+import json
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from jinja2 import Environment
+
+from filters import format_datetime
+
+TEMPLATE = "{% for t in times %}<h4>{{ t|datetime('full') }}</h4>{% endfor %}"
+
+
+def legacy_format_datetime(value, format='medium'):
+    # The filter as it was in app.py.
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en_US')
+
+
+def render(filter, times, repeat=5):
+    env = Environment()
+    env.filters['datetime'] = filter
+    template = env.from_string(TEMPLATE)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        html = template.render(times=times)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return html, round(best * 1000, 2)
+
+
+def main(count=10000):
+    start = datetime(2020, 1, 1, 18, 30)
+    stamps = [start + timedelta(hours=7 * i) for i in range(count)]
+
+    legacy_html, legacy_ms = render(legacy_format_datetime, [str(t) for t in stamps])
+    new_html, new_ms = render(format_datetime, stamps)
+    assert legacy_html == new_html
+
+    print(json.dumps({
+        'timestamps': count,
+        'legacy_ms': legacy_ms,
+        'memoized_ms': new_ms,
+        'speedup': round(legacy_ms / new_ms, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Startup cost: import time of the app module and create_app().
+#
+# Runs fresh interpreters under `python -X importtime`, reports the median
+# import time, the slowest modules and whether the lazily loaded modules
+# stayed out of startup. --max-ms exits non-zero above a budget.
+#
+#   python -m benchmarks.bench_import --runs 5 --max-ms 600
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+from app import LAZY_MODULES
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+STATEMENTS = {
+    'import': 'import app',
+    'create_app': 'import time; import app; t = time.perf_counter(); app.create_app(); '
+                  'print(round((time.perf_counter() - t) * 1000, 2))',
+}
+
+
+def profile(statement):
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                             capture_output=True, text=True, check=True)
+    modules = {}
+    total = 0
+    for line in process.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules[name] = cumulative
+        if depth == 1:
+            total += cumulative
+    return total / 1000.0, modules, process.stdout.strip()
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float)
+    args = parser.parse_args()
+
+    runs = sorted((profile(STATEMENTS['import']) for _ in range(args.runs)),
+                  key=lambda run: run[0])
+    import_ms, modules, output = runs[len(runs) // 2]
+    create_ms = median([float(profile(STATEMENTS['create_app'])[2])
+                        for _ in range(args.runs)])
+
+    results = {
+        'import_ms': round(import_ms, 2),
+        'create_app_ms': create_ms,
+        'slowest_modules_ms': dict(
+            (name, round(cumulative / 1000.0, 2))
+            for name, cumulative in sorted(modules.items(), key=lambda item: -item[1])[:args.top]),
+        'lazy_modules_loaded_at_import': [name for name in LAZY_MODULES + ('alembic',)
+                                          if name in modules],
+    }
+    print(json.dumps(results, indent=2))
+    if args.max_ms is not None and import_ms + create_ms > args.max_ms:
+        print('startup %.1f ms exceeds %.1f ms' % (import_ms + create_ms, args.max_ms),
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
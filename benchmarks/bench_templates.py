@@ -0,0 +1,92 @@
+#----------------------------------------------------------------------------#
+# Template rendering: the shows grid with and without fragment caching, and
+# template load time from source vs. the bytecode cache.
+#
+#   python -m benchmarks.bench_templates --tiles 1000
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import render_template
+from jinja2 import FileSystemBytecodeCache
+
+from app import create_app
+from cache import LRUCache
+from fragments import FragmentCacheExtension
+
+
+def shows(count):
+    start = datetime(2030, 1, 1, 18, 30)
+    return [{
+        'id': i,
+        'venue_id': i % 97,
+        'venue_name': 'Venue %d' % (i % 97),
+        'venue_version': 1,
+        'artist_id': i % 89,
+        'artist_name': 'Artist %d' % (i % 89),
+        'artist_image_link': 'https://example.com/%d.jpg' % (i % 89),
+        'artist_version': 1,
+        'start_time': start + timedelta(hours=7 * i),
+    } for i in range(count)]
+
+
+def render_ms(data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        html = render_template('pages/shows.html', shows=data, next_cursor=None, limit=len(data))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return html, round(timings[0] * 1000, 2), round(timings[len(timings) // 2] * 1000, 2)
+
+
+def load_ms(app, bytecode_cache):
+    # Every template, loaded into a fresh environment as a new worker would.
+    env = app.create_jinja_environment()
+    env.add_extension(FragmentCacheExtension)
+    env.filters.update(app.jinja_env.filters)
+    env.bytecode_cache = bytecode_cache
+    started = time.perf_counter()
+    for name in env.list_templates(filter_func=lambda name: name.endswith('.html')):
+        env.get_template(name)
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tiles', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    data = shows(args.tiles)
+    env = app.jinja_env
+    results = {'tiles': args.tiles}
+    with app.test_request_context('/shows'):
+        render_template('pages/shows.html', shows=data[:1], next_cursor=None, limit=1)
+
+        env.fragment_cache = None
+        plain, best, median = render_ms(data, args.repeat)
+        results['uncached'] = {'best_ms': best, 'median_ms': median}
+
+        env.fragment_cache = LRUCache(max_entries=args.tiles * 2)
+        cold, best, median = render_ms(data, 1)
+        results['fragment_cache_cold'] = {'best_ms': best}
+        warm, best, median = render_ms(data, args.repeat)
+        results['fragment_cache_warm'] = {'best_ms': best, 'median_ms': median}
+        assert plain == cold == warm
+
+    with tempfile.TemporaryDirectory() as directory:
+        results['template_load'] = {
+            'from_source_ms': load_ms(app, None),
+            'bytecode_cache_cold_ms': load_ms(app, FileSystemBytecodeCache(directory)),
+            'bytecode_cache_warm_ms': load_ms(app, FileSystemBytecodeCache(directory)),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
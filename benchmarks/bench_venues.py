@@ -0,0 +1,45 @@
+#----------------------------------------------------------------------------#
+# /venues listing: per-area N+1 handler vs. the single grouped query.
+#
+#   python -m benchmarks.bench_venues
+#----------------------------------------------------------------------------#
+import json
+from datetime import datetime
+
+from app import create_app
+from models import Venue, Show
+from queries import venue_areas
+from benchmarks.common import seeded, measure
+
+
+def legacy_venue_areas():
+    # The handler as it was before venue_areas(): 2N+1 queries.
+    data = []
+    venues = Venue.query.distinct(Venue.city, Venue.state).all()
+    for venue in venues:
+        upcoming_shows = len(Venue.query.join(Show).filter(Show.start_time > datetime.utcnow(),
+                                                            Show.venue_id == venue.id).all())
+        data.append({
+            'city': venue.city,
+            'state': venue.state,
+            'venues': [{
+                'id': v.id,
+                'name': v.name,
+                'num_upcoming_shows': upcoming_shows
+            } for v in Venue.query.filter_by(city=venue.city, state=venue.state).all()]
+        })
+    return data
+
+
+def main():
+    app = create_app()
+    with app.app_context(), seeded(venues=10000, shows=200000):
+        results = {
+            'legacy': measure(legacy_venue_areas, repeat=3),
+            'grouped': measure(venue_areas, repeat=3),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#----------------------------------------------------------------------------#
+# Benchmark helpers.
+#
+# Benchmarks seed their data inside the session's open transaction and roll it
+# back at the end, so they can be pointed at a development database without
+# leaving rows behind. Benchmarks that drive a separate server process seed
+# with commit=True instead, and the rows are deleted again afterwards.
+#----------------------------------------------------------------------------#
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from models import Venue, Artist, Show, db
+import counters
+from benchmarks.seed import generate
+
+
+class QueryCounter(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+@contextmanager
+def seeded(venues=10000, artists=2000, shows=200000, cities=200, seed=42, commit=False):
+    venue_ids = artist_ids = []
+    try:
+        venue_ids, artist_ids = generate(venues, artists, shows, cities, seed=seed)
+        if commit:
+            db.session.commit()
+        yield venue_ids, artist_ids
+    finally:
+        db.session.rollback()
+        if commit:
+            _delete(venue_ids, artist_ids)
+
+
+def _delete(venue_ids, artist_ids):
+    for start in range(0, len(venue_ids), 10000):
+        chunk = venue_ids[start:start + 10000]
+        db.session.execute(Show.__table__.delete().where(Show.venue_id.in_(chunk)))
+        db.session.execute(Venue.__table__.delete().where(Venue.id.in_(chunk)))
+    for start in range(0, len(artist_ids), 10000):
+        chunk = artist_ids[start:start + 10000]
+        db.session.execute(Show.__table__.delete().where(Show.artist_id.in_(chunk)))
+        db.session.execute(Artist.__table__.delete().where(Artist.id.in_(chunk)))
+    counters.rebuild()
+    db.session.commit()
+
+
+def measure(fn, repeat=5):
+    with QueryCounter(db.engine) as counter:
+        fn()
+    queries = counter.count
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'queries': queries,
+        'best_ms': round(timings[0] * 1000, 2),
+        'median_ms': round(timings[len(timings) // 2] * 1000, 2),
+    }
@@ -0,0 +1,80 @@
+#----------------------------------------------------------------------------#
+# Connection pool load test.
+#
+# Simulates gunicorn threads serving requests that each hold a connection for
+# --db-ms and do --cpu-ms of Python work outside it, and reports throughput
+# and pool checkout wait for several pool_size/max_overflow settings.
+#
+#   DATABASE_URL=postgresql://localhost/fyyur python -m benchmarks.load_pool \
+#       --threads 32 --requests 2000
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+
+import config
+
+SETTINGS = [(1, 0), (2, 2), (5, 5), (10, 10), (20, 10)]
+
+
+def run(uri, pool_size, max_overflow, threads, requests, db_ms, cpu_ms):
+    options = config.engine_options(uri, pool_size=pool_size, max_overflow=max_overflow)
+    options['pool_timeout'] = 5
+    engine = create_engine(uri, **options)
+    waits = []
+    timeouts = [0]
+
+    def handle(_):
+        requested = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                waits.append(time.perf_counter() - requested)
+                conn.execute(text('SELECT 1'))
+                time.sleep(db_ms / 1000.0)
+        except TimeoutError:
+            timeouts[0] += 1
+        time.sleep(cpu_ms / 1000.0)
+
+    # Warm the pool so connection setup is not part of the measurement.
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(handle, range(threads)))
+    waits[:] = []
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(handle, range(requests)))
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    waits.sort()
+    return {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'requests_per_second': round(requests / elapsed, 1),
+        'checkout_wait_p50_ms': round(waits[len(waits) // 2] * 1000, 2) if waits else None,
+        'checkout_wait_p95_ms': round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else None,
+        'pool_timeouts': timeouts[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uri', default=config.SQLALCHEMY_DATABASE_URI)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--db-ms', type=float, default=5)
+    parser.add_argument('--cpu-ms', type=float, default=2)
+    args = parser.parse_args()
+
+    results = [run(args.uri, pool_size, max_overflow, args.threads, args.requests,
+                   args.db_ms, args.cpu_ms)
+               for pool_size, max_overflow in SETTINGS]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#----------------------------------------------------------------------------#
+# Load test.
+#
+# Drives every route in app.py against a server process and reports
+# p50/p95/p99 latency and requests per second per route as JSON. With
+# --baseline the results are compared to an earlier run and the script exits
+# non-zero when a route's p95 latency or the overall throughput regresses by
+# more than --tolerance; the first run writes the baseline.
+#
+#   python -m benchmarks.load_test --seed --concurrency 16 \
+#       --baseline benchmarks/baseline.json
+#
+# --seed generates a dataset (see benchmarks/seed.py) for the run and removes
+# it afterwards; without it the routes use ids already in the database.
+# --writes adds the create, edit and delete routes, which need --seed.
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from sqlalchemy import select
+
+from app import create_app
+from models import Venue, Artist, db
+from benchmarks.common import seeded
+from benchmarks.bench_async import start
+
+LOAD_TEST_PREFIX = 'Load test'
+
+
+def _venue_form(n, ids):
+    return {'name': '%s venue %d' % (LOAD_TEST_PREFIX, n), 'genres': ['Jazz', 'Folk'],
+            'city': 'City 0', 'state': 'CA', 'address': '1 Main Street',
+            'phone': '555-000-0000', 'seeking_talent': '0'}
+
+
+def _artist_form(n, ids):
+    return {'name': '%s artist %d' % (LOAD_TEST_PREFIX, n), 'genres': ['Jazz'],
+            'city': 'City 0', 'state': 'CA', 'phone': '555-000-0000', 'seeking_venue': '0'}
+
+
+def _artist_edit_form(n, ids):
+    return dict(_artist_form(n, ids), name='Edited artist %d' % n)
+
+
+def _venue_edit_form(n, ids):
+    return dict(_venue_form(n, ids), name='Edited venue %d' % n)
+
+
+def _show_form(n, ids):
+    return {'venue_id': ids.venue(), 'artist_id': ids.artist(),
+            'start_time': (datetime(2030, 1, 1) + timedelta(hours=2 * n)).strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def _search_form(n, ids):
+    return {'search_term': ids.rng.choice(['venue 1', 'artist', 'city', 'jazz', 'x'])}
+
+
+# (name, method, path, form, write). Paths are formatted with the ids object.
+ROUTES = [
+    ('index', 'GET', '/', None, False),
+    ('venues', 'GET', '/venues', None, False),
+    ('search_venues', 'POST', '/venues/search', _search_form, False),
+    ('show_venue', 'GET', '/venues/{ids.venue}', None, False),
+    ('edit_venue', 'GET', '/venues/{ids.venue}/edit', None, False),
+    ('create_venue_form', 'GET', '/venues/create', None, False),
+    ('artists', 'GET', '/artists', None, False),
+    ('search_artists', 'POST', '/artists/search', _search_form, False),
+    ('show_artist', 'GET', '/artists/{ids.artist}', None, False),
+    ('edit_artist', 'GET', '/artists/{ids.artist}/edit', None, False),
+    ('create_artist_form', 'GET', '/artists/create', None, False),
+    ('shows', 'GET', '/shows', None, False),
+    ('create_shows', 'GET', '/shows/create', None, False),
+    ('create_venue_submission', 'POST', '/venues/create', _venue_form, True),
+    ('create_artist_submission', 'POST', '/artists/create', _artist_form, True),
+    ('edit_artist_submission', 'POST', '/artists/{ids.artist}/edit', _artist_edit_form, True),
+    ('edit_venue_submission', 'POST', '/venues/{ids.venue}/edit', _venue_edit_form, True),
+    ('create_show_submission', 'POST', '/shows/create', _show_form, True),
+    ('delete_venue', 'POST', '/venues/{ids.doomed_venue}', None, True),
+]
+
+
+class Ids(object):
+    # Random ids for path and form values; doomed_venue hands out each id
+    # once so every delete hits an existing venue.
+
+    def __init__(self, venue_ids, artist_ids, seed=42):
+        self.rng = random.Random(seed)
+        self.venue_ids = list(venue_ids)
+        self.artist_ids = list(artist_ids)
+        self.doomed = list(venue_ids)
+
+    def venue(self):
+        return self.rng.choice(self.venue_ids)
+
+    def artist(self):
+        return self.rng.choice(self.artist_ids)
+
+    def doomed_venue(self):
+        return self.doomed.pop()
+
+
+def _requests(route, ids, count):
+    name, method, path, form, write = route
+    for n in range(count):
+        url = path.format(ids=_Resolved(ids))
+        body = urlencode(form(n, ids), doseq=True).encode() if form else None
+        if method == 'POST' and body is None:
+            body = b''
+        yield url, body
+
+
+class _Resolved(object):
+    # Calls the Ids method named in a path placeholder.
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __getattr__(self, name):
+        return getattr(self.ids, name)()
+
+
+def _percentile(values, fraction):
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 2)
+
+
+def drive(base_url, requests, concurrency):
+    latencies = []
+    errors = [0]
+
+    def fetch(request):
+        url, body = request
+        started = time.perf_counter()
+        try:
+            urlopen(base_url + url, data=body).read()
+        except HTTPError as error:
+            if error.code >= 500:
+                errors[0] += 1
+        except URLError:
+            errors[0] += 1
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(fetch, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_p50_ms': _percentile(latencies, 0.50),
+        'latency_p95_ms': _percentile(latencies, 0.95),
+        'latency_p99_ms': _percentile(latencies, 0.99),
+    }
+
+
+def run(base_url, ids, routes, requests, concurrency):
+    results = {}
+    total = 0
+    started = time.perf_counter()
+    for route in routes:
+        batch = list(_requests(route, ids, requests))
+        # One untimed pass per route so first-hit costs are not measured.
+        drive(base_url, batch[:concurrency], concurrency)
+        results[route[0]] = drive(base_url, batch, concurrency)
+        total += len(batch)
+    results['_total'] = {
+        'requests': total,
+        'requests_per_second': round(total / (time.perf_counter() - started), 1),
+    }
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if 'latency_p95_ms' in stats and \
+                stats['latency_p95_ms'] > before['latency_p95_ms'] * (1 + tolerance):
+            found.append('%s: p95 %.2f ms, baseline %.2f ms'
+                         % (name, stats['latency_p95_ms'], before['latency_p95_ms']))
+        if name == '_total' and \
+                stats['requests_per_second'] < before['requests_per_second'] / (1 + tolerance):
+            found.append('throughput %.1f rps, baseline %.1f rps'
+                         % (stats['requests_per_second'], before['requests_per_second']))
+        if stats.get('errors'):
+            found.append('%s: %d server errors' % (name, stats['errors']))
+    return found
+
+
+def _remove_created():
+    Venue.query.filter(Venue.name.startswith(LOAD_TEST_PREFIX)).delete(synchronize_session=False)
+    Artist.query.filter(Artist.name.startswith(LOAD_TEST_PREFIX)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='test a running server instead of starting one')
+    parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', action='store_true')
+    parser.add_argument('--venues', type=int, default=2000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--writes', action='store_true')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+    if args.writes and not args.seed:
+        parser.error('--writes needs --seed')
+
+    routes = [route for route in ROUTES if args.writes or not route[4]]
+    app = create_app()
+    with app.app_context(), ExitStack() as stack:
+        if args.seed:
+            venue_ids, artist_ids = stack.enter_context(seeded(
+                args.venues, args.artists, args.shows, commit=True))
+            if args.writes:
+                stack.callback(_remove_created)
+        else:
+            venue_ids = db.session.scalars(select(Venue.id).limit(1000)).all()
+            artist_ids = db.session.scalars(select(Artist.id).limit(1000)).all()
+            db.session.rollback()
+
+        base_url = args.url
+        if base_url is None:
+            server = start(args.server, args.port)
+            stack.callback(server.wait)
+            stack.callback(server.terminate)
+            base_url = 'http://127.0.0.1:%d' % args.port
+        results = run(base_url.rstrip('/'), Ids(venue_ids, artist_ids), routes,
+                      args.requests, args.concurrency)
+
+    print(json.dumps(results, indent=2))
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            with open(args.baseline, 'w') as f:
+                json.dump(results, f, indent=2)
+            return
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print('regression: ' + line, file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
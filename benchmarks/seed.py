@@ -0,0 +1,139 @@
+#----------------------------------------------------------------------------#
+# Scale dataset generator.
+#
+# Bulk-inserts venues, artists and shows with skewed distributions: a few
+# cities hold most of the venues, venue and artist popularity follow a
+# Zipf-like curve, a handful of genres dominate, and a configurable share of
+# the shows is already in the past. Shows last an hour and never double-book
+# a venue or an artist.
+#
+#   python -m benchmarks.seed --venues 10000 --artists 5000 --shows 500000
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import random
+import timeit
+from datetime import datetime, time, timedelta
+
+from forms import genres_choices
+from app import create_app
+from models import Venue, Artist, Show, db
+import counters
+
+GENRES = [value for value, label in genres_choices]
+STATES = ['CA', 'NY', 'TX', 'FL', 'IL', 'WA', 'MA', 'GA', 'CO', 'LA']
+BATCH_SIZE = 10000
+SHOW_DURATION = timedelta(hours=1)
+BOOKING_ATTEMPTS = 5
+
+
+def zipf_weights(n, exponent=1.0):
+    return [1.0 / (rank + 1) ** exponent for rank in range(n)]
+
+
+def _genres(rng, weights):
+    return sorted(set(rng.choices(GENRES, weights, k=rng.choice((1, 1, 2, 2, 3)))))
+
+
+def _start_time(rng, now, past_ratio):
+    # On the hour from noon to 23:00, up to two years back or six months ahead.
+    if rng.random() < past_ratio:
+        days = -rng.randint(1, 730)
+    else:
+        days = rng.randint(1, 180)
+    return datetime.combine(now.date() + timedelta(days=days), time(rng.randint(12, 23)))
+
+
+def _book(rng, now, past_ratio, venue_id, artist_id, venue_booked, artist_booked):
+    # Shows are hour-aligned and an hour long, so two of them overlap only
+    # when they share a start time.
+    for _ in range(BOOKING_ATTEMPTS):
+        start_time = _start_time(rng, now, past_ratio)
+        if (venue_id, start_time) not in venue_booked and (artist_id, start_time) not in artist_booked:
+            venue_booked.add((venue_id, start_time))
+            artist_booked.add((artist_id, start_time))
+            return {'venue_id': venue_id, 'artist_id': artist_id,
+                    'start_time': start_time, 'end_time': start_time + SHOW_DURATION}
+    return None
+
+
+def _insert(model, rows):
+    db.session.bulk_insert_mappings(model, rows, return_defaults=True)
+    return [row['id'] for row in rows]
+
+
+def generate(venues, artists, shows, cities=200, past_ratio=0.6, seed=42, now=None):
+    # Rows are added to the session's transaction; the caller commits.
+    rng = random.Random(seed)
+    if now is None:
+        now = datetime.utcnow()
+    genre_weights = zipf_weights(len(GENRES), 1.2)
+    areas = [('City %d' % i, STATES[i % len(STATES)]) for i in range(cities)]
+    city_weights = zipf_weights(cities)
+
+    venue_ids = _insert(Venue, [{
+        'name': 'Venue %d' % i,
+        'genres': _genres(rng, genre_weights),
+        'address': '%d Main Street' % rng.randint(1, 9999),
+        'city': city,
+        'state': state,
+        'phone': '555-%03d-%04d' % (rng.randint(0, 999), rng.randint(0, 9999)),
+        'seeking_talent': rng.random() < 0.3,
+    } for i, (city, state) in enumerate(rng.choices(areas, city_weights, k=venues))])
+    artist_ids = _insert(Artist, [{
+        'name': 'Artist %d' % i,
+        'genres': _genres(rng, genre_weights),
+        'city': city,
+        'state': state,
+        'phone': '555-%03d-%04d' % (rng.randint(0, 999), rng.randint(0, 9999)),
+        'seeking_venue': rng.random() < 0.3,
+    } for i, (city, state) in enumerate(rng.choices(areas, city_weights, k=artists))])
+
+    # Popularity ranks are shuffled so they do not follow insertion order.
+    venue_weights = zipf_weights(venues, 0.8)
+    artist_weights = zipf_weights(artists, 0.8)
+    rng.shuffle(venue_weights)
+    rng.shuffle(artist_weights)
+    # Pairs whose venue or artist has no free slot left are dropped, so the
+    # most popular ones can end up with slightly fewer shows than requested.
+    venue_booked = set()
+    artist_booked = set()
+    for start in range(0, shows, BATCH_SIZE):
+        count = min(BATCH_SIZE, shows - start)
+        rows = [_book(rng, now, past_ratio, venue_id, artist_id, venue_booked, artist_booked)
+                for venue_id, artist_id in zip(rng.choices(venue_ids, venue_weights, k=count),
+                                               rng.choices(artist_ids, artist_weights, k=count))]
+        rows = [row for row in rows if row is not None]
+        if rows:
+            db.session.execute(Show.__table__.insert(), rows)
+
+    counters.rebuild(now)
+    db.session.flush()
+    return venue_ids, artist_ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--venues', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=200000)
+    parser.add_argument('--cities', type=int, default=200)
+    parser.add_argument('--past-ratio', type=float, default=0.6)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    started = timeit.default_timer()
+    with create_app().app_context():
+        generate(args.venues, args.artists, args.shows, args.cities,
+                 args.past_ratio, args.seed)
+        db.session.commit()
+    print(json.dumps({
+        'venues': args.venues,
+        'artists': args.artists,
+        'shows': args.shows,
+        'seconds': round(timeit.default_timer() - started, 2),
+    }))
+
+
+if __name__ == '__main__':
+    main()
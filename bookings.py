@@ -0,0 +1,160 @@
+#----------------------------------------------------------------------------#
+# Show bookings.
+#
+# A show books its venue and its artist for [start_time, end_time). On
+# Postgres the exclusion constraints over the generated "during" range
+# reject an overlapping insert with a single GiST probe, and
+# conflict_from_error() says which booking it collided with. Other backends,
+# SQLite in particular, fall back to in-process interval indexes that
+# conflict() probes before the insert.
+#----------------------------------------------------------------------------#
+import threading
+from bisect import bisect_left, bisect_right
+from sqlalchemy import select
+
+from models import MAX_SHOW_DURATION, Show, db
+
+EXCLUSION_VIOLATION = '23P01'
+CONSTRAINTS = {
+    'ex_Show_venue_during': 'venue',
+    'ex_Show_artist_during': 'artist',
+}
+
+
+class IntervalIndex(object):
+    # Intervals sorted by start, with the running maximum of their ends.
+    # [start, end) overlaps something iff an interval starting before `end`
+    # ends after `start`: one bisect and one lookup, even when the stored
+    # intervals overlap each other.
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        self.max_ends = []
+        for start, end in sorted(intervals):
+            if start < end:
+                self.starts.append(start)
+                self.ends.append(end)
+                self.max_ends.append(max(end, self.max_ends[-1]) if self.max_ends else end)
+
+    def overlaps(self, start, end):
+        if start >= end:
+            return False
+        position = bisect_left(self.starts, end)
+        return position > 0 and self.max_ends[position - 1] > start
+
+    def add(self, start, end):
+        # Empty intervals overlap nothing, same as an empty tsrange.
+        if start >= end:
+            return
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.max_ends.insert(position, end)
+        running = self.max_ends[position - 1] if position else end
+        for i in range(position, len(self.starts)):
+            running = max(running, self.ends[i])
+            if i > position and self.max_ends[i] == running:
+                break
+            self.max_ends[i] = running
+
+
+class BookingIndex(object):
+    # One IntervalIndex per venue (or artist), loaded on first use.
+
+    def __init__(self, column):
+        self.column = column
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def invalidate(self):
+        with self.lock:
+            self.indexes = {}
+
+    def _index(self, owner_id):
+        index = self.indexes.get(owner_id)
+        if index is None:
+            rows = db.session.execute(select(Show.start_time, Show.end_time).where(
+                self.column == owner_id))
+            index = self.indexes[owner_id] = IntervalIndex(tuple(row) for row in rows)
+        return index
+
+    def overlaps(self, owner_id, start, end):
+        with self.lock:
+            return self._index(int(owner_id)).overlaps(start, end)
+
+    def add(self, owner_id, start, end):
+        with self.lock:
+            index = self.indexes.get(int(owner_id))
+            if index is not None:
+                index.add(start, end)
+
+
+venue_bookings = BookingIndex(Show.venue_id)
+artist_bookings = BookingIndex(Show.artist_id)
+
+
+#  Entry points
+#  ----------------------------------------------------------------
+
+def _enforced_by_database():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def conflict(venue_id, artist_id, start, end):
+    # 'venue', 'artist' or None. Always None on Postgres, where the insert
+    # itself fails instead.
+    if _enforced_by_database():
+        return None
+    if venue_bookings.overlaps(venue_id, start, end):
+        return 'venue'
+    if artist_bookings.overlaps(artist_id, start, end):
+        return 'artist'
+    return None
+
+
+def conflict_from_error(error):
+    # Maps an IntegrityError raised by an exclusion constraint to 'venue' or
+    # 'artist'; None for any other error.
+    orig = getattr(error, 'orig', None)
+    if getattr(orig, 'pgcode', None) != EXCLUSION_VIOLATION:
+        return None
+    return CONSTRAINTS.get(getattr(orig.diag, 'constraint_name', None), 'venue')
+
+
+def booked(venue_id, artist_id, start, end):
+    # Called after the insert commits.
+    if not _enforced_by_database():
+        venue_bookings.add(venue_id, start, end)
+        artist_bookings.add(artist_id, start, end)
+
+
+def invalidate():
+    # Called after shows are removed or bulk-loaded.
+    venue_bookings.invalidate()
+    artist_bookings.invalidate()
+
+
+def available_slots(venue_id, start, end, min_length=None):
+    # Free [start, end) gaps at a venue between `start` and `end`. Shows are
+    # at most MAX_SHOW_DURATION long, so only the (venue_id, start_time)
+    # index range from start - MAX_SHOW_DURATION to end is read.
+    rows = db.session.execute(select(Show.start_time, Show.end_time).where(
+        Show.venue_id == venue_id,
+        Show.start_time > start - MAX_SHOW_DURATION,
+        Show.start_time < end,
+        Show.end_time > start,
+    ).order_by(Show.start_time))
+
+    slots = []
+    free_from = start
+    for show_start, show_end in rows:
+        if show_start > free_from:
+            slots.append((free_from, show_start))
+        free_from = max(free_from, show_end)
+    if free_from < end:
+        slots.append((free_from, end))
+    if min_length is not None:
+        slots = [(slot_start, slot_end) for slot_start, slot_end in slots
+                 if slot_end - slot_start >= min_length]
+    return slots
@@ -0,0 +1,349 @@
+#----------------------------------------------------------------------------#
+# Bulk import/export.
+#
+#   flask bulk import venues venues.csv [--dry-run] [--batch-size 1000] [--no-matches]
+#   flask bulk export shows shows.jsonl
+#   flask bulk delete venues --city "San Francisco" --state CA [--dry-run]
+#
+# Files are streamed: rows are read, validated and inserted one batch at a
+# time with a single executemany per batch, so memory use does not grow
+# with the size of the file. CSV multi-value cells (genres) are separated
+# by ';'. The format follows the file extension unless --format is given.
+#
+# A row the database refuses (an unknown id, or a double booking caught by
+# Postgres' exclusion constraints) is rejected like an invalid one, and the
+# rest of its batch is still inserted.
+#
+# Imports run the same follow-up as the web forms: shows are checked for
+# double bookings (off Postgres, where no exclusion constraint does it) and
+# update the show counters; venues and artists refresh the search index
+# (and venues the geo index), and recommendations are rebuilt once at the end of the import
+# (--no-matches skips that, e.g. before importing the other side, and leaves
+# it to `flask matches rebuild`).
+#----------------------------------------------------------------------------#
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+
+from models import DEFAULT_SHOW_DURATION, Venue, Artist, Show, db
+import bookings
+import cache
+import counters
+import deletes
+import geo
+import matchmaking
+import search
+
+ENTITIES = {
+    'venues': (Venue.__table__, 'VenueForm', (
+        'name', 'city', 'state', 'address', 'phone', 'genres', 'image_link',
+        'facebook_link', 'website', 'seeking_talent', 'seeking_description')),
+    'artists': (Artist.__table__, 'ArtistForm', (
+        'name', 'city', 'state', 'phone', 'genres', 'image_link',
+        'facebook_link', 'website', 'seeking_venue', 'seeking_description')),
+    'shows': (Show.__table__, 'ShowForm', ('venue_id', 'artist_id', 'start_time')),
+}
+
+# The forms' select widgets for these flags coerce to int and require a
+# truthy value, so "false" can never pass them. They are parsed here instead.
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+LIST_FIELDS = ('genres',)
+INTEGER_FIELDS = ('venue_id', 'artist_id')
+
+bulk_cli = AppGroup('bulk', help='Bulk import and export of venues, artists and shows.')
+
+
+def _format(path, fmt):
+    if fmt:
+        return fmt
+    return 'jsonl' if path.endswith(('.jsonl', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            for field in LIST_FIELDS:
+                if field in row:
+                    row[field] = [value.strip() for value in (row[field] or '').split(';') if value.strip()]
+            yield row
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+class RowValidator(object):
+    # One form instance is re-processed for every row, which runs the same
+    # field validators as the web handlers without a request per row.
+
+    def __init__(self, form_name, fields):
+        # WTForms is only loaded when an import actually runs.
+        import forms
+        self.form = getattr(forms, form_name)(formdata=None, meta={'csrf': False})
+        self.fields = fields
+
+    def __call__(self, row):
+        formdata = MultiDict()
+        for field in self.fields:
+            value = row.get(field)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                for item in value:
+                    formdata.add(field, item)
+            else:
+                formdata.add(field, str(value))
+
+        self.form.process(formdata)
+        self.form.validate()
+        errors = dict((field, messages) for field, messages in self.form.errors.items()
+                      if field not in BOOLEAN_FIELDS and field in self.fields)
+        if errors:
+            return None, errors
+
+        record = {}
+        for field in self.fields:
+            if field in BOOLEAN_FIELDS:
+                record[field] = _parse_bool(row.get(field))
+            elif field in INTEGER_FIELDS:
+                try:
+                    record[field] = int(row.get(field))
+                except (TypeError, ValueError):
+                    return None, {field: ['Not a valid id']}
+            else:
+                record[field] = getattr(self.form, field).data
+        return record, None
+
+
+def _book(record):
+    # Errors for a show that would double-book its venue or artist, counting
+    # the rows accepted before it; None once it is booked. Off Postgres only;
+    # there the exclusion constraints reject the insert instead.
+    record['end_time'] = record['start_time'] + DEFAULT_SHOW_DURATION
+    booking_conflict = bookings.conflict(record['venue_id'], record['artist_id'],
+                                         record['start_time'], record['end_time'])
+    if booking_conflict:
+        return _booked_error(booking_conflict)
+    bookings.booked(record['venue_id'], record['artist_id'], record['start_time'], record['end_time'])
+    return None
+
+
+def _booked_error(booking_conflict):
+    return {'start_time': ['The %s is already booked at that time' % booking_conflict]}
+
+
+def _check_shows(records, reject):
+    # Shows whose venue and artist exist (one query per side, since SQLite
+    # may not enforce the foreign keys) and that book no one twice.
+    venue_ids = set(db.session.execute(select(Venue.id).where(
+        Venue.id.in_(set(record['venue_id'] for line, record in records)))).scalars())
+    artist_ids = set(db.session.execute(select(Artist.id).where(
+        Artist.id.in_(set(record['artist_id'] for line, record in records)))).scalars())
+    valid = []
+    for line, record in records:
+        if record['venue_id'] not in venue_ids:
+            errors = {'venue_id': ['No such venue']}
+        elif record['artist_id'] not in artist_ids:
+            errors = {'artist_id': ['No such artist']}
+        else:
+            errors = _book(record)
+        if errors:
+            reject(line, errors)
+        else:
+            valid.append((line, record))
+    return valid
+
+
+def _insert(table, records, reject):
+    # One executemany for the batch. If the database refuses it (e.g. a
+    # double booking caught by Postgres' exclusion constraint), the rows are
+    # retried one SAVEPOINT each and only the refused ones are rejected.
+    try:
+        with db.session.begin_nested():
+            db.session.execute(table.insert(), [record for line, record in records])
+        return records
+    except IntegrityError:
+        pass
+    inserted = []
+    for line, record in records:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert(), [record])
+        except IntegrityError as error:
+            booking_conflict = bookings.conflict_from_error(error)
+            reject(line, _booked_error(booking_conflict) if booking_conflict
+                   else {'row': [str(getattr(error, 'orig', error))]})
+        else:
+            inserted.append((line, record))
+    return inserted
+
+
+def _imported(entity, records):
+    # Called after each batch commits.
+    if entity == 'shows':
+        cache.invalidate_pages(venue_ids=set(record['venue_id'] for record in records),
+                               artist_ids=set(record['artist_id'] for record in records))
+        return
+    search.invalidate()
+    if entity == 'venues':
+        geo.invalidate()
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@bulk_cli.command('import')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']))
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--dry-run', is_flag=True, help='Validate only; nothing is written.')
+@click.option('--no-matches', is_flag=True, help='Leave recommendations to `flask matches rebuild`.')
+def import_command(entity, source, fmt, batch_size, dry_run, no_matches):
+    table, form_name, fields = ENTITIES[entity]
+    validate = RowValidator(form_name, fields)
+    rows = read_rows(source, _format(source.name, fmt))
+
+    inserted = rejected = 0
+
+    def reject(line, errors):
+        nonlocal rejected
+        rejected += 1
+        click.echo('row %d rejected: %s' % (line, json.dumps(errors)), err=True)
+
+    line = 0
+    for number, batch in enumerate(_batches(rows, batch_size), 1):
+        records = []
+        for row in batch:
+            line += 1
+            record, errors = validate(row)
+            if errors:
+                reject(line, errors)
+            else:
+                records.append((line, record))
+        if entity == 'shows':
+            records = _check_shows(records, reject)
+
+        if records and not dry_run:
+            try:
+                records = _insert(table, records, reject)
+                if entity == 'shows' and records:
+                    counters.shows_added([record for line, record in records])
+                db.session.commit()
+            except Exception as error:
+                db.session.rollback()
+                raise click.ClickException('batch %d failed: %s' % (number, error))
+            finally:
+                if entity == 'shows':
+                    # The batch is in the database (or not at all) now; the
+                    # booking indexes reload from it, so they do not grow
+                    # with the file.
+                    bookings.invalidate()
+            _imported(entity, [record for line, record in records])
+        inserted += len(records)
+        click.echo('batch %d: %d %s, %d rejected (total %d)' % (
+            number, len(records), 'valid' if dry_run else 'inserted', len(batch) - len(records),
+            inserted), err=True)
+
+    if dry_run:
+        bookings.invalidate()
+    elif inserted and entity != 'shows' and not no_matches:
+        # One batch pass instead of rescoring every new row.
+        venue_matches, artist_matches = matchmaking.rebuild()
+        db.session.commit()
+        click.echo('rebuilt %d venue and %d artist matches' % (venue_matches, artist_matches),
+                   err=True)
+    click.echo('%s %d %s, rejected %d%s' % (
+        'validated' if dry_run else 'imported', inserted, entity, rejected,
+        ' (dry run)' if dry_run else ''))
+
+
+def _serialize(value):
+    # Same format ShowForm.start_time parses, so exports re-import cleanly.
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+@bulk_cli.command('export')
+@click.argument('entity', type=click.Choice(sorted(ENTITIES)))
+@click.argument('target', type=click.File('w', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']))
+@click.option('--batch-size', default=1000, show_default=True)
+def export_command(entity, target, fmt, batch_size):
+    table, form_name, fields = ENTITIES[entity]
+    fmt = _format(target.name, fmt)
+    columns = [table.c[name] for name in (('id',) if 'id' in table.c else ()) + fields]
+    result = db.session.execute(
+        table.select().with_only_columns(*columns).execution_options(yield_per=batch_size))
+
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(target)
+        writer.writerow([column.name for column in columns])
+
+    count = 0
+    for row in result:
+        record = dict((column.name, _serialize(value)) for column, value in zip(columns, row))
+        if writer is not None:
+            for field in LIST_FIELDS:
+                if field in record:
+                    record[field] = ';'.join(record[field] or [])
+            writer.writerow([record[column.name] for column in columns])
+        else:
+            target.write(json.dumps(record) + '\n')
+        count += 1
+    click.echo('exported %d %s' % (count, entity), err=True)
+
+
+DELETES = {
+    'venues': (Venue, deletes.delete_venues),
+    'artists': (Artist, deletes.delete_artists),
+}
+
+
+@bulk_cli.command('delete')
+@click.argument('entity', type=click.Choice(sorted(DELETES)))
+@click.option('--city')
+@click.option('--state')
+@click.option('--dry-run', is_flag=True, help='Count only; nothing is deleted.')
+def delete_command(entity, city, state, dry_run):
+    # Shows and recommendations go with the deleted rows; see deletes.py.
+    model, delete_rows = DELETES[entity]
+    where = []
+    if city:
+        where.append(model.city == city)
+    if state:
+        where.append(model.state == state)
+    if not where:
+        raise click.UsageError('give --city and/or --state')
+    if dry_run:
+        count = db.session.execute(select(func.count()).select_from(model).where(*where)).scalar()
+        click.echo('would delete %d %s (dry run)' % (count, entity))
+        return
+    try:
+        deleted = delete_rows(*where)
+        db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        raise click.ClickException('delete failed: %s' % error)
+    click.echo('deleted %d %s' % (len(deleted), entity))
@@ -0,0 +1,163 @@
+#----------------------------------------------------------------------------#
+# Page data cache.
+#
+# Read-through cache for the assembled venue/artist detail dicts, and the
+# store behind the template fragment cache (fragments.py). Two
+# backends share one interface (get/set/delete/stats): an in-process LRU
+# with TTL, and a Redis-protocol backend that takes any client exposing
+# get/setex/delete, so a local stand-in can replace a real server.
+#----------------------------------------------------------------------------#
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+MISSING = object()
+
+
+class Stats(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class NullCache(object):
+    def __init__(self):
+        self.stats = Stats()
+
+    def get(self, key):
+        self.stats.misses += 1
+        return MISSING
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+
+class LRUCache(object):
+    def __init__(self, max_entries=1024, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = Stats()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return MISSING
+            expires, value = entry
+            if expires <= self.clock():
+                del self.entries[key]
+                self.stats.misses += 1
+                self.stats.evictions += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (self.clock() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+class RedisCache(object):
+    # Expiry and eviction happen server side, so only hits and misses are
+    # counted here.
+
+    def __init__(self, client, ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.stats = Stats()
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.stats.misses += 1
+            return MISSING
+        self.stats.hits += 1
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.setex(self.prefix + key, ttl or self.ttl,
+                          pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+def from_config(config, prefix='CACHE'):
+    backend = config.get(prefix + '_TYPE', 'lru')
+    ttl = config.get(prefix + '_TTL', 300)
+    if backend == 'lru':
+        return LRUCache(config.get(prefix + '_MAX_ENTRIES', 1024), ttl)
+    if backend == 'redis':
+        import redis
+        return RedisCache(redis.Redis.from_url(config[prefix + '_REDIS_URL']), ttl)
+    return NullCache()
+
+
+def init_app(app):
+    app.extensions['page_cache'] = from_config(app.config)
+    app.extensions['fragment_cache'] = from_config(app.config, 'FRAGMENT_CACHE')
+
+
+def page_cache():
+    return current_app.extensions['page_cache']
+
+
+def invalidate_pages(venue_ids=(), artist_ids=()):
+    page_cache().delete(*([venue_key(id) for id in venue_ids] +
+                          [artist_key(id) for id in artist_ids]))
+
+
+def get_or_set(cache, key, loader):
+    value = cache.get(key)
+    if value is MISSING:
+        value = loader()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+async def get_or_set_async(cache, key, loader):
+    value = cache.get(key)
+    if value is MISSING:
+        value = await loader()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+
+def venue_key(venue_id):
+    return 'venue:%d' % int(venue_id)
+
+
+def artist_key(artist_id):
+    return 'artist:%d' % int(artist_id)
@@ -1,13 +1,116 @@
 import os
 
-SECRET_KEY = os.urandom(32)
+# Every worker needs the same key for sessions/CSRF, so set it in production.
+SECRET_KEY = os.environ.get('FYYUR_SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# Profile: 'development' (default), 'testing' or 'production'.
+PROFILE = os.environ.get('FYYUR_ENV', 'development')
+
 # Enable debug mode.
-DEBUG = True
+DEBUG = PROFILE == 'development'
+TESTING = PROFILE == 'testing'
 
 # Connect to the database
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 # done IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = 'postgres+psycopg2://mrsbinns@localhost:5432/fyyur'
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL', {
+        'development': 'postgresql+psycopg2://mrsbinns@localhost:5432/fyyur',
+        'testing': 'postgresql+psycopg2://localhost:5432/fyyur_test',
+        'production': 'postgresql+psycopg2://localhost:5432/fyyur',
+    }[PROFILE])
+# Optional read replica; GET requests read from it when set.
+READ_REPLICA_URI = os.environ.get('READ_REPLICA_URL')
+
+# Connection pool per worker process. Each worker may open up to
+# pool_size + max_overflow connections, so keep
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Postgres' max_connections.
+# (pool_size, max_overflow, pool_recycle seconds, statement_timeout ms)
+POOL_PROFILES = {
+    'development': (5, 5, 1800, 0),
+    'testing': (2, 0, 1800, 5000),
+    'production': (5, 2, 1800, 5000),
+}
+_pool = POOL_PROFILES[PROFILE]
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', _pool[0]))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', _pool[1]))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', _pool[2]))
+DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', _pool[3]))
+
+
+def engine_options(uri, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_recycle=DB_POOL_RECYCLE, statement_timeout=DB_STATEMENT_TIMEOUT):
+    options = {'pool_pre_ping': True}
+    if uri.startswith('sqlite'):
+        return options
+    options.update(pool_size=pool_size, max_overflow=max_overflow,
+                   pool_recycle=pool_recycle)
+    if statement_timeout and uri.startswith('postgresql'):
+        options['connect_args'] = {
+            'options': '-c statement_timeout=%d' % statement_timeout}
+    return options
+
+
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+SQLALCHEMY_BINDS = {}
+if READ_REPLICA_URI:
+    SQLALCHEMY_BINDS['replica'] = dict(url=READ_REPLICA_URI,
+                                       **engine_options(READ_REPLICA_URI))
+
+# Database for the async read handlers in asgi.py; defaults to the main
+# database through the asyncpg driver.
+ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
+
+# Past shows listed per page on venue and artist pages (None shows them all)
+PAST_SHOWS_PER_PAGE = 30
+
+# Upcoming shows per page on /shows (?limit= is clamped to the maximum)
+SHOWS_PER_PAGE = 30
+SHOWS_MAX_PER_PAGE = 100
+
+# Maximum number of hits returned by venue and artist search
+SEARCH_RESULT_LIMIT = 50
+
+# /venues/nearby radius in km (?radius= is clamped to the maximum)
+NEARBY_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 200
+
+# Background job threads per app process; 0 leaves jobs to `flask worker`
+TASK_WORKERS = int(os.environ.get('FYYUR_TASK_WORKERS', 2))
+
+# Venue/artist page data cache: 'lru' (in-process), 'redis' or 'null'.
+# An 'lru' cache is per worker process and writes only invalidate the worker
+# that handled them, so with several workers the others can serve a page up
+# to CACHE_TTL seconds stale. Setting FYYUR_CACHE_REDIS_URL makes 'redis',
+# which every worker shares, the default.
+_redis_url = os.environ.get('FYYUR_CACHE_REDIS_URL')
+CACHE_TYPE = os.environ.get('FYYUR_CACHE_TYPE', 'redis' if _redis_url else 'lru')
+CACHE_TTL = 300
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = _redis_url or 'redis://localhost:6379/0'
+
+# Rendered template fragments ({% cache %}); same backends as the page cache
+FRAGMENT_CACHE_TYPE = os.environ.get('FYYUR_FRAGMENT_CACHE_TYPE', CACHE_TYPE)
+FRAGMENT_CACHE_TTL = 300
+FRAGMENT_CACHE_MAX_ENTRIES = 10000
+FRAGMENT_CACHE_REDIS_URL = CACHE_REDIS_URL
+
+# /img thumbnails (see images.py); None keeps them in the instance folder
+IMAGE_CACHE_DIR = os.environ.get('FYYUR_IMAGE_CACHE_DIR')
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('FYYUR_IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+IMAGE_WORKERS = 4
+# Callable url -> bytes; None fetches over http(s). images.file_fetch reads
+# local paths.
+IMAGE_FETCH = None
+
+# Compiled templates are kept here across restarts (None: Jinja's temp dir)
+TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('FYYUR_TEMPLATE_CACHE_DIR')
+
+# Requests issuing more SQL statements than this are logged as possible N+1s
+N_PLUS_ONE_QUERY_THRESHOLD = 20
+
+# Locale and timezone for displayed show times (None keeps stored UTC)
+DISPLAY_LOCALE = os.environ.get('FYYUR_LOCALE', 'en_US')
+DISPLAY_TIMEZONE = os.environ.get('FYYUR_TIMEZONE')
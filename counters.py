@@ -0,0 +1,155 @@
+#----------------------------------------------------------------------------#
+# Show counters.
+#
+# Venue and Artist carry upcoming_shows_count/past_shows_count so listings
+# and search never have to count Shows rows. A show counts as past once its
+# start_time is at or before CounterState.rolled_until; the roll-forward
+# job advances that watermark and moves the shows it passes from upcoming
+# to past. Callers run these inside their own transaction and commit.
+#
+#   flask counters roll-forward   (schedule every few minutes)
+#   flask counters rebuild        (full recount)
+#----------------------------------------------------------------------------#
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, case, func, select
+
+from models import Venue, Artist, Show, CounterState, db
+
+counters_cli = AppGroup('counters', help='Maintain the denormalized show counters.')
+
+
+def watermark(lock=None):
+    # Writers take the row FOR SHARE and the roll-forward job FOR UPDATE, so
+    # a show cannot be classified against a watermark that is being moved.
+    query = select(CounterState.c.rolled_until).where(CounterState.c.id == 1)
+    if lock == 'share':
+        query = query.with_for_update(read=True)
+    elif lock == 'update':
+        query = query.with_for_update()
+    return db.session.execute(query).scalar()
+
+
+def _classify_against(lock):
+    # The watermark, or now when there is none yet (a database made by
+    # create_all, say): until the first roll-forward or rebuild writes one,
+    # shows are classified as rebuild() would classify them now.
+    mark = watermark(lock=lock)
+    return mark if mark is not None else datetime.utcnow()
+
+
+def _set_watermark(value):
+    updated = db.session.execute(CounterState.update().where(
+        CounterState.c.id == 1).values(rolled_until=value)).rowcount
+    if not updated:
+        db.session.execute(CounterState.insert().values(id=1, rolled_until=value))
+
+
+def _apply(model, deltas):
+    # deltas: {id: (upcoming delta, past delta)}, one executemany UPDATE.
+    table = model.__table__
+    params = [{'_id': id, '_upcoming': upcoming, '_past': past}
+              for id, (upcoming, past) in deltas.items() if upcoming or past]
+    if not params:
+        return
+    db.session.execute(table.update().where(table.c.id == bindparam('_id')).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + bindparam('_upcoming'),
+        past_shows_count=table.c.past_shows_count + bindparam('_past')
+    ), params)
+
+
+def shows_added(shows, sign=1):
+    # shows: iterable of dicts with venue_id, artist_id and start_time.
+    mark = _classify_against('share')
+    venues = {}
+    artists = {}
+    for show in shows:
+        upcoming = show['start_time'] > mark
+        delta = (sign, 0) if upcoming else (0, sign)
+        for deltas, id in ((venues, int(show['venue_id'])), (artists, int(show['artist_id']))):
+            current = deltas.get(id, (0, 0))
+            deltas[id] = (current[0] + delta[0], current[1] + delta[1])
+    _apply(Venue, venues)
+    _apply(Artist, artists)
+
+
+def shows_removed(shows):
+    shows_added(shows, sign=-1)
+
+
+def _grouped(group_column, where, mark):
+    # Per group: (shows after the watermark, shows at or before it).
+    upcoming = func.sum(case((Show.start_time > mark, 1), else_=0))
+    past = func.sum(case((Show.start_time <= mark, 1), else_=0))
+    rows = db.session.query(group_column, upcoming, past).filter(where).group_by(group_column)
+    return dict((row[0], (int(row[1] or 0), int(row[2] or 0))) for row in rows)
+
+
+def venues_removed(venue_ids):
+    # The venues' own rows go away; the artists that played them lose counts.
+    mark = _classify_against('share')
+    deltas = _grouped(Show.artist_id, Show.venue_id.in_(venue_ids), mark)
+    _apply(Artist, dict((id, (-up, -past)) for id, (up, past) in deltas.items()))
+
+
+def artists_removed(artist_ids):
+    mark = _classify_against('share')
+    deltas = _grouped(Show.venue_id, Show.artist_id.in_(artist_ids), mark)
+    _apply(Venue, dict((id, (-up, -past)) for id, (up, past) in deltas.items()))
+
+
+def roll_forward(now=None):
+    # Only the shows that started since the last run are read.
+    if now is None:
+        now = datetime.utcnow()
+    mark = watermark(lock='update')
+    if mark is None:
+        return rebuild(now)
+    if now <= mark:
+        return 0
+
+    window = (Show.start_time > mark) & (Show.start_time <= now)
+    moved = 0
+    for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        rows = db.session.query(column, func.count()).filter(window).group_by(column).all()
+        _apply(model, dict((id, (-count, count)) for id, count in rows))
+        if model is Venue:
+            moved = sum(count for id, count in rows)
+    _set_watermark(now)
+    return moved
+
+
+def rebuild(now=None):
+    if now is None:
+        now = datetime.utcnow()
+    for model, column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+        table = model.__table__
+
+        def count(condition):
+            return select(func.count()).where(
+                column == table.c.id, condition).scalar_subquery()
+
+        db.session.execute(table.update().values(
+            upcoming_shows_count=count(Show.start_time > now),
+            past_shows_count=count(Show.start_time <= now)))
+    _set_watermark(now)
+    return None
+
+
+@counters_cli.command('roll-forward')
+def roll_forward_command():
+    moved = roll_forward()
+    db.session.commit()
+    if moved is None:
+        click.echo('no watermark yet; counters rebuilt')
+    else:
+        click.echo('moved %d shows from upcoming to past' % moved)
+
+
+@counters_cli.command('rebuild')
+def rebuild_command():
+    rebuild()
+    db.session.commit()
+    click.echo('counters rebuilt')
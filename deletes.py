@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Venue and artist deletes.
+#
+#   delete_venues(Venue.id == venue_id)
+#   delete_venues(Venue.city == 'San Francisco', Venue.state == 'CA')
+#
+# One DELETE removes every matching row. On Postgres their shows and
+# recommendations go with them through the ON DELETE CASCADE foreign keys;
+# other backends, which may not enforce foreign keys, delete those rows
+# with one statement each first. The matched rows are locked up front, so
+# no show can be booked on them between counting and deleting. The other
+# side's show counters are adjusted in the same transaction, and page-cache
+# and index invalidation is queued to run when it commits. Callers commit.
+#
+#   flask bulk delete venues --city "San Francisco" --state CA
+#----------------------------------------------------------------------------#
+from sqlalchemy import delete, select, union
+
+from models import Artist, ArtistMatch, Show, Venue, VenueMatch, after_commit, db
+import bookings
+import cache
+import counters
+import geo
+import search
+
+
+def _cascades():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _locked_ids(model, where):
+    return db.session.execute(select(model.id).where(*where).order_by(model.id)
+                              .with_for_update()).scalars().all()
+
+
+def _delete_dependents(column, ids):
+    if _cascades():
+        return
+    db.session.execute(delete(Show).where(column.in_(ids)))
+    for table in (VenueMatch, ArtistMatch):
+        db.session.execute(table.delete().where(table.c[column.key].in_(ids)))
+
+
+def delete_venues(*where):
+    # Ids of the venues deleted.
+    ids = _locked_ids(Venue, where)
+    if not ids:
+        return []
+    counters.venues_removed(ids)
+    # Artist pages list their shows at these venues and recommend them.
+    artist_ids = db.session.execute(union(
+        select(Show.artist_id).where(Show.venue_id.in_(ids)),
+        select(ArtistMatch.c.artist_id).where(ArtistMatch.c.venue_id.in_(ids)))).scalars().all()
+    _delete_dependents(Show.venue_id, ids)
+    db.session.execute(delete(Venue).where(Venue.id.in_(ids))
+                       .execution_options(synchronize_session=False))
+
+    def invalidate():
+        search.invalidate()
+        geo.invalidate()
+        bookings.invalidate()
+        cache.invalidate_pages(venue_ids=ids, artist_ids=artist_ids)
+    after_commit(invalidate)
+    return ids
+
+
+def delete_artists(*where):
+    # Ids of the artists deleted.
+    ids = _locked_ids(Artist, where)
+    if not ids:
+        return []
+    counters.artists_removed(ids)
+    venue_ids = db.session.execute(union(
+        select(Show.venue_id).where(Show.artist_id.in_(ids)),
+        select(VenueMatch.c.venue_id).where(VenueMatch.c.artist_id.in_(ids)))).scalars().all()
+    _delete_dependents(Show.artist_id, ids)
+    db.session.execute(delete(Artist).where(Artist.id.in_(ids))
+                       .execution_options(synchronize_session=False))
+
+    def invalidate():
+        search.invalidate()
+        bookings.invalidate()
+        cache.invalidate_pages(venue_ids=venue_ids, artist_ids=ids)
+    after_commit(invalidate)
+    return ids
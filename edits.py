@@ -0,0 +1,122 @@
+#----------------------------------------------------------------------------#
+# Venue and artist edits.
+#
+# Edit pages carry the row's version in a hidden field and in their ETag. A
+# revisit whose If-None-Match still matches is answered 304 after reading
+# only the version column. A save compares the submitted fields with the
+# row and UPDATEs just the columns that changed, bumping version in the same
+# statement, which is guarded by the version the form was rendered with. If
+# another save got there first, StaleEdit is raised instead. Submissions
+# without a version (scripts, the load test) apply to the current row.
+#----------------------------------------------------------------------------#
+from flask import g, make_response, request, session
+from sqlalchemy import select, update
+
+from models import Artist, Venue, db
+
+ARTIST_FIELDS = ('name', 'genres', 'city', 'state', 'phone', 'website', 'image_link',
+                 'facebook_link', 'seeking_venue', 'seeking_description')
+VENUE_FIELDS = ('name', 'genres', 'address', 'city', 'state', 'phone', 'website', 'image_link',
+                'facebook_link', 'seeking_talent', 'seeking_description')
+# SelectFields whose options post "True"/"False"; their coerce=int turns
+# either into None, so the raw value is read instead.
+BOOLEAN_FIELDS = ('seeking_venue', 'seeking_talent')
+KINDS = {Artist: 'artist', Venue: 'venue'}
+
+
+class StaleEdit(Exception):
+    # `current` is the row's version now, or None if it was deleted.
+    def __init__(self, current):
+        super(StaleEdit, self).__init__('stale edit; current version %s' % current)
+        self.current = current
+
+
+def _normal(value):
+    # Blank form fields and NULL columns compare equal.
+    if value == '' or value == []:
+        return None
+    return value
+
+
+def load(model, id, fields):
+    # The row as a named tuple of id, version and `fields`, or None.
+    return db.session.execute(select(
+        model.id, model.version, *[getattr(model, field) for field in fields]
+    ).where(model.id == id)).first()
+
+
+def _flag(field):
+    value = field.raw_data[0] if field.raw_data else ''
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+def submitted(form, fields):
+    values = {}
+    for field in fields:
+        field = getattr(form, field)
+        values[field.name] = _flag(field) if field.name in BOOLEAN_FIELDS else field.data
+    return values
+
+
+def expected_version():
+    return request.form.get('version', type=int)
+
+
+def save(model, id, values, expected=None):
+    # {column: new value} for the columns that changed, after updating them.
+    # The caller commits.
+    row = load(model, id, values.keys())
+    if row is None:
+        raise StaleEdit(None)
+    if expected is not None and row.version != expected:
+        raise StaleEdit(row.version)
+    current = row._mapping
+    changes = dict((field, value) for field, value in values.items()
+                   if _normal(value) != _normal(current[field]))
+    if not changes:
+        return changes
+    result = db.session.execute(update(model).where(
+        model.id == id, model.version == row.version
+    ).values(version=model.version + 1, **changes).execution_options(synchronize_session=False))
+    if result.rowcount != 1:
+        raise StaleEdit(db.session.execute(select(model.version).where(model.id == id)).scalar())
+    return changes
+
+
+#  Conditional GET
+#  ----------------------------------------------------------------
+
+def read_primary():
+    # Edit pages skip the read replica: a lagging one would hand out an old
+    # version, and the save would then be rejected as stale.
+    g.read_replica = False
+
+
+def etag(model, id, version):
+    return '%s-%d-v%d' % (KINDS[model], id, version)
+
+
+def not_modified(model, id):
+    # A 304 response when the client's copy of the edit page is current.
+    # Pending flash messages are rendered by the page, so they force a 200.
+    if not request.if_none_match or session.get('_flashes'):
+        return None
+    version = db.session.execute(select(model.version).where(model.id == id)).scalar()
+    if version is None or not request.if_none_match.contains(etag(model, id, version)):
+        return None
+    response = make_response('', 304)
+    _revalidate(response, model, id, version)
+    return response
+
+
+def _revalidate(response, model, id, version):
+    response.set_etag(etag(model, id, version))
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+
+
+def edit_page(body, model, id, version, status=200):
+    response = make_response(body, status)
+    if status == 200:
+        _revalidate(response, model, id, version)
+    return response
@@ -4,11 +4,22 @@ from fabric.contrib.console import confirm
 # prepare for deployment
 
 
-def test():
+def seed(venues=10000, artists=5000, shows=200000):
+    local(
+        "python -m benchmarks.seed --venues {} --artists {} --shows {}".format(
+            venues, artists, shows)
+    )
+
+
+def test(concurrency=16):
+    # Seeds a throwaway dataset, drives every route and compares latency and
+    # throughput with benchmarks/baseline.json (written on the first run).
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m benchmarks.load_test --seed --writes --concurrency {} "
+            "--baseline benchmarks/baseline.json".format(concurrency), capture=True
         )
+    print(result)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Genre facets.
+#
+# Listings and search take ?genre= (repeatable; a row must have every genre
+# given) and report per-genre counts over the filtered result set. On
+# Postgres the filter is an array containment (@>) served by the GIN index
+# on genres, and the counts are one unnest() ... GROUP BY over the same
+# conditions. Other backends filter and count in Python.
+#----------------------------------------------------------------------------#
+from collections import Counter
+from sqlalchemy import cast, func, select
+
+from models import db
+from queries import Plan, run
+
+
+def parse_genres(values):
+    # Validated against genres_choices; ValueError names the unknown ones.
+    from forms import genres_choices
+    known = set(value for value, label in genres_choices)
+    genres = []
+    for value in values:
+        value = value.strip()
+        if value and value not in genres:
+            genres.append(value)
+    unknown = [value for value in genres if value not in known]
+    if unknown:
+        raise ValueError('unknown genres: ' + ', '.join(unknown))
+    return sorted(genres)
+
+
+def facet_counts(counts):
+    # [(genre, count)] -> [{'genre': ..., 'count': ...}], most common first.
+    return [{'genre': genre, 'count': count}
+            for genre, count in sorted(counts, key=lambda item: (-item[1], item[0]))]
+
+
+def count_genres(genre_lists):
+    return facet_counts(Counter(genre for genres in genre_lists
+                                for genre in set(genres or ())).items())
+
+
+def _native():
+    return db.engine.dialect.name == 'postgresql'
+
+
+#  Postgres
+#  ----------------------------------------------------------------
+
+def contains(model, genres):
+    # genres @> CAST(... AS <the column's array type>): VARCHAR[] for venues,
+    # TEXT[] for artists, and Postgres has no @> between the two. The columns
+    # use the generic ARRAY type, which has no contains().
+    return model.genres.op('@>')(cast(list(genres), model.genres.type))
+
+
+def facets_statement(model, conditions=()):
+    genre = func.unnest(model.genres).label('genre')
+    genres = select(genre).where(*conditions).subquery()
+    return select(genres.c.genre, func.count()).group_by(genres.c.genre)
+
+
+def facets_plan(model, conditions=()):
+    return Plan({'facets': facets_statement(model, conditions)},
+                lambda results: facet_counts(results['facets']))
+
+
+#  Entry points
+#  ----------------------------------------------------------------
+
+def conditions(model, genres):
+    # WHERE clauses restricting model to rows having every genre.
+    if not genres:
+        return []
+    if _native():
+        return [contains(model, genres)]
+    wanted = set(genres)
+    rows = db.session.execute(select(model.id, model.genres))
+    return [model.id.in_([id for id, row_genres in rows if wanted <= set(row_genres or ())])]
+
+
+def genre_facets(model, where=()):
+    if _native():
+        return run(facets_plan(model, where))
+    return count_genres(db.session.execute(select(model.genres).where(*where)).scalars())
@@ -0,0 +1,43 @@
+#----------------------------------------------------------------------------#
+# Template filters.
+#
+# babel and dateutil are imported on first use; they are a large share of
+# the app's import time and only pages showing dates need them.
+#----------------------------------------------------------------------------#
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Named formats used by the templates; anything else is a babel pattern.
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+    # Parsing the pattern and the locale is the expensive part of babel's
+    # format_datetime; both are fixed per (format, locale).
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=16)
+def _timezone(name):
+    from babel.dates import get_timezone
+    return get_timezone(name)
+
+
+def format_datetime(value, format='medium', locale='en_US', tz=None):
+    # Show times are stored as naive UTC datetimes. Strings are still
+    # accepted for callers that pass str(datetime).
+    if not isinstance(value, datetime):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    if tz is not None:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = value.astimezone(_timezone(tz))
+    pattern, locale = compiled_pattern(format, locale)
+    return pattern.apply(value, locale)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, SelectField, SelectMultipleField, DateTimeField
-from wtforms.validators import ValidationError, DataRequired, AnyOf, URL, Length
+from wtforms import StringField, TextAreaField, SelectField, SelectMultipleField, DateTimeField, IntegerField
+from wtforms.validators import ValidationError, DataRequired, AnyOf, URL, Length, NumberRange, Optional
 import re
 
 genres_choices = [
@@ -278,3 +278,8 @@ class ShowForm(FlaskForm):
         validators=[DataRequired()],
         default=datetime.today()
     )
+    # Minutes; the show books its venue and artist until start_time + duration.
+    duration = IntegerField(
+        'duration', validators=[Optional(), NumberRange(min=1, max=24 * 60)],
+        default=120
+    )
@@ -0,0 +1,59 @@
+#----------------------------------------------------------------------------#
+# Template fragment cache.
+#
+#   {% cache ('show-tile', show.id, show.artist_version, show.venue_version), 300 %}
+#       ... tile markup ...
+#   {% endcache %}
+#
+# The key is a string or a tuple of parts; include the id and version of
+# every entity the fragment displays, so an edit (which bumps the version)
+# moves readers to a fresh key instead of needing an explicit purge. The
+# TTL is optional and defaults to the fragment cache's own. Fragments are
+# stored in the backend configured by FRAGMENT_CACHE_* (see cache.py).
+#
+# Compiled templates go to a filesystem bytecode cache, so workers after the
+# first load them instead of compiling every template from source.
+#----------------------------------------------------------------------------#
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import MISSING
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super(FragmentCacheExtension, self).__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args),
+                               [], [], body).set_lineno(lineno)
+
+    def _render(self, key, ttl, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        if isinstance(key, (tuple, list)):
+            key = ':'.join(str(part) for part in key)
+        key = 'fragment:' + key
+        value = cache.get(key)
+        if value is MISSING:
+            value = caller()
+            cache.set(key, value, ttl)
+        return value
+
+
+def init_app(app, cache):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = cache
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(
+        app.config.get('TEMPLATE_BYTECODE_CACHE_DIR'))
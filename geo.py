@@ -0,0 +1,261 @@
+#----------------------------------------------------------------------------#
+# Nearby venues.
+#
+# Venues carry latitude/longitude, filled in from a local gazetteer:
+#
+#   flask geo import cities.csv           (city,state,latitude,longitude)
+#   flask geo import US.txt               (GeoNames dump, admin1 = state)
+#
+# On Postgres with the earthdistance extension, radius queries use the GiST
+# index on ll_to_earth(latitude, longitude). Everywhere else an in-process
+# grid of fixed-size lat/lon cells (a fixed-precision geohash) narrows the
+# candidates before the exact great-circle check.
+#----------------------------------------------------------------------------#
+import csv
+import math
+import threading
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, func, select, text
+
+from models import Venue, db
+from queries import Plan, run
+
+geo_cli = AppGroup('geo', help='Venue coordinates.')
+
+EARTH_RADIUS_KM = 6371.0
+GRID_DEGREES = 0.25
+BATCH_SIZE = 1000
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    # Haversine great-circle distance.
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _located():
+    return (Venue.latitude.isnot(None), Venue.longitude.isnot(None))
+
+
+def results_page(hits):
+    data = [{
+        'id': id,
+        'name': name,
+        'city': city,
+        'state': state,
+        'num_upcoming_shows': count,
+        'distance_km': round(distance, 2),
+    } for id, name, city, state, count, distance in hits]
+    return {
+        'count': len(data),
+        'data': data
+    }
+
+
+#  Postgres (earthdistance)
+#  ----------------------------------------------------------------
+
+_earthdistance = {}
+
+
+def has_earthdistance():
+    # Checked once per engine; the migration only creates the extension
+    # where it is available.
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        return False
+    if engine.url not in _earthdistance:
+        _earthdistance[engine.url] = db.session.execute(text(
+            "SELECT 1 FROM pg_extension WHERE extname = 'earthdistance'")).first() is not None
+    return _earthdistance[engine.url]
+
+
+def earthdistance_plan(lat, lon, radius_km, limit):
+    # earth_box() is the indexable bounding cube; earth_distance() trims it
+    # to the circle. ll_to_earth() works in metres.
+    origin = func.ll_to_earth(lat, lon)
+    point = func.ll_to_earth(Venue.latitude, Venue.longitude)
+    distance = func.earth_distance(origin, point)
+    radius = radius_km * 1000.0
+    statement = select(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count,
+        (distance / 1000.0).label('distance_km')
+    ).where(
+        *_located()
+    ).where(
+        func.earth_box(origin, radius).op('@>')(point),
+        distance <= radius,
+    ).order_by(distance).limit(limit)
+    return Plan({'hits': statement}, lambda results: results_page(results['hits']))
+
+
+#  In-process fallback
+#  ----------------------------------------------------------------
+
+class GridIndex(object):
+    # Venue coordinates bucketed into GRID_DEGREES cells. A radius query
+    # visits only the cells overlapping the circle's bounding box.
+
+    def __init__(self, degrees=GRID_DEGREES):
+        self.degrees = degrees
+        self.columns = int(round(360 / degrees))
+        self.lock = threading.Lock()
+        self.stale = True
+        self.cells = {}
+
+    def invalidate(self):
+        self.stale = True
+
+    def _cell(self, lat, lon):
+        return (int(math.floor(lat / self.degrees)),
+                int(math.floor((lon % 360.0) / self.degrees)) % self.columns)
+
+    def rebuild(self):
+        # Cleared before reading so a write that lands mid-rebuild marks the
+        # index stale again.
+        self.stale = False
+        cells = {}
+        rows = db.session.query(Venue.id, Venue.latitude, Venue.longitude).filter(*_located())
+        for row in rows.yield_per(1000):
+            cells.setdefault(self._cell(row.latitude, row.longitude), []).append(
+                (row.id, row.latitude, row.longitude))
+        self.cells = cells
+
+    def _columns(self, lat, lon, radius_km, lat_reach):
+        # Longitude degrees shrink towards the poles; past the point where
+        # the box wraps the globe every column is a candidate.
+        widest = math.cos(math.radians(min(90.0, abs(lat) + lat_reach)))
+        if widest <= 0 or radius_km >= math.pi * EARTH_RADIUS_KM * widest:
+            return range(self.columns)
+        lon_reach = math.degrees(radius_km / (EARTH_RADIUS_KM * widest))
+        first = int(math.floor(((lon - lon_reach) % 360.0) / self.degrees))
+        span = int(math.ceil(2 * lon_reach / self.degrees)) + 1
+        return [(first + i) % self.columns for i in range(min(span, self.columns))]
+
+    def within(self, lat, lon, radius_km):
+        # [(distance_km, id)] nearest first.
+        with self.lock:
+            if self.stale:
+                self.rebuild()
+            cells = self.cells
+
+        lat_reach = math.degrees(radius_km / EARTH_RADIUS_KM)
+        rows = range(int(math.floor((lat - lat_reach) / self.degrees)),
+                     int(math.floor((lat + lat_reach) / self.degrees)) + 1)
+        hits = []
+        for column in self._columns(lat, lon, radius_km, lat_reach):
+            for row in rows:
+                for id, venue_lat, venue_lon in cells.get((row, column), ()):
+                    distance = distance_km(lat, lon, venue_lat, venue_lon)
+                    if distance <= radius_km:
+                        hits.append((distance, id))
+        hits.sort()
+        return hits
+
+
+venue_grid = GridIndex()
+
+
+def _grid_nearby(lat, lon, radius_km, limit):
+    hits = venue_grid.within(lat, lon, radius_km)[:limit]
+    if not hits:
+        return results_page([])
+    rows = db.session.execute(select(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.upcoming_shows_count
+    ).where(Venue.id.in_([id for distance, id in hits]))).all()
+    by_id = dict((row.id, row) for row in rows)
+    return results_page([tuple(by_id[id]) + (distance,)
+                         for distance, id in hits if id in by_id])
+
+
+#  Entry points
+#  ----------------------------------------------------------------
+
+def nearby_args(args, default_radius_km, max_radius_km):
+    # (lat, lon, radius_km) from ?lat=&lon=&radius=; ValueError if invalid.
+    lat = float(args.get('lat', ''))
+    lon = float(args.get('lon', ''))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError('lat/lon out of range')
+    radius_km = float(args.get('radius') or default_radius_km)
+    return lat, lon, max(0.0, min(radius_km, max_radius_km))
+
+
+def nearby_venues(lat, lon, radius_km, limit):
+    if has_earthdistance():
+        return run(earthdistance_plan(lat, lon, radius_km, limit))
+    return _grid_nearby(lat, lon, radius_km, limit)
+
+
+def invalidate():
+    # Called after venue writes; the grid rebuilds on the next query.
+    venue_grid.invalidate()
+
+
+#  Gazetteer import
+#  ----------------------------------------------------------------
+
+def _area(city, state):
+    return ((city or '').strip().lower(), (state or '').strip().upper())
+
+
+def read_gazetteer(stream, fmt):
+    # {(city, state): (lat, lon)}. For GeoNames dumps the most populous
+    # place wins when a name repeats within a state.
+    places = {}
+    if fmt == 'csv':
+        for row in csv.DictReader(stream):
+            places.setdefault(_area(row['city'], row['state']),
+                              (float(row['latitude']), float(row['longitude'])))
+        return places
+
+    population = {}
+    for line in stream:
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) < 15:
+            continue
+        people = int(fields[14] or 0)
+        for name in set((fields[1], fields[2])):
+            key = _area(name, fields[10])
+            if people >= population.get(key, -1):
+                population[key] = people
+                places[key] = (float(fields[4]), float(fields[5]))
+    return places
+
+
+@geo_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'geonames']),
+              help='Defaults to csv for .csv files, geonames otherwise.')
+@click.option('--overwrite', is_flag=True, help='Also re-geocode venues that have coordinates.')
+def import_command(source, fmt, overwrite):
+    places = read_gazetteer(source, fmt or ('csv' if source.name.endswith('.csv') else 'geonames'))
+    query = select(Venue.id, Venue.city, Venue.state)
+    if not overwrite:
+        query = query.where(Venue.latitude.is_(None))
+
+    table = Venue.__table__
+    update = table.update().where(table.c.id == bindparam('_id')).values(
+        latitude=bindparam('_latitude'), longitude=bindparam('_longitude'))
+    located = missing = 0
+    pending = []
+    for row in db.session.execute(query).all():
+        place = places.get(_area(row.city, row.state))
+        if place is None:
+            missing += 1
+            continue
+        pending.append({'_id': row.id, '_latitude': place[0], '_longitude': place[1]})
+        if len(pending) == BATCH_SIZE:
+            db.session.execute(update, pending)
+            located += len(pending)
+            pending = []
+    if pending:
+        db.session.execute(update, pending)
+        located += len(pending)
+    db.session.commit()
+    invalidate()
+    click.echo('geocoded %d venues from %d places, %d not found' % (located, len(places), missing))
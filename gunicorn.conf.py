@@ -0,0 +1,3 @@
+# Import wsgi.py (create_app + warm_up) in the master before forking.
+wsgi_app = 'wsgi:app'
+preload_app = True
@@ -0,0 +1,346 @@
+#----------------------------------------------------------------------------#
+# Image proxy and thumbnail cache.
+#
+#   /img/<kind>/<id>/<size>?v=<version>      kind: artist | venue
+#
+# Venue and artist images are fetched from their image_link once, resized to
+# one of SIZES (WebP when the client accepts it, JPEG otherwise) in a thread
+# pool, and kept in a disk cache under IMAGE_CACHE_DIR:
+#
+#   sources/<url hash>                  sha256 of the fetched bytes
+#   originals/<ab>/<content hash>       the fetched bytes
+#   thumbs/<ab>/<content hash>.<size>.<webp|jpg>
+#
+# Thumbnails are named by the hash of the source bytes, so entities sharing
+# an image share its thumbnails. The cache is trimmed to
+# IMAGE_CACHE_MAX_BYTES, least recently served first. Templates link images
+# with image_url(kind, id, image_link, size); the ?v= it adds changes with
+# image_link, so a matching response is cached by browsers for a year.
+#
+# IMAGE_FETCH is the callable (url -> bytes) used to download sources;
+# file_fetch serves local paths, e.g. in tests. Without Pillow, or when the
+# source cannot be fetched or decoded, the endpoint redirects to image_link.
+#----------------------------------------------------------------------------#
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import socket
+import ssl
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlparse
+from urllib.request import (HTTPHandler, HTTPRedirectHandler, HTTPSHandler, ProxyHandler,
+                            Request, build_opener)
+
+from flask import abort, current_app, redirect, request, send_file, url_for
+from sqlalchemy import select
+
+from models import Artist, Venue, db
+
+logger = logging.getLogger(__name__)
+
+KINDS = {'artist': Artist, 'venue': Venue}
+# Bounding boxes; images keep their aspect ratio and are never enlarged.
+SIZES = {
+    'tile': (400, 400),
+    'full': (1000, 1000),
+}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+MAX_AGE = 365 * 24 * 60 * 60
+FALLBACK_MAX_AGE = 300
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+
+
+def _hash(value):
+    return hashlib.sha256(value).hexdigest()
+
+
+def version(image_link):
+    return _hash(image_link.encode('utf-8'))[:10]
+
+
+#  Fetchers
+#  ----------------------------------------------------------------
+
+def _allowed(address):
+    return ipaddress.ip_address(address.split('%')[0]).is_global
+
+
+def _check_url(url):
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError('refusing to fetch %r' % url)
+
+
+def _public_address(host, port):
+    # Image links are user input: refuse to fetch from the server's own
+    # network. The connection goes to the address checked here, so the name
+    # cannot resolve somewhere else in between.
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError('cannot resolve %r' % host)
+    if not addresses or not all(_allowed(address[4][0]) for address in addresses):
+        raise ValueError('refusing to fetch from %r' % host)
+    return addresses[0][4][0]
+
+
+class _PublicHTTPConnection(HTTPConnection):
+    def connect(self):
+        self.sock = socket.create_connection(
+            (_public_address(self.host, self.port), self.port), self.timeout)
+
+
+class _PublicHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        sock = socket.create_connection(
+            (_public_address(self.host, self.port), self.port), self.timeout)
+        # Certificates are still checked against the host name.
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class _PublicHTTPHandler(HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _RedirectHandler(HTTPRedirectHandler):
+    # Every hop connects through the handlers above; its scheme is checked
+    # here.
+    max_redirections = 5
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_url(newurl)
+        return HTTPRedirectHandler.redirect_request(self, req, fp, code, msg, headers, newurl)
+
+
+# No proxies: the address checks only hold for direct connections.
+_opener = build_opener(ProxyHandler({}), _PublicHTTPHandler,
+                       _PublicHTTPSHandler(context=ssl.create_default_context()),
+                       _RedirectHandler)
+
+
+def http_fetch(url):
+    _check_url(url)
+    with _opener.open(Request(url, headers={'User-Agent': 'fyyur-images'}),
+                      timeout=FETCH_TIMEOUT) as response:
+        data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError('%s is larger than %d bytes' % (url, MAX_SOURCE_BYTES))
+    return data
+
+
+def file_fetch(url):
+    # Local paths and file:// URLs.
+    path = urlparse(url).path if url.startswith('file://') else url
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+#  Resizing
+#  ----------------------------------------------------------------
+
+def has_pillow():
+    return find_spec('PIL') is not None
+
+
+def resize(data, box, fmt):
+    from PIL import Image, ImageOps
+    image = Image.open(io.BytesIO(data))
+    # JPEG sources decode straight at a reduced scale.
+    image.draft('RGB', box)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(box, Image.LANCZOS, reducing_gap=3.0)
+    name, mimetype, options = FORMATS[fmt]
+    if name == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGBA')
+        flat = Image.new('RGB', image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel('A'))
+        image = flat
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    out = io.BytesIO()
+    image.save(out, name, **options)
+    return out.getvalue()
+
+
+#  Disk cache
+#  ----------------------------------------------------------------
+
+class ThumbnailCache(object):
+    # Files under `directory`, trimmed to max_bytes in least recently used
+    # order. Each process tracks the order in memory, seeded from mtimes
+    # (bumped on every hit) when it starts. Resizing runs on `workers`
+    # threads; concurrent requests for the same thumbnail share one job.
+
+    def __init__(self, directory, max_bytes, fetch=http_fetch, workers=4):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fetch = fetch
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='fyyur-images')
+        self.pending = {}
+        self.files = None
+        self.total = 0
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def _load(self):
+        # Called with the lock held.
+        if self.files is not None:
+            return
+        found = []
+        for root, dirs, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+        found.sort()
+        self.files = OrderedDict((path, size) for mtime, path, size in found)
+        self.total = sum(self.files.values())
+
+    def _touch(self, path):
+        with self.lock:
+            self._load()
+            if path in self.files:
+                self.files.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+        with open(partial, 'wb') as f:
+            f.write(data)
+        os.replace(partial, path)
+        with self.lock:
+            self._load()
+            self.total += len(data) - self.files.pop(path, 0)
+            self.files[path] = len(data)
+            while self.total > self.max_bytes and len(self.files) > 1:
+                oldest, size = self.files.popitem(last=False)
+                self.total -= size
+                try:
+                    os.remove(oldest)
+                except OSError:
+                    pass
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        return data
+
+    def _digest(self, url):
+        data = self._read(self._path('sources', _hash(url.encode('utf-8'))))
+        return data.decode('ascii') if data is not None else None
+
+    def _thumbnail(self, url, size, fmt):
+        # The source is only fetched when the url has not been seen, or its
+        # original was evicted since.
+        digest = self._digest(url)
+        data = None
+        if digest is not None:
+            path = self._path('thumbs', digest[:2], '%s.%s.%s' % (digest, size, fmt))
+            if os.path.exists(path):
+                self._touch(path)
+                return path
+            data = self._read(self._path('originals', digest[:2], digest))
+        if data is None:
+            data = self.fetch(url)
+            digest = _hash(data)
+            self._write(self._path('originals', digest[:2], digest), data)
+            self._write(self._path('sources', _hash(url.encode('utf-8'))), digest.encode('ascii'))
+        path = self._path('thumbs', digest[:2], '%s.%s.%s' % (digest, size, fmt))
+        self._write(path, resize(data, SIZES[size], fmt))
+        return path
+
+    def thumbnail(self, url, size, fmt):
+        # Path of the cached thumbnail, generating it if needed.
+        key = (url, size, fmt)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pending[key] = self.pool.submit(self._thumbnail, url, size, fmt)
+        try:
+            return future.result()
+        finally:
+            with self.lock:
+                if self.pending.get(key) is future:
+                    del self.pending[key]
+
+
+#  Views
+#  ----------------------------------------------------------------
+
+def image_url(kind, id, image_link, size='tile'):
+    if not image_link:
+        return ''
+    return url_for('image', kind=kind, id=id, size=size, v=version(image_link))
+
+
+def _fallback(image_link):
+    response = redirect(image_link)
+    response.cache_control.max_age = FALLBACK_MAX_AGE
+    return response
+
+
+def image(kind, id, size):
+    if kind not in KINDS or size not in SIZES:
+        abort(404)
+    model = KINDS[kind]
+    image_link = db.session.execute(select(model.image_link).where(model.id == id)).scalar()
+    if not image_link:
+        abort(404)
+    if not has_pillow():
+        return _fallback(image_link)
+    fmt = 'webp' if request.accept_mimetypes['image/webp'] else 'jpg'
+    # Unversioned or stale links may change under this url. The file name
+    # is content-addressed, unlike its mtime, which moves with every hit.
+    current = request.args.get('v') == version(image_link)
+    try:
+        path = current_app.extensions['images'].thumbnail(image_link, size, fmt)
+        response = send_file(path, mimetype=FORMATS[fmt][1], conditional=True,
+                             etag=os.path.basename(path),
+                             max_age=MAX_AGE if current else FALLBACK_MAX_AGE)
+    except Exception:
+        # Includes a thumbnail evicted between generation and sending.
+        logger.exception('serving %s %s from image_link: %s', kind, id, image_link)
+        return _fallback(image_link)
+    response.vary.add('Accept')
+    response.cache_control.public = True
+    response.cache_control.immutable = current or None
+    return response
+
+
+def init_app(app):
+    directory = app.config.get('IMAGE_CACHE_DIR') or os.path.join(app.instance_path, 'images')
+    app.extensions['images'] = ThumbnailCache(
+        directory, app.config['IMAGE_CACHE_MAX_BYTES'],
+        fetch=app.config.get('IMAGE_FETCH') or http_fetch,
+        workers=app.config['IMAGE_WORKERS'])
+    app.add_url_rule('/img/<kind>/<int:id>/<size>', 'image', image)
+    app.jinja_env.globals['image_url'] = image_url
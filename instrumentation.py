@@ -0,0 +1,169 @@
+#----------------------------------------------------------------------------#
+# Request instrumentation.
+#
+# Records, for every request, the number of SQL statements, time spent in
+# the database, template render time and wall time. Each request gets a
+# Server-Timing header and one JSON log line; totals per endpoint are
+# aggregated in process and served at /_metrics in Prometheus text format.
+#----------------------------------------------------------------------------#
+import json
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, Response, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.requests')
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        line = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        line.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            line['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(line, default=str)
+
+
+# One handler for the process; addHandler ignores it when a logger already
+# has it, so apps created later (tests, the ASGI wrapper) do not add more.
+handler = logging.StreamHandler()
+handler.setFormatter(JSONFormatter())
+
+
+class Metrics(object):
+    FIELDS = ('requests', 'queries', 'db_seconds', 'render_seconds', 'seconds', 'n_plus_one')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.collectors = []
+
+    def record(self, endpoint, sample):
+        with self.lock:
+            totals = self.endpoints.setdefault(endpoint, dict.fromkeys(self.FIELDS, 0))
+            totals['requests'] += 1
+            totals['queries'] += sample['queries']
+            totals['db_seconds'] += sample['db_ms'] / 1000.0
+            totals['render_seconds'] += sample['render_ms'] / 1000.0
+            totals['seconds'] += sample['total_ms'] / 1000.0
+            totals['n_plus_one'] += int(sample['n_plus_one'])
+
+    def add_collector(self, fn):
+        # fn() returns an iterable of (name, help, value) for extra counters.
+        self.collectors.append(fn)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            snapshot = dict((endpoint, dict(totals)) for endpoint, totals in self.endpoints.items())
+        for field in self.FIELDS:
+            name = 'fyyur_request_%s_total' % field
+            if field == 'requests':
+                name = 'fyyur_requests_total'
+            lines.append('# TYPE %s counter' % name)
+            for endpoint, totals in sorted(snapshot.items()):
+                lines.append('%s{endpoint="%s"} %s' % (name, endpoint, round(totals[field], 6)))
+        for collector in self.collectors:
+            for name, help, value in collector():
+                lines.append('# HELP %s %s' % (name, help))
+                lines.append('# TYPE %s counter' % name)
+                lines.append('%s %s' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+#  SQLAlchemy hooks
+#  ----------------------------------------------------------------
+# Registered on the Engine class so every engine (including a read replica)
+# is covered. Statements outside a request are ignored.
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context: a statement that raises never
+    # reaches after_cursor_execute.
+    context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'timing' in g:
+        g.timing['queries'] += 1
+        g.timing['db'] += time.perf_counter() - context._query_start
+
+
+#  Flask hooks
+#  ----------------------------------------------------------------
+
+def _before_request():
+    g.timing = {'start': time.perf_counter(), 'queries': 0, 'db': 0.0, 'render': 0.0}
+
+
+def _before_render(sender, template, context, **extra):
+    if 'timing' in g:
+        g.timing['render_start'] = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    if 'timing' in g and 'render_start' in g.timing:
+        g.timing['render'] += time.perf_counter() - g.timing.pop('render_start')
+
+
+def _after_request(response):
+    timing = g.pop('timing', None)
+    if timing is None:
+        return response
+
+    threshold = current_app.config.get('N_PLUS_ONE_QUERY_THRESHOLD', 20)
+    total = time.perf_counter() - timing['start']
+    endpoint = request.endpoint or 'unmatched'
+    sample = {
+        'method': request.method,
+        'path': request.path,
+        'endpoint': endpoint,
+        'status': response.status_code,
+        'queries': timing['queries'],
+        'db_ms': round(timing['db'] * 1000, 2),
+        'render_ms': round(timing['render'] * 1000, 2),
+        'total_ms': round(total * 1000, 2),
+        'n_plus_one': timing['queries'] > threshold,
+    }
+
+    response.headers['Server-Timing'] = (
+        'db;dur=%(db_ms)s;desc="%(queries)d queries", '
+        'render;dur=%(render_ms)s, total;dur=%(total_ms)s' % sample)
+
+    if endpoint != 'metrics':
+        metrics.record(endpoint, sample)
+    if sample['n_plus_one']:
+        logger.warning('possible N+1: %d queries in %s', sample['queries'], endpoint,
+                       extra={'fields': sample})
+    else:
+        logger.info('request', extra={'fields': sample})
+    return response
+
+
+def _metrics_view():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    for log in (logger, app.logger):
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+    logger.propagate = False
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+    app.add_url_rule('/_metrics', 'metrics', _metrics_view)
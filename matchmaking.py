@@ -0,0 +1,331 @@
+#----------------------------------------------------------------------------#
+# Artist-venue matchmaking.
+#
+# Venues seeking talent and artists seeking a venue are matched on
+#   genres      Jaccard overlap of genre bitmasks (one bit per genres_choices
+#               entry); pairs without a shared genre never match
+#   location    same state, and more so the same city
+#   history     how many past shows each side has, plus a bonus when the
+#               artist has played the venue before
+# Scores are computed with NumPy over whole blocks of venues x artists, and
+# the best TOP_K per venue and per artist are stored in VenueMatch and
+# ArtistMatch, so a page only reads a handful of indexed rows.
+#
+#   flask matches rebuild   (full batch, e.g. nightly)
+#
+# Creating or editing a venue or artist enqueues a background job that
+# rescores just that row against the other side (entity_changed): its own
+# list and the lists it was already in are recomputed, and it is spliced
+# into any other list it now makes, leaving the same lists a rebuild would.
+#----------------------------------------------------------------------------#
+import math
+import timeit
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, func, select
+
+from models import Venue, Artist, Show, VenueMatch, ArtistMatch, db
+import cache
+from tasks import task
+
+matches_cli = AppGroup('matches', help='Precomputed artist/venue recommendations.')
+
+TOP_K = 20
+BLOCK_SIZE = 512
+GENRE_WEIGHT = 0.6
+LOCATION_WEIGHT = 0.25
+EXPERIENCE_WEIGHT = 0.1
+REBOOK_WEIGHT = 0.05
+# Past shows at which the experience term saturates.
+EXPERIENCE_SHOWS = 50
+# Edits to other columns leave the scores unchanged.
+SCORED_COLUMNS = frozenset(['genres', 'city', 'state', 'seeking_talent', 'seeking_venue'])
+
+
+class Side(object):
+    # One side of the match: whose lists `table` holds, keyed by `owner`.
+
+    def __init__(self, model, seeking, table, owner, match):
+        self.model = model
+        self.seeking = seeking
+        self.table = table
+        self.owner = owner
+        self.match = match
+
+
+VENUES = Side(Venue, Venue.seeking_talent, VenueMatch, 'venue_id', 'artist_id')
+ARTISTS = Side(Artist, Artist.seeking_venue, ArtistMatch, 'artist_id', 'venue_id')
+
+
+def _other(side):
+    return ARTISTS if side is VENUES else VENUES
+
+
+#  Features
+#  ----------------------------------------------------------------
+
+class Features(object):
+    # Column arrays for a set of venues or artists, row i = ids[i].
+
+    def __init__(self, rows, genre_bits, areas):
+        import numpy as np
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.masks = np.array([sum(genre_bits.get(genre, 0) for genre in set(row.genres or ()))
+                               for row in rows], dtype=np.uint32)
+        self.sizes = _popcount(self.masks)
+        self.states = np.array([areas.setdefault(('', _norm(row.state)), len(areas)) if row.state else -1
+                                for row in rows], dtype=np.int64)
+        self.cities = np.array([areas.setdefault((_norm(row.city), _norm(row.state)), len(areas))
+                                if row.city else -1 for row in rows], dtype=np.int64)
+        self.experience = np.array([min(1.0, math.log1p(row.past_shows_count or 0)
+                                        / math.log1p(EXPERIENCE_SHOWS)) for row in rows],
+                                   dtype=np.float32)
+        self.seeking = np.array([bool(row.seeking) for row in rows], dtype=bool)
+        self.index = dict((id, i) for i, id in enumerate(self.ids.tolist()))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _norm(value):
+    return (value or '').strip().lower()
+
+
+def _popcount(values):
+    import numpy as np
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int32)
+    bytes_ = values.astype(np.uint32).view(np.uint8).reshape(values.shape + (4,))
+    return np.unpackbits(bytes_, axis=-1).sum(axis=-1).astype(np.int32)
+
+
+def _genre_bits():
+    from forms import genres_choices
+    return dict((value, 1 << bit) for bit, (value, label) in enumerate(genres_choices))
+
+
+def load(side, genre_bits, areas, ids=None):
+    model = side.model
+    query = select(model.id, model.genres, model.city, model.state,
+                   model.past_shows_count, side.seeking.label('seeking')).order_by(model.id)
+    if ids is not None:
+        query = query.where(model.id.in_(ids))
+    return Features(db.session.execute(query).all(), genre_bits, areas)
+
+
+def played(venues, artists, venue_ids=None, artist_ids=None):
+    # Row indices into venues and artists of the pairs with a past show.
+    import numpy as np
+    query = select(Show.venue_id, Show.artist_id).where(
+        Show.start_time < datetime.utcnow()).distinct()
+    if venue_ids is not None:
+        query = query.where(Show.venue_id.in_(venue_ids))
+    if artist_ids is not None:
+        query = query.where(Show.artist_id.in_(artist_ids))
+    pairs = [(venues.index[venue_id], artists.index[artist_id])
+             for venue_id, artist_id in db.session.execute(query)
+             if venue_id in venues.index and artist_id in artists.index]
+    return (np.array([i for i, j in pairs], dtype=np.int64),
+            np.array([j for i, j in pairs], dtype=np.int64))
+
+
+def scores(venues, artists, rows=slice(None), rebook=None):
+    # len(rows) x len(artists) float32 scores for venues[rows]; -inf where
+    # there is no shared genre. rebook is played() for the same features.
+    import numpy as np
+    masks = venues.masks[rows][:, None]
+    shared = _popcount(masks & artists.masks[None, :])
+    union = venues.sizes[rows][:, None] + artists.sizes[None, :] - shared
+    genre = shared / np.maximum(union, 1)
+
+    states = venues.states[rows][:, None]
+    same_state = (states == artists.states[None, :]) & (states >= 0)
+    cities = venues.cities[rows][:, None]
+    same_city = (cities == artists.cities[None, :]) & (cities >= 0)
+    location = 0.5 * same_state + 0.5 * same_city
+
+    experience = (venues.experience[rows][:, None] + artists.experience[None, :]) / 2
+    result = (GENRE_WEIGHT * genre + LOCATION_WEIGHT * location
+              + EXPERIENCE_WEIGHT * experience).astype(np.float32)
+
+    if rebook is not None:
+        start, stop, _ = rows.indices(len(venues))
+        venue_rows, artist_rows = rebook
+        inside = (venue_rows >= start) & (venue_rows < stop)
+        result[venue_rows[inside] - start, artist_rows[inside]] += REBOOK_WEIGHT
+    result[shared == 0] = -np.inf
+    return result
+
+
+def _top(values, k):
+    # Indices of the k largest values per row, best first. The sort is
+    # stable, so ties go to the lower index (the lower id), as they do in
+    # the incremental path.
+    import numpy as np
+    return np.argsort(-values, axis=1, kind='stable')[:, :k]
+
+
+#  Batch rebuild
+#  ----------------------------------------------------------------
+
+def rebuild(top_k=TOP_K, block_size=BLOCK_SIZE):
+    # Recomputes every list in blocks of venues; memory stays at
+    # block_size x artists. The caller commits.
+    import numpy as np
+    genre_bits = _genre_bits()
+    areas = {}
+    venues = load(VENUES, genre_bits, areas)
+    artists = load(ARTISTS, genre_bits, areas)
+    rebook = played(venues, artists)
+
+    venue_rows = []
+    best_scores = np.full((len(artists), 0), -np.inf, dtype=np.float32)
+    best_venues = np.zeros((len(artists), 0), dtype=np.int64)
+    for start in range(0, len(venues), block_size):
+        rows = slice(start, min(start + block_size, len(venues)))
+        block = scores(venues, artists, rows, rebook)
+
+        # Each venue's best artists among those seeking a venue.
+        offered = np.where(artists.seeking[None, :], block, -np.inf)
+        for i, top in enumerate(_top(offered, top_k)):
+            venue_id = int(venues.ids[start + i])
+            venue_rows.extend({'venue_id': venue_id, 'artist_id': int(artists.ids[j]),
+                               'score': float(offered[i, j])}
+                              for j in top if np.isfinite(offered[i, j]))
+
+        # Merge this block's venues seeking talent into each artist's best.
+        offered = np.where(venues.seeking[rows][:, None], block, -np.inf).T
+        candidates = np.concatenate([best_scores, offered], axis=1)
+        candidate_venues = np.concatenate(
+            [best_venues, np.broadcast_to(np.arange(rows.start, rows.stop), offered.shape)], axis=1)
+        top = _top(candidates, top_k)
+        best_scores = np.take_along_axis(candidates, top, axis=1)
+        best_venues = np.take_along_axis(candidate_venues, top, axis=1)
+
+    artist_rows = [{'artist_id': int(artists.ids[j]), 'venue_id': int(venues.ids[best_venues[j, n]]),
+                    'score': float(best_scores[j, n])}
+                   for j, n in zip(*np.nonzero(np.isfinite(best_scores)))]
+
+    db.session.execute(VenueMatch.delete())
+    db.session.execute(ArtistMatch.delete())
+    if venue_rows:
+        db.session.execute(VenueMatch.insert(), venue_rows)
+    if artist_rows:
+        db.session.execute(ArtistMatch.insert(), artist_rows)
+    return len(venue_rows), len(artist_rows)
+
+
+#  Incremental updates
+#  ----------------------------------------------------------------
+
+def _relist(side, owner_ids, top_k, genre_bits, areas):
+    # Replaces the stored lists of owner_ids (venues for side=VENUES) with
+    # their best top_k on the other side, exactly as rebuild() would.
+    # Returns the owners' features and their scores against the other side.
+    import numpy as np
+    other = _other(side)
+    owners = load(side, genre_bits, areas, ids=owner_ids)
+    others = load(other, genre_bits, areas)
+    if side is VENUES:
+        block = scores(owners, others, rebook=played(owners, others, venue_ids=owner_ids))
+    else:
+        block = scores(others, owners, rebook=played(others, owners, artist_ids=owner_ids)).T
+
+    table = side.table
+    db.session.execute(table.delete().where(table.c[side.owner].in_(owner_ids)))
+    offered = np.where(others.seeking[None, :], block, -np.inf)
+    rows = [{side.owner: int(owners.ids[i]), side.match: int(others.ids[j]),
+             'score': float(offered[i, j])}
+            for i, top in enumerate(_top(offered, top_k)) for j in top if np.isfinite(offered[i, j])]
+    if rows:
+        db.session.execute(table.insert(), rows)
+    return owners, others, block
+
+
+def entity_changed(side, entity_id, top_k=TOP_K):
+    # Rescore one venue (side=VENUES) or artist against the other side:
+    # its own list is replaced, the lists it was in are recomputed, and it
+    # is added to any other list it now makes. Returns the ids whose lists
+    # changed on the other side. The caller commits.
+    import numpy as np
+    other = _other(side)
+    genre_bits = _genre_bits()
+    areas = {}
+    this, others, block = _relist(side, [entity_id], top_k, genre_bits, areas)
+    if not len(this):
+        return set()
+    row = block[0]
+
+    # Lists it was in may now rank it lower, or drop it for an entry that
+    # was not stored, so they are rebuilt from scratch.
+    theirs = other.table
+    affected = set(db.session.execute(select(theirs.c[other.owner]).where(
+        theirs.c[other.match] == entity_id)).scalars())
+    if affected:
+        _relist(other, sorted(affected), top_k, genre_bits, areas)
+    if not this.seeking[0]:
+        return affected
+
+    # Other lists with room, or whose worst entry this one beats. Ties go to
+    # the lower id, as in rebuild().
+    owner, match, score = theirs.c[other.owner], theirs.c[other.match], theirs.c.score
+    ranked = select(owner, match, score, func.count().over(partition_by=owner).label('count'),
+                    func.row_number().over(partition_by=owner, order_by=(score, match.desc()))
+                    .label('rank')).subquery()
+    lists = dict((owner_id, (count, worst, worst_id)) for owner_id, worst_id, worst, count
+                 in db.session.execute(select(*ranked.c[:4]).where(ranked.c.rank == 1)))
+    inserts = []
+    full = []
+    for j in np.nonzero(np.isfinite(row))[0]:
+        owner_id = int(others.ids[j])
+        if owner_id in affected:
+            continue
+        count, worst, worst_id = lists.get(owner_id, (0, None, None))
+        if count < top_k:
+            inserts.append({other.owner: owner_id, other.match: entity_id, 'score': float(row[j])})
+        elif row[j] > worst or (row[j] == worst and entity_id < worst_id):
+            inserts.append({other.owner: owner_id, other.match: entity_id, 'score': float(row[j])})
+            full.append({'_owner': owner_id})
+    if full:
+        # Drop each full list's lowest entry.
+        lowest = select(match).where(owner == bindparam('_owner')).order_by(
+            score, match.desc()).limit(1).scalar_subquery()
+        db.session.execute(theirs.delete().where(owner == bindparam('_owner'), match == lowest), full)
+    if inserts:
+        db.session.execute(theirs.insert(), inserts)
+    return affected | set(row[other.owner] for row in inserts)
+
+
+@task('matches.venue_changed')
+def venue_changed(venue_id):
+    _apply(VENUES, venue_id)
+
+
+@task('matches.artist_changed')
+def artist_changed(artist_id):
+    _apply(ARTISTS, artist_id)
+
+
+def _apply(side, entity_id):
+    # Runs as a job, so a failure is retried instead of failing the write.
+    affected = list(entity_changed(side, entity_id))
+    db.session.commit()
+    if side is VENUES:
+        cache.invalidate_pages(venue_ids=[entity_id], artist_ids=affected)
+    else:
+        cache.invalidate_pages(venue_ids=affected, artist_ids=[entity_id])
+
+
+#  CLI
+#  ----------------------------------------------------------------
+
+@matches_cli.command('rebuild')
+@click.option('--top-k', default=TOP_K, show_default=True)
+def rebuild_command(top_k):
+    started = timeit.default_timer()
+    venue_rows, artist_rows = rebuild(top_k)
+    db.session.commit()
+    click.echo('%d venue matches, %d artist matches in %.2fs' % (
+        venue_rows, artist_rows, timeit.default_timer() - started))
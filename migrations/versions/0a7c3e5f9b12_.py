@@ -0,0 +1,50 @@
+"""venue coordinates and earthdistance index
+
+Revision ID: 0a7c3e5f9b12
+Revises: f6b2d9e1c4a7
+Create Date: 2026-10-18 15:04:52.116384
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7c3e5f9b12'
+down_revision = 'f6b2d9e1c4a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+
+    # earthdistance is a contrib extension; without it (or the rights to
+    # create it) nearby search uses the in-process grid instead.
+    bind = op.get_bind()
+    available = bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'earthdistance'")).first()
+    if available is None:
+        return
+    try:
+        with bind.begin_nested():
+            bind.execute(sa.text('CREATE EXTENSION IF NOT EXISTS cube'))
+            bind.execute(sa.text('CREATE EXTENSION IF NOT EXISTS earthdistance'))
+    except sa.exc.DBAPIError as error:
+        logging.getLogger('alembic.runtime.migration').warning(
+            'earthdistance not installed: %s', error)
+        return
+    op.execute('''
+        CREATE INDEX "ix_Venue_earth" ON "Venue"
+            USING gist (ll_to_earth(latitude, longitude))
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    ''')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_earth"')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
@@ -0,0 +1,29 @@
+"""GIN indexes on Venue and Artist genres
+
+Revision ID: 1c5e8a2d4f60
+Revises: 0a7c3e5f9b12
+Create Date: 2026-10-18 15:48:09.730215
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5e8a2d4f60'
+down_revision = '0a7c3e5f9b12'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    # Serves the genres @> ARRAY[...] filters in facets.py.
+    for table in TABLES:
+        op.create_index('ix_{}_genres'.format(table), table, ['genres'],
+                        unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{}_genres'.format(table), table_name=table)
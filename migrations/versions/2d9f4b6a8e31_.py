@@ -0,0 +1,42 @@
+"""VenueMatch and ArtistMatch recommendation tables
+
+Revision ID: 2d9f4b6a8e31
+Revises: 1c5e8a2d4f60
+Create Date: 2026-10-18 16:31:44.902517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d9f4b6a8e31'
+down_revision = '1c5e8a2d4f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('VenueMatch',
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('score', sa.Float(), nullable=False),
+                    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('venue_id', 'artist_id'))
+    op.create_index('ix_VenueMatch_venue_id_score', 'VenueMatch', ['venue_id', 'score'], unique=False)
+    op.create_table('ArtistMatch',
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('score', sa.Float(), nullable=False),
+                    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('artist_id', 'venue_id'))
+    op.create_index('ix_ArtistMatch_artist_id_score', 'ArtistMatch', ['artist_id', 'score'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_ArtistMatch_artist_id_score', table_name='ArtistMatch')
+    op.drop_table('ArtistMatch')
+    op.drop_index('ix_VenueMatch_venue_id_score', table_name='VenueMatch')
+    op.drop_table('VenueMatch')
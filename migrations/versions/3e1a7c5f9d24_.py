@@ -0,0 +1,38 @@
+"""Job table for background tasks
+
+Revision ID: 3e1a7c5f9d24
+Revises: 2d9f4b6a8e31
+Create Date: 2026-10-18 17:12:05.318664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e1a7c5f9d24'
+down_revision = '2d9f4b6a8e31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Job',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=120), nullable=False),
+                    sa.Column('payload', sa.JSON(), nullable=False),
+                    sa.Column('status', sa.String(length=10), nullable=False),
+                    sa.Column('attempts', sa.Integer(), nullable=False),
+                    sa.Column('max_attempts', sa.Integer(), nullable=False),
+                    sa.Column('run_at', sa.DateTime(), nullable=False),
+                    sa.Column('locked_until', sa.DateTime(), nullable=True),
+                    sa.Column('locked_by', sa.String(length=120), nullable=True),
+                    sa.Column('last_error', sa.Text(), nullable=True),
+                    sa.Column('created_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_Job_status_run_at', 'Job', ['status', 'run_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Job_status_run_at', table_name='Job')
+    op.drop_table('Job')
@@ -0,0 +1,42 @@
+"""ON DELETE CASCADE on the Show foreign keys
+
+The constraints are swapped in NOT VALID, which only takes a brief lock,
+and validated afterwards outside the migration's transaction, so existing
+rows are checked without blocking writes to "Show".
+
+Revision ID: 4b8e2f6a1d37
+Revises: 3e1a7c5f9d24
+Create Date: 2026-10-18 18:03:27.640192
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e2f6a1d37'
+down_revision = '3e1a7c5f9d24'
+branch_labels = None
+depends_on = None
+
+FOREIGN_KEYS = (
+    ('Show_venue_id_fkey', 'venue_id', 'Venue'),
+    ('Show_artist_id_fkey', 'artist_id', 'Artist'),
+)
+
+
+def _replace(on_delete):
+    for name, column, referred in FOREIGN_KEYS:
+        op.drop_constraint(name, 'Show', type_='foreignkey')
+        op.execute('ALTER TABLE "Show" ADD CONSTRAINT "%s" FOREIGN KEY (%s) '
+                   'REFERENCES "%s" (id)%s NOT VALID' % (name, column, referred, on_delete))
+    with op.get_context().autocommit_block():
+        for name, column, referred in FOREIGN_KEYS:
+            op.execute('ALTER TABLE "Show" VALIDATE CONSTRAINT "%s"' % name)
+
+
+def upgrade():
+    _replace(' ON DELETE CASCADE')
+
+
+def downgrade():
+    _replace('')
@@ -0,0 +1,61 @@
+"""full-text search vectors for Venue and Artist
+
+Revision ID: 8c4f6a2e1d57
+Revises: 5b1e2c7d9f30
+Create Date: 2026-10-18 10:03:15.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f6a2e1d57'
+down_revision = '5b1e2c7d9f30'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}city, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string({row}genres, ' '), '')), 'C')
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute("""
+        CREATE FUNCTION fyyur_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """.format(SEARCH_VECTOR.format(row='NEW.')))
+
+    for table in TABLES:
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute('UPDATE "{}" SET search_vector = {}'.format(
+            table, SEARCH_VECTOR.format(row='')))
+        op.execute("""
+            CREATE TRIGGER "{0}_search_vector_update"
+            BEFORE INSERT OR UPDATE OF name, city, genres ON "{0}"
+            FOR EACH ROW EXECUTE PROCEDURE fyyur_search_vector_update()
+        """.format(table))
+        op.create_index('ix_{}_search_vector'.format(table), table, ['search_vector'],
+                        unique=False, postgresql_using='gin')
+        op.create_index('ix_{}_name_trgm'.format(table), table, ['name'],
+                        unique=False, postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.execute('DROP TRIGGER "{0}_search_vector_update" ON "{0}"'.format(table))
+        op.drop_column(table, 'search_vector')
+    op.execute('DROP FUNCTION fyyur_search_vector_update()')
@@ -0,0 +1,43 @@
+"""denormalized show counters on Venue and Artist
+
+Revision ID: b93d0e5a7c21
+Revises: 8c4f6a2e1d57
+Create Date: 2026-10-18 11:26:02.731904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b93d0e5a7c21'
+down_revision = '8c4f6a2e1d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('CounterState',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('rolled_until', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    for table, column in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       server_default='0', nullable=False))
+        op.execute("""
+            UPDATE "{table}" SET
+                upcoming_shows_count = (SELECT count(*) FROM "Shows"
+                    WHERE "Shows".{column} = "{table}".id AND start_time > now() at time zone 'utc'),
+                past_shows_count = (SELECT count(*) FROM "Shows"
+                    WHERE "Shows".{column} = "{table}".id AND start_time <= now() at time zone 'utc')
+        """.format(table=table, column=column))
+    op.execute("""INSERT INTO "CounterState" (id, rolled_until) VALUES (1, now() at time zone 'utc')""")
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('CounterState')
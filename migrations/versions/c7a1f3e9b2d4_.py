@@ -0,0 +1,93 @@
+"""Show model with surrogate key (expand)
+
+Creates "Show" next to the old "Shows" association table, mirrors writes to
+"Shows" into it with a trigger, and copies the existing rows in batches,
+each in its own transaction, so the table is never locked for the whole
+copy. Deploy the code that uses "Show" after this revision, then run the
+contract revision (d2e8b4c6a913) to drop "Shows".
+
+Revision ID: c7a1f3e9b2d4
+Revises: b93d0e5a7c21
+Create Date: 2026-10-18 12:04:51.266310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a1f3e9b2d4'
+down_revision = 'b93d0e5a7c21'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 10000
+
+
+def upgrade():
+    op.create_table('Show',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('start_time', sa.DateTime(), nullable=False),
+                    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+                    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index(op.f('ix_Show_start_time'), 'Show', ['start_time'], unique=False)
+
+    # Keep "Show" in step with writes made by the old code while copying.
+    op.execute("""
+        CREATE FUNCTION fyyur_mirror_shows() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO "Show" (venue_id, artist_id, start_time)
+                VALUES (NEW.venue_id, NEW.artist_id, coalesce(NEW.start_time, now() at time zone 'utc'));
+            ELSE
+                DELETE FROM "Show" WHERE venue_id = OLD.venue_id AND artist_id = OLD.artist_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER "Shows_mirror" AFTER INSERT OR DELETE ON "Shows"
+        FOR EACH ROW EXECUTE PROCEDURE fyyur_mirror_shows()
+    """)
+
+    # Batched backfill, keyset-walking the old (venue_id, artist_id) key.
+    # Rows the trigger already mirrored are skipped.
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last = (0, 0)
+        while True:
+            row = connection.execute(sa.text("""
+                WITH batch AS (
+                    SELECT venue_id, artist_id, start_time FROM "Shows"
+                    WHERE (venue_id, artist_id) > (:venue_id, :artist_id)
+                    ORDER BY venue_id, artist_id
+                    LIMIT :batch_size
+                ), copied AS (
+                    INSERT INTO "Show" (venue_id, artist_id, start_time)
+                    SELECT venue_id, artist_id, coalesce(start_time, now() at time zone 'utc')
+                    FROM batch b
+                    WHERE NOT EXISTS (SELECT 1 FROM "Show" s
+                                      WHERE s.venue_id = b.venue_id AND s.artist_id = b.artist_id)
+                )
+                SELECT venue_id, artist_id FROM batch
+                ORDER BY venue_id DESC, artist_id DESC LIMIT 1
+            """), {'venue_id': last[0], 'artist_id': last[1], 'batch_size': BATCH_SIZE}).first()
+            if row is None:
+                break
+            last = (row.venue_id, row.artist_id)
+
+
+def downgrade():
+    # Already gone when coming down from the contract revision.
+    op.execute('DROP TRIGGER IF EXISTS "Shows_mirror" ON "Shows"')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_mirror_shows()')
+    op.drop_index(op.f('ix_Show_start_time'), table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_table('Show')
@@ -0,0 +1,42 @@
+"""drop the old Shows association table (contract)
+
+Run after the code using the "Show" model is deployed.
+
+Revision ID: d2e8b4c6a913
+Revises: c7a1f3e9b2d4
+Create Date: 2026-10-18 12:05:37.904418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e8b4c6a913'
+down_revision = 'c7a1f3e9b2d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('DROP TRIGGER "Shows_mirror" ON "Shows"')
+    op.execute('DROP FUNCTION fyyur_mirror_shows()')
+    op.drop_table('Shows')
+
+
+def downgrade():
+    # Several shows of the same artist at the same venue collapse to the
+    # earliest one, as the old composite key allows only one.
+    op.create_table('Shows',
+                    sa.Column('venue_id', sa.Integer(), nullable=False),
+                    sa.Column('artist_id', sa.Integer(), nullable=False),
+                    sa.Column('start_time', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+                    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+                    sa.PrimaryKeyConstraint('venue_id', 'artist_id'))
+    op.create_index(op.f('ix_Shows_start_time'), 'Shows', ['start_time'], unique=False)
+    op.execute("""
+        INSERT INTO "Shows" (venue_id, artist_id, start_time)
+        SELECT venue_id, artist_id, min(start_time) FROM "Show"
+        GROUP BY venue_id, artist_id
+    """)
@@ -0,0 +1,27 @@
+"""version column on Venue and Artist
+
+Revision ID: e4f1a7c3b5d8
+Revises: d2e8b4c6a913
+Create Date: 2026-10-18 13:02:11.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f1a7c3b5d8'
+down_revision = 'd2e8b4c6a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(),
+                                       server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,59 @@
+"""show end_time and double-booking exclusion constraints
+
+Revision ID: f6b2d9e1c4a7
+Revises: e4f1a7c3b5d8
+Create Date: 2026-10-18 14:20:37.519832
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b2d9e1c4a7'
+down_revision = 'e4f1a7c3b5d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    # Existing shows get the default two hours, cut short where the next
+    # show at the same venue or by the same artist starts earlier. Exact
+    # duplicates end up as empty ranges, which overlap nothing.
+    op.execute('''
+        UPDATE "Show" SET end_time = LEAST(
+            start_time + interval '2 hours',
+            COALESCE(next_venue_start, 'infinity'),
+            COALESCE(next_artist_start, 'infinity'))
+        FROM (
+            SELECT id AS show_id,
+                   lead(start_time) OVER (PARTITION BY venue_id ORDER BY start_time, id) AS next_venue_start,
+                   lead(start_time) OVER (PARTITION BY artist_id ORDER BY start_time, id) AS next_artist_start
+            FROM "Show"
+        ) AS next
+        WHERE "Show".id = next.show_id
+    ''')
+    op.alter_column('Show', 'end_time', nullable=False)
+
+    # btree_gist lets the integer equality share a GiST index with the range.
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    op.execute('''
+        ALTER TABLE "Show" ADD COLUMN during tsrange
+            GENERATED ALWAYS AS (tsrange(start_time, end_time, '[)')) STORED
+    ''')
+    op.execute('''
+        ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_venue_during"
+            EXCLUDE USING gist (venue_id WITH =, during WITH &&)
+    ''')
+    op.execute('''
+        ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_artist_during"
+            EXCLUDE USING gist (artist_id WITH =, during WITH &&)
+    ''')
+
+
+def downgrade():
+    op.drop_constraint('ex_Show_artist_during', 'Show')
+    op.drop_constraint('ex_Show_venue_during', 'Show')
+    op.drop_column('Show', 'during')
+    op.drop_column('Show', 'end_time')
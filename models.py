@@ -2,31 +2,122 @@
 # Imports
 # ----------------------------------------------------------------------------#
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from flask_sqlalchemy.session import Session
 from flask_moment import Moment
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify
-from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
+from sqlalchemy.sql import Select
+from flask import g, has_request_context
+from datetime import datetime, timedelta
 
 #----------------------------------------------------------------------------#
-# App Config.
+# Extensions. Bound to an app by create_app() in app.py.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app, session_options={'expire_on_commit': False})
-migrate = Migrate(app, db)
+
+class RoutingSession(Session):
+    # SELECTs issued while handling a GET go to the read replica bind when
+    # one is configured; flushes and everything else use the primary.
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and isinstance(clause, Select)
+                and has_request_context() and g.get('read_replica')):
+            replica = self._db.engines.get('replica')
+            if replica is not None:
+                return replica
+        return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+moment = Moment()
+db = SQLAlchemy(session_options={'expire_on_commit': False, 'class_': RoutingSession})
+
+
+def after_commit(fn):
+    # Calls fn() once the current transaction commits; dropped on rollback.
+    db.session.info.setdefault('after_commit', []).append(fn)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _run_after_commit(session):
+    for fn in session.info.pop('after_commit', ()):
+        fn()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_after_commit(session):
+    session.info.pop('after_commit', None)
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
-Shows = db.Table('Shows',
-                 db.Column('venue_id', db.Integer, db.ForeignKey(
-                     'Venue.id'), primary_key=True),
-                 db.Column('artist_id', db.Integer, db.ForeignKey(
-                     'Artist.id'), primary_key=True),
-                 db.Column('start_time', db.DateTime, default=datetime.utcnow()
-                           ))
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+MAX_SHOW_DURATION = timedelta(hours=24)
+
+
+def _default_end_time(context):
+    return context.get_current_parameters()['start_time'] + DEFAULT_SHOW_DURATION
+
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Deleting a venue or artist deletes its shows in the database.
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+    # Callable default: evaluated per insert, not once at import.
+    start_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # A show books its venue and artist for [start_time, end_time). On
+    # Postgres the migration adds a generated tsrange column, "during", with
+    # GiST exclusion constraints per venue and per artist (see bookings.py).
+    end_time = db.Column(db.DateTime, nullable=False, default=_default_end_time)
+    venue = db.relationship("Venue", back_populates="shows")
+    artist = db.relationship("Artist", back_populates="shows")
+
+# Single row: shows starting at or before rolled_until are counted as past
+# in the Venue/Artist show counters (see counters.py).
+CounterState = db.Table('CounterState',
+                        db.Column('id', db.Integer, primary_key=True),
+                        db.Column('rolled_until', db.DateTime, nullable=False))
+
+# Precomputed top-k recommendations: for each venue the best artists seeking
+# a venue, and for each artist the best venues seeking talent (see
+# matchmaking.py). Pages only read these.
+VenueMatch = db.Table('VenueMatch',
+                      db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'),
+                                primary_key=True),
+                      db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'),
+                                primary_key=True),
+                      db.Column('score', db.Float, nullable=False),
+                      db.Index('ix_VenueMatch_venue_id_score', 'venue_id', 'score'))
+ArtistMatch = db.Table('ArtistMatch',
+                       db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'),
+                                 primary_key=True),
+                       db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'),
+                                 primary_key=True),
+                       db.Column('score', db.Float, nullable=False),
+                       db.Index('ix_ArtistMatch_artist_id_score', 'artist_id', 'score'))
+
+
+# Background jobs (see tasks.py). Finished jobs are deleted; ones that ran
+# out of attempts stay as 'failed' with the last traceback.
+Job = db.Table('Job',
+               db.Column('id', db.Integer, primary_key=True),
+               db.Column('name', db.String(120), nullable=False),
+               db.Column('payload', db.JSON, nullable=False),
+               db.Column('status', db.String(10), nullable=False, default='queued'),
+               db.Column('attempts', db.Integer, nullable=False, default=0),
+               db.Column('max_attempts', db.Integer, nullable=False),
+               db.Column('run_at', db.DateTime, nullable=False),
+               db.Column('locked_until', db.DateTime),
+               db.Column('locked_by', db.String(120)),
+               db.Column('last_error', db.Text),
+               db.Column('created_at', db.DateTime, nullable=False, default=datetime.utcnow),
+               db.Index('ix_Job_status_run_at', 'status', 'run_at'))
 
 
 class Venue(db.Model):
@@ -34,7 +125,7 @@ class Venue(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(db.ARRAY(db.String()).with_variant(db.JSON, 'sqlite'))
     address = db.Column(db.String(120))
     city = db.Column(db.String(120), index=True)
     state = db.Column(db.String(120), index=True)
@@ -44,9 +135,24 @@ class Venue(db.Model):
     website = db.Column(db.String(100))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    artists = db.relationship("Artist", secondary=Shows,
-                              backref=db.backref('Venue',
-                                                 cascade="all,delete"), lazy=True)
+    # Degrees (WGS 84), set by `flask geo import`; see geo.py.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # Maintained by a trigger over name, city and genres (see migrations).
+    search_vector = deferred(db.Column(
+        TSVECTOR().with_variant(db.Text(), 'sqlite')))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped on every ORM update; part of the template fragment cache keys.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # lazy='select' by default; detail queries can switch to
+    # selectinload()/joinedload() per query via .options().
+    shows = db.relationship("Show", back_populates="venue",
+                            cascade="all, delete-orphan", passive_deletes=True, lazy='select')
+    # Read-only shortcut through Show; bookings are written as Show rows.
+    artists = db.relationship("Artist", secondary='Show', viewonly=True, lazy='select')
+
+    __mapper_args__ = {'version_id_col': version}
 
 
 class Artist(db.Model):
@@ -54,7 +160,7 @@ class Artist(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.Text))
+    genres = db.Column(db.ARRAY(db.Text).with_variant(db.JSON, 'sqlite'))
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -63,5 +169,13 @@ class Artist(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.Text)
-    venues = db.relationship("Venue", secondary=Shows,
-                             backref="Artist", lazy=True)
+    search_vector = deferred(db.Column(
+        TSVECTOR().with_variant(db.Text(), 'sqlite')))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    shows = db.relationship("Show", back_populates="artist",
+                            cascade="all, delete-orphan", passive_deletes=True, lazy='select')
+    venues = db.relationship("Venue", secondary='Show', viewonly=True, lazy='select')
+
+    __mapper_args__ = {'version_id_col': version}
@@ -0,0 +1,334 @@
+#----------------------------------------------------------------------------#
+# Query builders.
+#
+# Shared by the HTML views in app.py, the JSON API and the ASGI read path, so
+# every listing is assembled from a fixed number of round trips instead of
+# one query per row. Each builder returns a Plan: the statements to run and
+# a function shaping their rows into view data. run() executes a plan on the
+# Flask-SQLAlchemy session; run_async() on an AsyncSession.
+#----------------------------------------------------------------------------#
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from itertools import groupby
+
+from sqlalchemy import func, select, tuple_
+
+from models import Venue, Artist, Show, VenueMatch, ArtistMatch, db
+
+
+class Plan(object):
+    def __init__(self, statements, shape):
+        self.statements = statements
+        self.shape = shape
+
+
+def run(plan):
+    return plan.shape(dict((name, db.session.execute(statement).all())
+                           for name, statement in plan.statements.items()))
+
+
+async def run_async(session, plan):
+    results = {}
+    for name, statement in plan.statements.items():
+        results[name] = (await session.execute(statement)).all()
+    return plan.shape(results)
+
+
+#  Venue areas
+#  ----------------------------------------------------------------
+
+def venue_areas_plan(conditions=()):
+    # Upcoming counts come from the maintained counter column, so the
+    # listing is one plain scan of Venue ordered by area.
+    statement = select(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.version,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).where(
+        *conditions
+    ).order_by(
+        Venue.state, Venue.city, Venue.id
+    )
+
+    def shape(results):
+        areas = []
+        for (city, state), venues in groupby(results['areas'], key=lambda row: (row.city, row.state)):
+            areas.append({
+                'city': city,
+                'state': state,
+                'venues': [{
+                    'id': venue.id,
+                    'name': venue.name,
+                    'version': venue.version,
+                    'num_upcoming_shows': venue.num_upcoming_shows
+                } for venue in venues]
+            })
+        return areas
+
+    return Plan({'areas': statement}, shape)
+
+
+def venue_areas(conditions=()):
+    return run(venue_areas_plan(conditions))
+
+
+#  Venue and artist pages
+#  ----------------------------------------------------------------
+
+def _show_listing(owner_column, other, prefix, owner_id, past_limit, past_page, now):
+    # Shows of one venue (or artist) joined to the other side of the booking.
+    # Without a cap this is one query split in a single pass; with a cap the
+    # upcoming shows, one page of past shows and the past count are fetched
+    # separately so the page cost no longer grows with the show history.
+    base = select(
+        Show.start_time,
+        other.id,
+        other.name,
+        other.image_link
+    ).join(
+        other, other.id == getattr(Show, prefix + '_id')
+    ).where(owner_column == owner_id)
+
+    def show_info(row):
+        return {
+            prefix + '_id': row.id,
+            prefix + '_name': row.name,
+            prefix + '_image_link': row.image_link,
+            'start_time': row.start_time
+        }
+
+    if past_limit is None:
+        statements = {'shows': base.order_by(Show.start_time)}
+
+        def shape(results):
+            past_shows = []
+            upcoming_shows = []
+            for row in results['shows']:
+                if row.start_time < now:
+                    past_shows.append(show_info(row))
+                else:
+                    upcoming_shows.append(show_info(row))
+            past_shows.reverse()
+            return past_shows, upcoming_shows, len(past_shows)
+
+        return statements, shape
+
+    statements = {
+        'upcoming': base.where(Show.start_time >= now).order_by(Show.start_time),
+        'past': base.where(Show.start_time < now).order_by(
+            Show.start_time.desc()).limit(past_limit).offset((past_page - 1) * past_limit),
+        'past_count': select(func.count()).select_from(Show).where(
+            owner_column == owner_id, Show.start_time < now),
+    }
+
+    def shape(results):
+        return ([show_info(row) for row in results['past']],
+                [show_info(row) for row in results['upcoming']],
+                results['past_count'][0][0])
+
+    return statements, shape
+
+
+def _matches_statement(table, owner, other, prefix, entity_id):
+    # The precomputed recommendations (see matchmaking.py), best first.
+    return select(other.id, other.name, other.image_link, table.c.score).join(
+        other, other.id == table.c[prefix + '_id']
+    ).where(
+        table.c[owner] == entity_id
+    ).order_by(table.c.score.desc()).limit(MATCHES_SHOWN)
+
+
+def _detail_plan(model, fields, owner_column, other, prefix, entity_id, past_limit, past_page, now,
+                 matches):
+    if now is None:
+        now = datetime.utcnow()
+    statements, listing = _show_listing(owner_column, other, prefix, entity_id,
+                                        past_limit, past_page, now)
+    statements = dict(statements, entity=select(model).where(model.id == entity_id),
+                      matches=matches)
+
+    def shape(results):
+        if not results['entity']:
+            return None
+        entity = results['entity'][0][0]
+        past_shows, upcoming_shows, past_count = listing(results)
+        data = dict((field, getattr(entity, field)) for field in fields)
+        data.update({
+            'past_shows': past_shows,
+            'upcoming_shows': upcoming_shows,
+            'past_shows_count': past_count,
+            'upcoming_shows_count': len(upcoming_shows),
+            'past_page': past_page,
+            'past_pages': _page_count(past_count, past_limit),
+            'matches': [{
+                prefix + '_id': row.id,
+                prefix + '_name': row.name,
+                prefix + '_image_link': row.image_link,
+                'score': row.score
+            } for row in results['matches']],
+        })
+        return data
+
+    return Plan(statements, shape)
+
+
+VENUE_DETAIL_FIELDS = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website',
+                       'facebook_link', 'seeking_talent', 'seeking_description', 'image_link')
+ARTIST_DETAIL_FIELDS = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+                        'facebook_link', 'image_link', 'seeking_venue', 'seeking_description')
+# Recommended artists/venues listed on a venue/artist page.
+MATCHES_SHOWN = 6
+
+
+def venue_detail_plan(venue_id, past_limit=None, past_page=1, now=None):
+    return _detail_plan(Venue, VENUE_DETAIL_FIELDS, Show.venue_id, Artist, 'artist',
+                        venue_id, past_limit, past_page, now,
+                        _matches_statement(VenueMatch, 'venue_id', Artist, 'artist', venue_id))
+
+
+def artist_detail_plan(artist_id, past_limit=None, past_page=1, now=None):
+    return _detail_plan(Artist, ARTIST_DETAIL_FIELDS, Show.artist_id, Venue, 'venue',
+                        artist_id, past_limit, past_page, now,
+                        _matches_statement(ArtistMatch, 'artist_id', Venue, 'venue', artist_id))
+
+
+def venue_detail(venue_id, past_limit=None, past_page=1, now=None):
+    return run(venue_detail_plan(venue_id, past_limit, past_page, now))
+
+
+def artist_detail(artist_id, past_limit=None, past_page=1, now=None):
+    return run(artist_detail_plan(artist_id, past_limit, past_page, now))
+
+
+def _page_count(count, per_page):
+    if not per_page:
+        return 1
+    return max(1, -(-count // per_page))
+
+
+#  Upcoming shows feed
+#  ----------------------------------------------------------------
+
+def encode_show_cursor(start_time, show_id):
+    raw = '%s|%d' % (start_time.isoformat(), show_id)
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_show_cursor(cursor):
+    # Malformed cursors restart the feed from the beginning.
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        start_time, show_id = raw.split('|')
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def upcoming_shows_plan(limit, after=None, now=None):
+    # Keyset pagination on (start_time, id), which matches the sort order so
+    # each page is an index range scan from the cursor.
+    if now is None:
+        now = datetime.utcnow()
+
+    key = tuple_(Show.start_time, Show.id)
+    statement = select(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Show.artist_id,
+        Venue.name.label('venue_name'),
+        Venue.version.label('venue_version'),
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Artist.version.label('artist_version')
+    ).join(
+        Venue, Venue.id == Show.venue_id
+    ).join(
+        Artist, Artist.id == Show.artist_id
+    ).where(Show.start_time > now)
+
+    position = decode_show_cursor(after) if after else None
+    if position is not None:
+        statement = statement.where(key > tuple_(*position))
+
+    statement = statement.order_by(
+        Show.start_time, Show.id
+    ).limit(limit + 1)
+
+    def shape(results):
+        rows = results['shows']
+        shows = [{
+            "id": row.id,
+            "venue_id": row.venue_id,
+            "venue_name": row.venue_name,
+            "venue_version": row.venue_version,
+            "artist_id": row.artist_id,
+            "artist_name": row.artist_name,
+            "artist_image_link": row.artist_image_link,
+            "artist_version": row.artist_version,
+            "start_time": row.start_time
+        } for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_show_cursor(last.start_time, last.id)
+        return shows, next_cursor
+
+    return Plan({'shows': statement}, shape)
+
+
+def upcoming_shows_page(limit, after=None, now=None):
+    return run(upcoming_shows_plan(limit, after, now))
+
+
+#  Projections and sideloads
+#  ----------------------------------------------------------------
+
+def entity_rows_plan(model, fields, ids=None, limit=None, offset=0, conditions=()):
+    # Column projection: only the requested columns are selected.
+    statement = select(*[getattr(model, field) for field in fields]).where(*conditions)
+    if ids is not None:
+        statement = statement.where(model.id.in_(ids))
+    statement = statement.order_by(model.id)
+    if limit is not None:
+        statement = statement.limit(limit).offset(offset)
+
+    def shape(results):
+        return [dict(zip(fields, row)) for row in results['rows']]
+
+    return Plan({'rows': statement}, shape)
+
+
+def entity_rows(model, fields, ids=None, limit=None, offset=0, conditions=()):
+    return run(entity_rows_plan(model, fields, ids, limit, offset, conditions))
+
+
+def shows_by_owner(owner_column, other, prefix, owner_ids):
+    # Shows for many venues (or artists) in one query, grouped by owner.
+    if not owner_ids:
+        return {}
+    rows = db.session.execute(select(
+        owner_column.label('owner_id'),
+        Show.start_time,
+        other.id,
+        other.name,
+        other.image_link
+    ).join(
+        other, other.id == getattr(Show, prefix + '_id')
+    ).where(
+        owner_column.in_(owner_ids)
+    ).order_by(owner_column, Show.start_time)).all()
+
+    shows = {}
+    for row in rows:
+        shows.setdefault(row.owner_id, []).append({
+            prefix + '_id': row.id,
+            prefix + '_name': row.name,
+            prefix + '_image_link': row.image_link,
+            'start_time': row.start_time
+        })
+    return shows
@@ -0,0 +1,196 @@
+#----------------------------------------------------------------------------#
+# Search.
+#
+# On Postgres, venue and artist search uses the trigger-maintained
+# search_vector column (GIN indexed) for ranked prefix matching, OR'd with a
+# trigram-indexed ILIKE on name so partial matches ("Hop") keep working.
+# Other backends, SQLite in particular, fall back to an in-process inverted
+# index built from the same fields. Both narrow by genre and return genre
+# facet counts over all matches (see facets.py).
+#----------------------------------------------------------------------------#
+import re
+import threading
+from bisect import bisect_left
+from sqlalchemy import func, or_, select
+
+from models import Venue, Artist, db
+from queries import Plan, run
+import facets
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Field weights, matching the setweight() labels in the migration.
+NAME_WEIGHT = 1.0
+CITY_WEIGHT = 0.4
+GENRE_WEIGHT = 0.2
+
+
+def tokenize(text):
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+def upcoming_show_counts(model, ids):
+    # One query for every hit, read from the maintained counter column.
+    if not ids:
+        return {}
+    rows = db.session.query(model.id, model.upcoming_shows_count).filter(
+        model.id.in_(ids)).all()
+    return dict(rows)
+
+
+#  Postgres
+#  ----------------------------------------------------------------
+
+def postgres_search_plan(model, term, limit, genres=()):
+    tokens = tokenize(term)
+    conditions = [facets.contains(model, genres)] if genres else []
+    statement = select(model.id, model.name, model.upcoming_shows_count)
+    if not tokens:
+        statement = statement.where(*conditions).order_by(model.name).limit(limit)
+    else:
+        tsquery = func.to_tsquery('simple', ' & '.join(token + ':*' for token in tokens))
+        rank = func.ts_rank_cd(model.search_vector, tsquery)
+        conditions.append(or_(
+            model.search_vector.op('@@')(tsquery),
+            model.name.icontains(term, autoescape=True)
+        ))
+        statement = statement.where(*conditions).order_by(rank.desc(), model.name).limit(limit)
+    return Plan({'hits': statement, 'facets': facets.facets_statement(model, conditions)},
+                lambda results: results_page(results['hits'], facets.facet_counts(results['facets'])))
+
+
+#  In-process fallback
+#  ----------------------------------------------------------------
+
+class Snapshot(object):
+    # One consistent build of the index; never modified once built.
+
+    def __init__(self, names, genres, postings):
+        self.names = names
+        self.genres = genres
+        self.postings = postings
+        self.tokens = sorted(postings)
+
+    def prefix_scores(self, prefix):
+        scores = {}
+        start = bisect_left(self.tokens, prefix)
+        for token in self.tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            for id, weight in self.postings[token].items():
+                scores[id] = max(scores.get(id, 0), weight)
+        return scores
+
+
+class SearchIndex(object):
+    # Inverted index over name, city and genres. Tokens are kept sorted so a
+    # prefix lookup is a bisect plus a short scan rather than a full pass.
+    # A rebuild swaps in a new Snapshot with one assignment, so searches
+    # running meanwhile keep reading the one they started with.
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.stale = True
+        self.snapshot = Snapshot({}, {}, {})
+
+    def invalidate(self):
+        self.stale = True
+
+    def rebuild(self):
+        # Cleared before reading so a write that lands mid-rebuild marks the
+        # index stale again.
+        self.stale = False
+        names = {}
+        genres = {}
+        postings = {}
+        rows = db.session.query(self.model.id, self.model.name,
+                                self.model.city, self.model.genres)
+        for row in rows.yield_per(1000):
+            names[row.id] = row.name or ''
+            genres[row.id] = frozenset(row.genres or ())
+            fields = ((row.name, NAME_WEIGHT), (row.city, CITY_WEIGHT),
+                      (' '.join(row.genres or []), GENRE_WEIGHT))
+            for text, weight in fields:
+                for token in tokenize(text):
+                    entry = postings.setdefault(token, {})
+                    entry[row.id] = entry.get(row.id, 0) + weight
+        self.snapshot = Snapshot(names, genres, postings)
+
+    def search(self, term, limit, genres=()):
+        # ([(id, name)] best first, genre facet counts over every match).
+        with self.lock:
+            if self.stale:
+                self.rebuild()
+        snapshot = self.snapshot
+        names = snapshot.names
+
+        tokens = tokenize(term)
+        if not tokens:
+            ranked = sorted(names, key=lambda id: names[id])
+        else:
+            # Every token must match as a prefix (the tsquery '&'); any
+            # case-insensitive substring of the name matches as well (the ILIKE).
+            scores = None
+            for token in tokens:
+                matched = snapshot.prefix_scores(token)
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = dict((id, score + matched[id])
+                                  for id, score in scores.items() if id in matched)
+            needle = term.lower()
+            for id, name in names.items():
+                if id not in scores and needle in name.lower():
+                    scores[id] = 0
+            ranked = sorted(scores, key=lambda id: (-scores[id], names[id]))
+
+        if genres:
+            wanted = set(genres)
+            ranked = [id for id in ranked if wanted <= snapshot.genres[id]]
+        counts = facets.count_genres(snapshot.genres[id] for id in ranked)
+        return [(id, names[id]) for id in ranked[:limit]], counts
+
+
+venue_index = SearchIndex(Venue)
+artist_index = SearchIndex(Artist)
+
+
+#  Entry points
+#  ----------------------------------------------------------------
+
+def results_page(hits, genre_facets=None):
+    data = [{
+        'id': id,
+        'name': name,
+        'num_upcoming_shows': count
+    } for id, name, count in hits]
+    return {
+        'count': len(data),
+        'data': data,
+        'facets': genre_facets or []
+    }
+
+
+def _search(model, index, term, limit, genres):
+    if db.engine.dialect.name == 'postgresql':
+        return run(postgres_search_plan(model, term, limit, genres))
+
+    hits, genre_facets = index.search(term, limit, genres)
+    counts = upcoming_show_counts(model, [id for id, name in hits])
+    return results_page([(id, name, counts.get(id, 0)) for id, name in hits], genre_facets)
+
+
+def search_venues(term, limit, genres=()):
+    return _search(Venue, venue_index, term, limit, genres)
+
+
+def search_artists(term, limit, genres=()):
+    return _search(Artist, artist_index, term, limit, genres)
+
+
+def invalidate():
+    # Called after writes; the fallback index rebuilds on the next search.
+    # Postgres keeps search_vector current through its trigger.
+    venue_index.invalidate()
+    artist_index.invalidate()
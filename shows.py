@@ -0,0 +1,93 @@
+#----------------------------------------------------------------------------#
+# Show views.
+#----------------------------------------------------------------------------#
+from datetime import timedelta
+from flask import Blueprint, current_app, render_template, request, flash
+from sqlalchemy.exc import IntegrityError
+
+from models import DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION, Show, db
+from queries import upcoming_shows_page
+import bookings
+import cache
+import counters
+
+blueprint = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/shows')
+def shows():
+    # displays list of shows at /shows
+    # Done: replace with real venues data.
+    #       num_shows should be aggregated based on number of upcoming shows per venue.(DONE)
+    data = []
+    next_cursor = None
+    limit = request.args.get('limit', current_app.config['SHOWS_PER_PAGE'], type=int)
+    limit = max(1, min(limit, current_app.config['SHOWS_MAX_PER_PAGE']))
+    try:
+        data, next_cursor = upcoming_shows_page(
+            limit, after=request.args.get('after'))
+    except Exception as error:
+        print(error)
+        pass
+
+    return render_template("pages/shows.html", shows=data, next_cursor=next_cursor, limit=limit)
+
+
+@blueprint.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+def _double_booked(show_form, booking_conflict):
+    flash("Show could not be listed: the %s is already booked at that time." % booking_conflict)
+    return render_template('forms/new_show.html', form=show_form), 409
+
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # Done: insert form data as a new Show record in the db, instead(DONE)
+    from forms import ShowForm
+    show_form = ShowForm()
+
+    artist_id = show_form.artist_id.data
+    venue_id = show_form.venue_id.data
+    start_time = show_form.start_time.data
+    duration = DEFAULT_SHOW_DURATION
+    if show_form.duration.data:
+        duration = min(timedelta(minutes=max(show_form.duration.data, 1)), MAX_SHOW_DURATION)
+
+    try:
+        end_time = start_time + duration
+        show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, end_time=end_time)
+        booking_conflict = bookings.conflict(venue_id, artist_id, start_time, end_time)
+        if booking_conflict:
+            return _double_booked(show_form, booking_conflict)
+        db.session.add(show)
+        db.session.flush()
+        counters.shows_added([{'venue_id': venue_id, 'artist_id': artist_id,
+                               'start_time': start_time}])
+        db.session.commit()
+        bookings.booked(venue_id, artist_id, start_time, end_time)
+        cache.invalidate_pages(venue_ids=[venue_id], artist_ids=[artist_id])
+        # on successful db insert, flash success
+        flash("Show was successfully listed!")
+    except IntegrityError as error:
+        db.session.rollback()
+        booking_conflict = bookings.conflict_from_error(error)
+        if booking_conflict:
+            return _double_booked(show_form, booking_conflict)
+        flash("An error occurred. Show could not be listed.")
+        print(error)
+    except Exception as error:
+        flash("An error occurred. Show could not be listed.")
+        db.session.rollback()
+        db.session.flush()
+        print(error)
+    return render_template("pages/home.html")
@@ -0,0 +1,216 @@
+#----------------------------------------------------------------------------#
+# Background tasks.
+#
+# Handlers enqueue follow-up work as rows in the Job table, inside their own
+# transaction, so a job exists exactly when the write that asked for it
+# committed. Jobs are run by
+#   - a small pool of threads inside each app process (TASK_WORKERS,
+#     started on the first enqueue so it survives gunicorn's fork), and/or
+#   - `flask worker`, which runs the same loop in the foreground.
+# Workers claim a job with a conditional UPDATE (plus SKIP LOCKED on
+# Postgres), then delete it and run it in one transaction: a task that
+# commits (to invalidate caches only once its writes are visible, say)
+# commits the deletion with it, and one that raises rolls both back. A
+# failing job is retried with exponential backoff up to max_attempts and
+# then kept as 'failed'. A job whose worker died is picked up again once
+# its lease expires.
+#
+#   @task('matches.venue_changed')
+#   def venue_changed(venue_id): ...
+#
+#   tasks.enqueue('matches.venue_changed', venue_id=venue.id)
+#----------------------------------------------------------------------------#
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, event, or_, select, update
+
+from models import Job, db
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+MAX_ATTEMPTS = 5
+BACKOFF = timedelta(seconds=5)
+LEASE = timedelta(minutes=5)
+POLL_SECONDS = 1.0
+
+
+def task(name):
+    def register(fn):
+        REGISTRY[name] = fn
+        return fn
+    return register
+
+
+def enqueue(name, max_attempts=MAX_ATTEMPTS, **payload):
+    # Added to the current transaction; the caller commits.
+    if name not in REGISTRY:
+        raise KeyError('unknown task: %s' % name)
+    db.session.execute(Job.insert().values(
+        name=name, payload=payload, status='queued', attempts=0,
+        max_attempts=max_attempts, run_at=datetime.utcnow()))
+    pool = current_app.extensions.get('tasks')
+    if pool is not None:
+        pool.start(current_app._get_current_object())
+        db.session.info['task_pool'] = pool
+
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_workers(session):
+    pool = session.info.pop('task_pool', None)
+    if pool is not None:
+        pool.notify()
+
+
+#  Worker loop
+#  ----------------------------------------------------------------
+
+def _runnable(now):
+    return or_(
+        and_(Job.c.status == 'queued', Job.c.run_at <= now),
+        and_(Job.c.status == 'running', Job.c.locked_until < now),
+    )
+
+
+def claim(worker_id, limit=1):
+    # Claimed jobs are committed as 'running' with a lease before they run.
+    now = datetime.utcnow()
+    query = select(Job.c.id).where(_runnable(now)).order_by(Job.c.run_at, Job.c.id).limit(limit)
+    if db.engine.dialect.name == 'postgresql':
+        query = query.with_for_update(skip_locked=True)
+    claimed = []
+    for id in db.session.execute(query).scalars().all():
+        row = db.session.execute(update(Job).where(Job.c.id == id, _runnable(now)).values(
+            status='running', attempts=Job.c.attempts + 1, locked_by=worker_id,
+            locked_until=now + LEASE).returning(
+            Job.c.id, Job.c.name, Job.c.payload, Job.c.attempts, Job.c.max_attempts)).first()
+        if row is not None:
+            claimed.append(row)
+    db.session.commit()
+    return claimed
+
+
+def run(job):
+    try:
+        db.session.execute(delete(Job).where(Job.c.id == job.id))
+        REGISTRY[job.name](**(job.payload or {}))
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        logger.exception('job %s (%s) failed on attempt %d of %d', job.id, job.name,
+                         job.attempts, job.max_attempts)
+        failed = job.attempts >= job.max_attempts or job.name not in REGISTRY
+        db.session.execute(update(Job).where(Job.c.id == job.id).values(
+            status='failed' if failed else 'queued',
+            run_at=datetime.utcnow() + BACKOFF * 2 ** (job.attempts - 1),
+            locked_by=None, locked_until=None,
+            last_error=traceback.format_exc()[-2000:]))
+        db.session.commit()
+        return False
+
+
+def work(worker_id, limit=1):
+    # Runs up to `limit` jobs; returns how many were claimed.
+    jobs = claim(worker_id, limit)
+    for job in jobs:
+        run(job)
+    return len(jobs)
+
+
+def _worker_id(thread):
+    return '%s:%d:%d' % (socket.gethostname(), os.getpid(), thread)
+
+
+class WorkerPool(object):
+    # Threads polling the Job table from inside the app process. Commits
+    # that enqueued jobs wake them early.
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pid = None
+
+    def start(self, app):
+        if self.threads <= 0 or self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            for number in range(self.threads):
+                threading.Thread(target=self._run, args=(app, number), daemon=True,
+                                 name='fyyur-task-%d' % number).start()
+
+    def notify(self):
+        self.wake.set()
+
+    def _run(self, app, number):
+        worker_id = _worker_id(number)
+        with app.app_context():
+            while True:
+                try:
+                    if work(worker_id):
+                        continue
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('worker %s failed', worker_id)
+                self.wake.wait(POLL_SECONDS)
+                self.wake.clear()
+
+
+def init_app(app):
+    app.extensions['tasks'] = WorkerPool(app.config['TASK_WORKERS'])
+
+
+#  CLI
+#  ----------------------------------------------------------------
+
+@click.command('worker')
+@click.option('--threads', default=1, show_default=True)
+@click.option('--once', is_flag=True, help='Exit once no job is runnable.')
+@with_appcontext
+def worker_command(threads, once):
+    # Runs jobs in the foreground; with --once, drains the queue and exits.
+    app = current_app._get_current_object()
+    done = threading.Event()
+
+    def loop(number):
+        worker_id = _worker_id(number)
+        with app.app_context():
+            while not done.is_set():
+                try:
+                    if work(worker_id):
+                        continue
+                except Exception:
+                    # A job's own failure is handled by run(); this is the
+                    # database failing under the loop. Retry after a pause.
+                    db.session.rollback()
+                    logger.exception('worker %s failed', worker_id)
+                    time.sleep(POLL_SECONDS)
+                    continue
+                if once:
+                    return
+                time.sleep(POLL_SECONDS)
+
+    workers = [threading.Thread(target=loop, args=(number,), daemon=True) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    try:
+        for thread in workers:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        done.set()
+    failed = db.session.execute(select(Job.c.id).where(Job.c.status == 'failed')).all()
+    click.echo('worker stopped; %d failed jobs' % len(failed))
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+import bookings  # noqa: E402
+import geo  # noqa: E402
+import search  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///%s' % (tmp_path / 'fyyur.sqlite'),
+        'SQLALCHEMY_ENGINE_OPTIONS': {'pool_pre_ping': True},
+        'SQLALCHEMY_BINDS': {},
+        'CACHE_TYPE': 'null',
+        'FRAGMENT_CACHE_TYPE': 'null',
+        'TASK_WORKERS': 0,
+        'IMAGE_CACHE_DIR': str(tmp_path / 'images'),
+    })
+    with app.app_context():
+        db.create_all()
+        # In-process indexes are module-level; drop what an earlier test's
+        # database left in them.
+        bookings.invalidate()
+        geo.invalidate()
+        search.invalidate()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
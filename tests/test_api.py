@@ -0,0 +1,25 @@
+from models import Venue, db
+import api
+
+
+def names(client, query):
+    return [venue['name'] for venue in client.get('/api/v1/venues?' + query).get_json()['data']]
+
+
+def test_offset_and_limit_are_clamped(app, client):
+    db.session.add_all([Venue(name='Venue %d' % number, genres=['Jazz']) for number in range(3)])
+    db.session.commit()
+    first = names(client, 'limit=1')
+    assert len(first) == 1
+    assert names(client, 'limit=1&offset=-5') == first
+    assert names(client, 'limit=0') == first
+    assert names(client, 'limit=-1&offset=-1') == first
+    assert len(names(client, 'limit=1000')) == 3
+
+
+def test_negative_offset_reaches_the_query_as_zero(app, client, monkeypatch):
+    # SQLite reads a negative OFFSET as 0; Postgres rejects it.
+    calls = []
+    monkeypatch.setattr(api, 'entity_rows', lambda *args, **kwargs: calls.append(kwargs) or [])
+    client.get('/api/v1/venues?offset=-5&limit=-2')
+    assert (calls[0]['offset'], calls[0]['limit']) == (0, 1)
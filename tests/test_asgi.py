@@ -0,0 +1,67 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+
+from models import Venue, db
+
+
+@pytest.fixture
+def asgi(tmp_path, monkeypatch):
+    # asgi.py builds its app from config at import.
+    import config
+    for name, value in [('SQLALCHEMY_DATABASE_URI', 'sqlite:///%s' % (tmp_path / 'asgi.sqlite')),
+                        ('SQLALCHEMY_ENGINE_OPTIONS', {'pool_pre_ping': True}),
+                        ('DEBUG', False), ('TASK_WORKERS', 0),
+                        ('CACHE_TYPE', 'null'), ('FRAGMENT_CACHE_TYPE', 'null')]:
+        monkeypatch.setattr(config, name, value)
+    monkeypatch.delitem(sys.modules, 'asgi', raising=False)
+    module = importlib.import_module('asgi')
+    with module.app.app_context():
+        db.create_all()
+        db.session.add(Venue(name='Park Square', genres=['Jazz']))
+        db.session.commit()
+    yield module
+    asyncio.run(module.engine.dispose())
+    sys.modules.pop('asgi', None)
+
+
+def call(asgi, path, method='GET'):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.application({
+        'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+        'headers': [(b'host', b'localhost')]}, receive, send))
+    headers = dict((name.decode(), value.decode()) for name, value in sent[0]['headers'])
+    return sent[0]['status'], headers, b''.join(message.get('body', b'') for message in sent[1:])
+
+
+def test_async_detail_page(asgi):
+    status, headers, body = call(asgi, '/venues/1')
+    assert status == 200
+    assert b'Park Square' in body
+
+
+def test_head_has_get_headers_but_no_body(asgi):
+    status, headers, body = call(asgi, '/venues/1', method='HEAD')
+    get_status, get_headers, get_body = call(asgi, '/venues/1')
+    assert status == 200
+    assert body == b''
+    assert headers['content-length'] == str(len(get_body))
+
+
+def test_handler_errors_are_500s(asgi, monkeypatch, caplog):
+    async def broken(session, venue_id):
+        raise RuntimeError('broken handler')
+
+    monkeypatch.setitem(asgi.HANDLERS, 'venues.show_venue', broken)
+    status, headers, body = call(asgi, '/venues/1')
+    assert status == 500
+    assert 'broken handler' in caplog.text
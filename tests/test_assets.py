@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import json
+import os
+
+import brotli
+import pytest
+
+import assets
+
+SOURCES = {
+    'css/a.css': '/*! keep me */\n/* drop me */\nbody {\n  color: red;\n}\n',
+    'css/b.css': 'p , a > b { margin : 0; }\n',
+    'js/a.js': '// drop me\nvar a = 1\n\n    var b = 2\n',
+    'js/b.js': 'function f() {\n  return 1\n}\n',
+    'js/head.js': 'var h = 1\n',
+}
+
+
+@pytest.fixture
+def static(app, tmp_path, monkeypatch):
+    folder = tmp_path / 'static'
+    for source, content in SOURCES.items():
+        (folder / source).parent.mkdir(parents=True, exist_ok=True)
+        (folder / source).write_text(content)
+    # The layout links every bundle, so the names match the real ones.
+    monkeypatch.setattr(assets, 'BUNDLES', {'main.css': ['css/a.css', 'css/b.css'],
+                                            'head.js': ['js/head.js'],
+                                            'main.js': ['js/a.js', 'js/b.js']})
+    monkeypatch.setattr(app, 'static_folder', str(folder))
+    return folder
+
+
+def test_minifiers():
+    assert assets.minify_css(SOURCES['css/a.css']) == '/*! keep me */ body{color: red}'
+    assert assets.minify_css(SOURCES['css/b.css']) == 'p,a>b{margin : 0}'
+    # Line breaks survive for automatic semicolon insertion.
+    assert assets.minify_js(SOURCES['js/a.js']) == 'var a = 1\nvar b = 2'
+
+
+def test_build_writes_hashed_bundles_and_manifest(static):
+    manifest, sizes = assets.build(str(static))
+    dist = static / assets.DIST
+    assert json.loads((dist / assets.MANIFEST).read_text()) == manifest
+    assert sorted(manifest) == ['head.js', 'main.css', 'main.js']
+
+    content = (dist / manifest['main.js']).read_bytes()
+    assert content == b'var a = 1\nvar b = 2;\nfunction f() {\nreturn 1\n}'
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    assert manifest['main.js'] == 'main.%s.js' % digest
+    assert manifest['main.css'].startswith('main.') and manifest['main.css'].endswith('.css')
+
+    for name, filename in manifest.items():
+        raw = (dist / filename).read_bytes()
+        assert gzip.decompress((dist / (filename + '.gz')).read_bytes()) == raw
+        assert brotli.decompress((dist / (filename + '.br')).read_bytes()) == raw
+        assert sizes[name]['raw'] == len(raw)
+
+
+def test_changed_source_gets_a_new_name(static):
+    first, _ = assets.build(str(static))
+    (static / 'js/b.js').write_text('function g() {}\n')
+    second, _ = assets.build(str(static))
+    assert second['main.js'] != first['main.js']
+    assert second['main.css'] == first['main.css']
+    # The old bundle stays for pages rendered before the rebuild.
+    assert os.path.isfile(static / assets.DIST / first['main.js'])
+
+
+def test_asset_urls_fall_back_to_sources_until_built(app, static):
+    with app.test_request_context():
+        assert assets.asset_urls('main.js') == ['/static/js/a.js', '/static/js/b.js']
+    manifest, _ = assets.build(str(static))
+    with app.test_request_context():
+        assert assets.asset_urls('main.js') == ['/static/dist/' + manifest['main.js']]
+
+
+@pytest.mark.parametrize('accept, encoding, suffix', [
+    ('br, gzip', 'br', '.br'),
+    ('gzip', 'gzip', '.gz'),
+    ('', None, ''),
+])
+def test_serving_picks_the_precompressed_variant(static, client, accept, encoding, suffix):
+    manifest, _ = assets.build(str(static))
+    filename = manifest['main.css']
+    response = client.get('/static/dist/' + filename, headers={'Accept-Encoding': accept})
+    assert response.status_code == 200
+    assert response.content_encoding == encoding
+    assert response.mimetype == 'text/css'
+    assert response.data == (static / assets.DIST / (filename + suffix)).read_bytes()
+    assert 'immutable' in response.headers['Cache-Control']
+    assert 'max-age=%d' % assets.MAX_AGE in response.headers['Cache-Control']
+    assert 'Accept-Encoding' in response.headers['Vary']
+    response.close()
+
+
+def test_manifest_is_not_served(static, client):
+    assets.build(str(static))
+    assert client.get('/static/dist/' + assets.MANIFEST).status_code == 404
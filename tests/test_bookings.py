@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from models import Artist, Show, Venue, db
+from bookings import IntervalIndex
+import bookings
+
+T = datetime(2030, 1, 1, 20, 0)
+HOUR = timedelta(hours=1)
+
+
+#  IntervalIndex
+#  ----------------------------------------------------------------
+
+def test_overlapping_intervals_conflict():
+    index = IntervalIndex([(T, T + 2 * HOUR)])
+    assert index.overlaps(T + HOUR, T + 3 * HOUR)
+    assert index.overlaps(T - HOUR, T + HOUR)
+
+
+def test_back_to_back_intervals_do_not_conflict():
+    index = IntervalIndex([(T, T + 2 * HOUR)])
+    assert not index.overlaps(T + 2 * HOUR, T + 3 * HOUR)
+    assert not index.overlaps(T - HOUR, T)
+
+
+def test_contained_and_containing_intervals_conflict():
+    index = IntervalIndex([(T, T + 3 * HOUR)])
+    assert index.overlaps(T + HOUR, T + 2 * HOUR)
+    assert index.overlaps(T - HOUR, T + 4 * HOUR)
+
+
+def test_gap_after_a_long_interval_is_still_covered():
+    # The second interval starts later but ends earlier than the first, so
+    # only the running maximum of the ends catches the overlap.
+    index = IntervalIndex([(T, T + 5 * HOUR), (T + HOUR, T + 2 * HOUR)])
+    assert index.overlaps(T + 3 * HOUR, T + 4 * HOUR)
+    assert not index.overlaps(T + 5 * HOUR, T + 6 * HOUR)
+
+
+def test_add_matches_bulk_construction():
+    intervals = [(T + 4 * HOUR, T + 5 * HOUR), (T, T + 3 * HOUR), (T + HOUR, T + 2 * HOUR)]
+    index = IntervalIndex()
+    for start, end in intervals:
+        index.add(start, end)
+    built = IntervalIndex(intervals)
+    assert (index.starts, index.max_ends) == (built.starts, built.max_ends)
+    assert not index.overlaps(T + 3 * HOUR, T + 4 * HOUR)
+
+
+def test_empty_intervals_overlap_nothing():
+    index = IntervalIndex([(T, T)])
+    assert not index.overlaps(T - HOUR, T + HOUR)
+    assert not IntervalIndex([(T, T + HOUR)]).overlaps(T, T)
+
+
+#  Show creation
+#  ----------------------------------------------------------------
+
+def book(venue_id=1, artist_id=1, start=T, duration=120):
+    db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start,
+                        end_time=start + timedelta(minutes=duration)))
+    db.session.commit()
+
+
+def post_show(client, venue_id, artist_id, start, duration=120):
+    return client.post('/shows/create', data={
+        'venue_id': venue_id, 'artist_id': artist_id, 'duration': duration,
+        'start_time': start.strftime('%Y-%m-%d %H:%M:%S')})
+
+
+def seed():
+    db.session.add_all([Venue(name='Park Square'), Venue(name='Blue Note'),
+                        Artist(name='Matt Quevedo'), Artist(name='The Wild Sax Band')])
+    db.session.commit()
+
+
+def test_double_booked_venue_is_rejected_with_409(app, client):
+    seed()
+    book(venue_id=1, artist_id=1)
+    response = post_show(client, 1, 2, T + HOUR)
+    assert response.status_code == 409
+    assert b'the venue is already booked' in response.data
+    assert db.session.query(Show).count() == 1
+
+
+def test_double_booked_artist_is_rejected_with_409(app, client):
+    seed()
+    book(venue_id=1, artist_id=1)
+    response = post_show(client, 2, 1, T + HOUR)
+    assert response.status_code == 409
+    assert b'the artist is already booked' in response.data
+
+
+def test_back_to_back_show_is_listed(app, client):
+    seed()
+    book(venue_id=1, artist_id=1)
+    assert post_show(client, 1, 2, T + 2 * HOUR).status_code == 200
+    assert db.session.query(Show).count() == 2
+    # The index picked up the new booking.
+    assert post_show(client, 1, 1, T + 3 * HOUR).status_code == 409
+
+
+#  Available slots
+#  ----------------------------------------------------------------
+
+def test_slots_in_an_empty_range(app):
+    seed()
+    book(start=T + 24 * HOUR)
+    assert bookings.available_slots(1, T, T + 4 * HOUR) == [(T, T + 4 * HOUR)]
+
+
+def test_slots_in_a_fully_booked_range(app):
+    seed()
+    book(start=T - HOUR, duration=180)
+    book(artist_id=2, start=T + 2 * HOUR, duration=120)
+    assert bookings.available_slots(1, T, T + 4 * HOUR) == []
+
+
+def test_slots_between_shows(app):
+    seed()
+    book(start=T, duration=60)
+    book(artist_id=2, start=T + 3 * HOUR, duration=60)
+    assert bookings.available_slots(1, T, T + 5 * HOUR) == [
+        (T + HOUR, T + 3 * HOUR), (T + 4 * HOUR, T + 5 * HOUR)]
+    assert bookings.available_slots(1, T, T + 5 * HOUR, min_length=timedelta(minutes=90)) == [
+        (T + HOUR, T + 3 * HOUR)]
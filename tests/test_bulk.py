@@ -0,0 +1,94 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from models import Artist, Show, Venue, VenueMatch, db
+import bookings
+import search
+
+T = datetime(2030, 1, 1, 20, 0)
+
+
+def write_jsonl(path, rows):
+    path.write_text(''.join(json.dumps(row) + '\n' for row in rows))
+    return str(path)
+
+
+def show(venue_id, artist_id, start):
+    return {'venue_id': venue_id, 'artist_id': artist_id,
+            'start_time': start.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def test_show_import_rejects_double_bookings(app, tmp_path):
+    db.session.add_all([Venue(name='Park Square'), Venue(name='Blue Note'),
+                        Artist(name='Matt Quevedo'), Artist(name='The Wild Sax Band')])
+    db.session.add(Show(venue_id=1, artist_id=1, start_time=T, end_time=T + timedelta(hours=2)))
+    db.session.commit()
+    source = write_jsonl(tmp_path / 'shows.jsonl', [
+        show(1, 2, T + timedelta(hours=1)),      # venue already booked
+        show(2, 2, T),                           # fine
+        show(2, 1, T + timedelta(hours=1)),      # venue booked by the row above
+        show(1, 2, T + timedelta(hours=2)),      # back to back
+    ])
+    result = app.test_cli_runner().invoke(args=['bulk', 'import', 'shows', source])
+    assert result.exit_code == 0, result.output
+    assert 'imported 2 shows, rejected 2' in result.output
+    assert 'row 1 rejected' in result.output and 'row 3 rejected' in result.output
+    assert db.session.execute(select(func.count()).select_from(Show)).scalar() == 3
+
+
+def test_venue_import_refreshes_search_and_matches(app, tmp_path):
+    db.session.add(Artist(name='Matt Quevedo', genres=['Jazz'], seeking_venue=True))
+    db.session.commit()
+    assert search.search_venues('park', 10)['count'] == 0
+    source = write_jsonl(tmp_path / 'venues.jsonl', [{
+        'name': 'Park Square', 'city': 'San Francisco', 'state': 'CA', 'address': '1 Main St',
+        'phone': '415-000-1234', 'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/park',
+        'image_link': 'https://images.example/park.jpg', 'website': 'https://park.example',
+        'seeking_talent': True}])
+    result = app.test_cli_runner().invoke(args=['bulk', 'import', 'venues', source])
+    assert result.exit_code == 0, result.output
+    assert 'imported 1 venues' in result.output
+    assert search.search_venues('park', 10)['count'] == 1
+    assert db.session.execute(select(VenueMatch.c.venue_id, VenueMatch.c.artist_id)).all() == [(1, 1)]
+
+
+def seed_shows():
+    db.session.add_all([Venue(name='Park Square'), Venue(name='Blue Note'),
+                        Artist(name='Matt Quevedo'), Artist(name='The Wild Sax Band')])
+    db.session.commit()
+
+
+def test_show_import_rejects_unknown_venues_and_artists(app, tmp_path):
+    seed_shows()
+    source = write_jsonl(tmp_path / 'shows.jsonl', [
+        show(9, 1, T), show(1, 9, T), show(1, 1, T)])
+    result = app.test_cli_runner().invoke(args=['bulk', 'import', 'shows', source])
+    assert result.exit_code == 0, result.output
+    assert 'No such venue' in result.output and 'No such artist' in result.output
+    assert 'imported 1 shows, rejected 2' in result.output
+    # The booking indexes are dropped after every batch.
+    assert bookings.venue_bookings.indexes == {}
+
+
+def test_rows_the_database_refuses_are_rejected_one_by_one(app, tmp_path, monkeypatch):
+    # Stands in for Postgres' exclusion constraint: no check before the
+    # insert, and the database refuses the overlapping row.
+    monkeypatch.setattr(bookings, '_enforced_by_database', lambda: True)
+    db.session.execute(text('''
+        CREATE TRIGGER show_overlap BEFORE INSERT ON "Show"
+        WHEN EXISTS (SELECT 1 FROM "Show" WHERE venue_id = NEW.venue_id
+                     AND start_time < NEW.end_time AND end_time > NEW.start_time)
+        BEGIN SELECT RAISE(ABORT, 'overlapping show'); END'''))
+    seed_shows()
+    source = write_jsonl(tmp_path / 'shows.jsonl', [
+        show(1, 1, T), show(1, 2, T + timedelta(hours=1)), show(2, 2, T),
+        show(2, 1, T + timedelta(hours=4))])
+    result = app.test_cli_runner().invoke(
+        args=['bulk', 'import', 'shows', source, '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'row 2 rejected' in result.output and 'overlapping show' in result.output
+    assert 'imported 3 shows, rejected 1' in result.output
+    assert db.session.execute(select(func.count()).select_from(Show)).scalar() == 3
+    assert db.session.execute(select(Venue.upcoming_shows_count).order_by(Venue.id)).scalars().all() == [1, 2]
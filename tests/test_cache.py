@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+
+from models import Artist, Venue, db
+import cache
+from cache import MISSING, LRUCache, RedisCache
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis(object):
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+
+def test_lru_evicts_the_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    assert lru.get('b') is MISSING
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    assert lru.stats.evictions == 1
+
+
+def test_lru_entries_expire():
+    clock = Clock()
+    lru = LRUCache(ttl=10, clock=clock)
+    lru.set('a', 1)
+    lru.set('b', 2, ttl=30)
+    clock.now = 9.9
+    assert lru.get('a') == 1
+    clock.now = 10
+    assert lru.get('a') is MISSING
+    assert lru.get('b') == 2
+    assert lru.stats.as_dict() == {'hits': 2, 'misses': 1, 'evictions': 1}
+
+
+def test_redis_cache_round_trips_values():
+    client = FakeRedis()
+    redis_cache = RedisCache(client)
+    redis_cache.set('venue:1', {'name': 'Park Square'})
+    assert list(client.values) == ['fyyur:venue:1']
+    assert redis_cache.get('venue:1') == {'name': 'Park Square'}
+    redis_cache.delete('venue:1')
+    assert redis_cache.get('venue:1') is MISSING
+
+
+def test_from_config_picks_the_backend():
+    assert isinstance(cache.from_config({'CACHE_TYPE': 'lru'}), LRUCache)
+    assert isinstance(cache.from_config({'CACHE_TYPE': 'null'}), cache.NullCache)
+
+
+def test_get_or_set_does_not_cache_missing_rows():
+    lru = LRUCache()
+    assert cache.get_or_set(lru, 'venue:1', lambda: None) is None
+    assert lru.get('venue:1') is MISSING
+    assert cache.get_or_set(lru, 'venue:1', lambda: {'id': 1}) == {'id': 1}
+    assert cache.get_or_set(lru, 'venue:1', lambda: {'id': 2}) == {'id': 1}
+
+
+def test_writes_invalidate_the_affected_pages(app, client):
+    app.extensions['page_cache'] = page_cache = LRUCache()
+    db.session.add_all([Venue(name='Park Square', genres=['Jazz']),
+                        Artist(name='Matt Quevedo', genres=['Jazz'])])
+    db.session.commit()
+    assert b'Park Square' in client.get('/venues/1').data
+    assert page_cache.get(cache.venue_key(1)) is not MISSING
+    client.get('/artists/1')
+
+    # A new show changes both pages.
+    start = (datetime.utcnow() + timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+    client.post('/shows/create', data={'venue_id': 1, 'artist_id': 1, 'start_time': start})
+    assert page_cache.get(cache.venue_key(1)) is MISSING
+    assert page_cache.get(cache.artist_key(1)) is MISSING
+    assert b'Matt Quevedo' in client.get('/venues/1').data
+    assert b'Park Square' in client.get('/artists/1').data
+
+
+def test_redis_url_makes_redis_the_default(monkeypatch):
+    import importlib
+    import config
+    monkeypatch.delenv('FYYUR_CACHE_TYPE', raising=False)
+    monkeypatch.setenv('FYYUR_CACHE_REDIS_URL', 'redis://cache.internal:6379/2')
+    try:
+        importlib.reload(config)
+        assert (config.CACHE_TYPE, config.CACHE_REDIS_URL) == ('redis', 'redis://cache.internal:6379/2')
+        assert config.FRAGMENT_CACHE_TYPE == 'redis'
+        monkeypatch.delenv('FYYUR_CACHE_REDIS_URL')
+        importlib.reload(config)
+        assert config.CACHE_TYPE == 'lru'
+    finally:
+        monkeypatch.undo()
+        importlib.reload(config)
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import Artist, Show, Venue, db
+import counters
+
+NOW = datetime(2030, 1, 1, 12, 0)
+HOUR = timedelta(hours=1)
+
+
+def seed():
+    db.session.add_all([Venue(name='Park Square'), Artist(name='Matt Quevedo')])
+    db.session.commit()
+
+
+def add_shows(*starts):
+    shows = [dict(venue_id=1, artist_id=1, start_time=start) for start in starts]
+    db.session.add_all([Show(end_time=show['start_time'] + HOUR, **show) for show in shows])
+    counters.shows_added(shows)
+    db.session.commit()
+
+
+def counts():
+    return [tuple(row) for model in (Venue, Artist) for row in db.session.execute(
+        select(model.upcoming_shows_count, model.past_shows_count).where(model.id == 1))]
+
+
+def test_shows_added_without_a_watermark_uses_now(app):
+    seed()
+    now = datetime.utcnow()
+    add_shows(now - 24 * HOUR, now + 24 * HOUR)
+    assert counts() == [(1, 1), (1, 1)]
+
+
+def test_shows_added_against_the_watermark(app):
+    seed()
+    counters.rebuild(NOW)
+    # After the watermark: upcoming until a roll-forward passes it.
+    add_shows(NOW - HOUR, NOW + HOUR, NOW + 2 * HOUR)
+    assert counts() == [(2, 1), (2, 1)]
+    counters.shows_removed([dict(venue_id=1, artist_id=1, start_time=NOW + HOUR)])
+    assert counts() == [(1, 1), (1, 1)]
+
+
+def test_roll_forward_moves_started_shows(app):
+    seed()
+    counters.rebuild(NOW)
+    add_shows(NOW + HOUR, NOW + 2 * HOUR, NOW + 3 * HOUR)
+    assert counters.roll_forward(NOW + 2 * HOUR) == 2
+    assert counts() == [(1, 2), (1, 2)]
+    # Nothing started since; an older time never moves the watermark back.
+    assert counters.roll_forward(NOW + 2 * HOUR) == 0
+    assert counters.roll_forward(NOW) == 0
+    assert counters.watermark() == NOW + 2 * HOUR
+
+
+def test_roll_forward_without_a_watermark_rebuilds(app):
+    seed()
+    db.session.add_all([Show(venue_id=1, artist_id=1, start_time=NOW - HOUR, end_time=NOW),
+                        Show(venue_id=1, artist_id=1, start_time=NOW + HOUR, end_time=NOW + 2 * HOUR)])
+    db.session.commit()
+    assert counters.roll_forward(NOW) is None
+    assert counts() == [(1, 1), (1, 1)]
+    assert counters.watermark() == NOW
+
+
+def test_rebuild_recounts_from_shows(app):
+    seed()
+    counters.rebuild(NOW)
+    add_shows(NOW - 2 * HOUR, NOW + HOUR)
+    db.session.execute(Venue.__table__.update().values(upcoming_shows_count=7, past_shows_count=7))
+    counters.rebuild(NOW + 2 * HOUR)
+    assert counts() == [(0, 2), (0, 2)]
+    assert counters.watermark() == NOW + 2 * HOUR
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+
+from cache import MISSING, LRUCache
+from models import Artist, ArtistMatch, Show, Venue, VenueMatch, db
+import cache
+import counters
+import matchmaking
+import search
+
+
+@pytest.fixture
+def booked(app, client):
+    # Park Square (1) has a past and an upcoming show by Matt Quevedo (1);
+    # Blue Note (2) has one by The Wild Sax Band (2). Every page is cached.
+    app.extensions['page_cache'] = LRUCache()
+    db.session.add_all([
+        Venue(name='Park Square', city='San Francisco', state='CA', genres=['Jazz'],
+              seeking_talent=True),
+        Venue(name='Blue Note', city='New York', state='NY', genres=['Jazz'],
+              seeking_talent=True),
+        Artist(name='Matt Quevedo', city='San Francisco', state='CA', genres=['Jazz'],
+               seeking_venue=True),
+        Artist(name='The Wild Sax Band', city='New York', state='NY', genres=['Jazz'],
+               seeking_venue=True)])
+    now = datetime.utcnow()
+    for venue_id, artist_id, days in [(1, 1, -3), (1, 1, 3), (2, 2, 5)]:
+        start = now + timedelta(days=days)
+        db.session.add(Show(venue_id=venue_id, artist_id=artist_id, start_time=start,
+                            end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    counters.rebuild()
+    matchmaking.rebuild()
+    db.session.commit()
+    for url in ('/venues/1', '/venues/2', '/artists/1', '/artists/2'):
+        assert client.get(url).status_code == 200
+    return app.extensions['page_cache']
+
+
+def count(table, *where):
+    return db.session.execute(select(func.count()).select_from(table).where(*where)).scalar()
+
+
+def show_counts(model, id):
+    return tuple(db.session.execute(select(
+        model.upcoming_shows_count, model.past_shows_count).where(model.id == id)).one())
+
+
+def test_deleting_a_venue(booked, client):
+    assert client.post('/venues/1').status_code == 302
+    assert count(Venue) == 1
+    assert count(Show) == 1
+    assert count(Show, Show.venue_id == 1) == 0
+    assert count(VenueMatch, VenueMatch.c.venue_id == 1) == 0
+    assert count(ArtistMatch, ArtistMatch.c.venue_id == 1) == 0
+    assert show_counts(Artist, 1) == (0, 0)
+    assert show_counts(Artist, 2) == (1, 0)
+    # Its page, and the page of the artist that played it, are dropped.
+    assert booked.get(cache.venue_key(1)) is MISSING
+    assert booked.get(cache.artist_key(1)) is MISSING
+    assert booked.get(cache.venue_key(2)) is not MISSING
+    assert search.search_venues('park', 10)['count'] == 0
+    assert client.get('/venues/1').status_code == 404
+    assert client.post('/venues/1').status_code == 404
+
+
+def test_deleting_an_artist(booked, client):
+    assert client.post('/artists/1').status_code == 302
+    assert count(Artist) == 1
+    assert count(Show, Show.artist_id == 1) == 0
+    assert count(VenueMatch, VenueMatch.c.artist_id == 1) == 0
+    assert count(ArtistMatch, ArtistMatch.c.artist_id == 1) == 0
+    assert show_counts(Venue, 1) == (0, 0)
+    assert show_counts(Venue, 2) == (1, 0)
+    assert booked.get(cache.artist_key(1)) is MISSING
+    assert booked.get(cache.venue_key(1)) is MISSING
+    assert booked.get(cache.artist_key(2)) is not MISSING
+    assert client.get('/artists/1').status_code == 404
+    assert client.post('/artists/1').status_code == 404
+
+
+def test_bulk_delete_by_area(booked, app):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['bulk', 'delete', 'venues', '--state', 'NY', '--dry-run'])
+    assert 'would delete 1 venues' in result.output
+    assert count(Venue) == 2
+    result = runner.invoke(args=['bulk', 'delete', 'venues', '--state', 'NY'])
+    assert 'deleted 1 venues' in result.output
+    assert db.session.execute(select(Venue.name)).scalars().all() == ['Park Square']
+    assert show_counts(Artist, 2) == (0, 0)
+    assert runner.invoke(args=['bulk', 'delete', 'venues']).exit_code != 0
@@ -0,0 +1,101 @@
+from sqlalchemy import event, select
+
+from models import Artist, Venue, db
+
+ARTIST = dict(name='Guns N Petals', genres=['Rock n Roll'], city='San Francisco', state='CA',
+              phone='326-123-5000', website='https://www.gunsnpetalsband.com',
+              image_link='https://images.example/guns.jpg',
+              facebook_link='https://www.facebook.com/GunsNPetals',
+              seeking_venue=True, seeking_description='Looking for shows')
+VENUE = dict(name='The Musical Hop', genres=['Jazz'], address='1015 Folsom Street',
+             city='San Francisco', state='CA', phone='123-123-1234',
+             website='https://www.themusicalhop.com', image_link='https://images.example/hop.jpg',
+             facebook_link='https://www.facebook.com/TheMusicalHop',
+             seeking_talent=True, seeking_description='Looking for local artists')
+
+
+def form(fields, version=None, **changes):
+    data = dict(fields, **changes)
+    for flag in ('seeking_venue', 'seeking_talent'):
+        if flag in data:
+            # The select's option values.
+            data[flag] = str(data[flag])
+    if version is not None:
+        data['version'] = version
+    return data
+
+
+def row(model, id=1):
+    return db.session.execute(select(model).where(model.id == id)).scalar_one()
+
+
+def updates():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE'):
+            statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    return statements
+
+
+def test_unchanged_artist_save_writes_nothing(app, client):
+    db.session.add(Artist(**ARTIST))
+    db.session.commit()
+    statements = updates()
+    response = client.post('/artists/1/edit', data=form(ARTIST, version=1))
+    assert response.status_code == 302
+    assert statements == []
+    db.session.expire_all()
+    artist = row(Artist)
+    assert (artist.seeking_venue, artist.version) == (True, 1)
+
+
+def test_unchanged_venue_save_writes_nothing(app, client):
+    db.session.add(Venue(**VENUE))
+    db.session.commit()
+    statements = updates()
+    assert client.post('/venues/1/edit', data=form(VENUE, version=1)).status_code == 302
+    assert statements == []
+    db.session.expire_all()
+    venue = row(Venue)
+    assert (venue.seeking_talent, venue.version) == (True, 1)
+
+
+def test_only_changed_columns_are_updated(app, client):
+    db.session.add(Artist(**ARTIST))
+    db.session.commit()
+    statements = updates()
+    client.post('/artists/1/edit', data=form(ARTIST, version=1, city='Oakland',
+                                             seeking_venue=False))
+    assert len(statements) == 1
+    assigned = statements[0].split(' SET ')[1].split(' WHERE ')[0]
+    assert sorted(part.split('=')[0].strip() for part in assigned.split(',')) == [
+        'city', 'seeking_venue', 'version']
+    db.session.expire_all()
+    artist = row(Artist)
+    assert (artist.city, artist.seeking_venue, artist.version) == ('Oakland', False, 2)
+
+
+def test_stale_version_is_rejected_with_409(app, client):
+    db.session.add(Venue(**VENUE))
+    db.session.commit()
+    assert client.post('/venues/1/edit', data=form(VENUE, version=1, city='Oakland')).status_code == 302
+    response = client.post('/venues/1/edit', data=form(VENUE, version=1, city='Berkeley'))
+    assert response.status_code == 409
+    assert b'changed by someone else' in response.data
+    db.session.expire_all()
+    venue = row(Venue)
+    assert (venue.city, venue.version) == ('Oakland', 2)
+
+
+def test_edit_page_revalidates_with_304(app, client):
+    db.session.add(Artist(**ARTIST))
+    db.session.commit()
+    first = client.get('/artists/1/edit')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/artists/1/edit', headers={'If-None-Match': etag}).status_code == 304
+    client.post('/artists/1/edit', data=form(ARTIST, version=1, city='Oakland'))
+    # The save moved the version on, so the old copy is stale.
+    assert client.get('/artists/1/edit', headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,35 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from models import Artist, Venue, db
+import facets
+
+
+def test_contains_casts_to_each_column_type(app):
+    venue = str(facets.contains(Venue, ['Jazz']).compile(dialect=postgresql.dialect()))
+    artist = str(facets.contains(Artist, ['Jazz']).compile(dialect=postgresql.dialect()))
+    assert venue.endswith('@> CAST(%(param_1)s::VARCHAR[] AS VARCHAR[])')
+    assert artist.endswith('@> CAST(%(param_1)s::TEXT[] AS TEXT[])')
+
+
+def filtered(model, genres):
+    where = facets.conditions(model, genres)
+    names = sorted(db.session.execute(select(model.name).where(*where)).scalars())
+    return names, facets.genre_facets(model, where)
+
+
+def test_conditions_and_counts_for_both_models(app):
+    db.session.add_all([
+        Venue(name='Jazz Club', genres=['Jazz']),
+        Venue(name='Jazz Bar', genres=['Jazz', 'Blues']),
+        Venue(name='Rock Club', genres=['Rock n Roll']),
+        Artist(name='Sax Band', genres=['Jazz', 'Blues']),
+        Artist(name='Guitar Band', genres=['Rock n Roll', 'Blues']),
+    ])
+    db.session.commit()
+    assert filtered(Venue, ['Blues', 'Jazz']) == (
+        ['Jazz Bar'], [{'genre': 'Blues', 'count': 1}, {'genre': 'Jazz', 'count': 1}])
+    assert filtered(Artist, ['Blues']) == (
+        ['Guitar Band', 'Sax Band'],
+        [{'genre': 'Blues', 'count': 2}, {'genre': 'Jazz', 'count': 1},
+         {'genre': 'Rock n Roll', 'count': 1}])
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+from jinja2 import Environment
+
+from cache import LRUCache
+from fragments import FragmentCacheExtension
+from models import Artist, Show, Venue, db
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def env():
+    env = Environment(extensions=[FragmentCacheExtension])
+    env.fragment_cache = LRUCache(clock=Clock())
+    return env
+
+
+def renders(env, source):
+    calls = []
+    template = env.from_string(source)
+    return lambda **context: template.render(calls=calls, **context), calls
+
+
+def test_second_render_is_a_hit(env):
+    render, calls = renders(env, "{% cache ('tile', id, version) %}"
+                                 "{{ calls.append(id) or name }}{% endcache %}")
+    assert render(id=1, version=1, name='Park Square') == 'Park Square'
+    assert render(id=1, version=1, name='ignored') == 'Park Square'
+    assert calls == [1]
+    assert env.fragment_cache.stats.hits == 1
+    assert 'fragment:tile:1:1' in env.fragment_cache.entries
+    # A bumped version is a new key, so the edit shows straight away.
+    assert render(id=1, version=2, name='Blue Note') == 'Blue Note'
+    assert render(id=2, version=1, name='Hop') == 'Hop'
+    assert calls == [1, 1, 2]
+
+
+def test_ttl_defaults_to_the_cache_and_can_be_overridden(env):
+    clock = env.fragment_cache.clock
+    default, default_calls = renders(env, "{% cache 'a' %}{{ calls.append(1) }}{% endcache %}")
+    short, short_calls = renders(env, "{% cache 'b', 5 %}{{ calls.append(1) }}{% endcache %}")
+    default()
+    short()
+    clock.now = 6
+    default()
+    short()
+    assert (len(default_calls), len(short_calls)) == (1, 2)
+    clock.now = 301
+    default()
+    assert len(default_calls) == 2
+
+
+def test_without_a_cache_every_render_runs_the_body():
+    env = Environment(extensions=[FragmentCacheExtension])
+    render, calls = renders(env, "{% cache 'a' %}{{ calls.append(1) }}{% endcache %}")
+    render()
+    render()
+    assert len(calls) == 2
+
+
+def test_venue_tiles_are_cached_until_an_edit(app, client):
+    cache = app.jinja_env.fragment_cache = LRUCache()
+    db.session.add(Venue(name='Park Square', city='San Francisco', state='CA',
+                         genres=['Jazz']))
+    db.session.commit()
+    assert b'Park Square' in client.get('/venues').data
+    key = 'fragment:venue-tile:1:1'
+    assert key in cache.entries
+    cache.set(key, '<li>from the cache</li>')
+    assert b'from the cache' in client.get('/venues').data
+
+    venue = db.session.get(Venue, 1)
+    venue.name = 'Blue Note'
+    db.session.commit()
+    page = client.get('/venues').data
+    assert b'Blue Note' in page
+    assert b'from the cache' not in page
+
+
+def test_show_tiles_follow_artist_and_venue_edits(app, client):
+    cache = app.jinja_env.fragment_cache = LRUCache()
+    db.session.add_all([Venue(name='Park Square', genres=['Jazz']),
+                        Artist(name='Matt Quevedo', genres=['Jazz'])])
+    start = datetime.utcnow() + timedelta(days=1)
+    db.session.add(Show(venue_id=1, artist_id=1, start_time=start,
+                        end_time=start + timedelta(hours=2)))
+    db.session.commit()
+    client.get('/shows')
+    assert 'fragment:show-tile:1:1:1' in cache.entries
+
+    artist = db.session.get(Artist, 1)
+    artist.name = 'The Wild Sax Band'
+    db.session.commit()
+    assert b'The Wild Sax Band' in client.get('/shows').data
+    assert 'fragment:show-tile:1:2:1' in cache.entries
+
+    venue = db.session.get(Venue, 1)
+    venue.name = 'Blue Note'
+    db.session.commit()
+    assert b'Blue Note' in client.get('/shows').data
+    assert 'fragment:show-tile:1:2:2' in cache.entries
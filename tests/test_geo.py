@@ -0,0 +1,66 @@
+import random
+
+from models import Venue, db
+import geo
+from geo import GridIndex, distance_km
+
+SF = (37.7749, -122.4194)
+
+
+def add_venues(*venues):
+    db.session.add_all([Venue(name=name, latitude=lat, longitude=lon) for name, lat, lon in venues])
+    db.session.commit()
+    geo.invalidate()
+
+
+def nearby(lat, lon, radius_km, limit=50):
+    return [venue['name'] for venue in geo.nearby_venues(lat, lon, radius_km, limit)['data']]
+
+
+def test_distance_km():
+    assert distance_km(*SF, *SF) == 0
+    # San Francisco to Los Angeles.
+    assert 555 < distance_km(*SF, 34.0522, -118.2437) < 565
+
+
+def test_radius_cuts_off_and_sorts_by_distance(app):
+    # Roughly 1, 5 and 15 km north of the origin.
+    add_venues(('Five', SF[0] + 0.045, SF[1]), ('Fifteen', SF[0] + 0.135, SF[1]),
+               ('One', SF[0] + 0.009, SF[1]), ('Nowhere', None, None))
+    assert nearby(*SF, 10) == ['One', 'Five']
+    assert nearby(*SF, 20) == ['One', 'Five', 'Fifteen']
+    assert nearby(*SF, 20, limit=1) == ['One']
+    distances = [venue['distance_km'] for venue in geo.nearby_venues(*SF, 20, 50)['data']]
+    assert distances == sorted(distances)
+    assert 4.9 < distances[1] < 5.1
+
+
+def test_neighbours_across_a_cell_boundary(app):
+    # GRID_DEGREES is 0.25: the origin and the venues sit in other cells.
+    add_venues(('North', 37.2501, -122.0), ('East', 37.1, -121.7499),
+               ('Across the antimeridian', 0.0, -179.99))
+    assert nearby(37.2499, -122.0, 1) == ['North']
+    assert nearby(37.1, -121.7501, 1) == ['East']
+    assert nearby(0.0, 179.99, 3) == ['Across the antimeridian']
+
+
+def test_grid_matches_a_full_scan():
+    rng = random.Random(7)
+    points = [(id, rng.uniform(-80, 80), rng.uniform(-180, 180)) for id in range(2000)]
+    grid = GridIndex(degrees=2.0)
+    grid.stale = False
+    for id, lat, lon in points:
+        grid.cells.setdefault(grid._cell(lat, lon), []).append((id, lat, lon))
+    for lat, lon, radius in [(10, 10, 800), (75, -170, 1500), (-60, 179, 500), (0, 0, 50)]:
+        expected = sorted((distance_km(lat, lon, point_lat, point_lon), id)
+                          for id, point_lat, point_lon in points
+                          if distance_km(lat, lon, point_lat, point_lon) <= radius)
+        assert grid.within(lat, lon, radius) == expected
+
+
+def test_nearby_page_requires_coordinates(app, client):
+    add_venues(('One', SF[0] + 0.009, SF[1]))
+    assert client.get('/venues/nearby').status_code == 400
+    assert client.get('/venues/nearby?lat=95&lon=0').status_code == 400
+    response = client.get('/api/v1/venues/nearby?lat=%s&lon=%s&radius=5' % SF)
+    assert [venue['name'] for venue in response.get_json()['data']] == ['One']
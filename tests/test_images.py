@@ -0,0 +1,93 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.error import URLError
+
+import pytest
+
+from models import Artist, db
+import images
+
+
+class Handler(BaseHTTPRequestHandler):
+    # /image answers with bytes; /to?<url> redirects to <url>.
+    def do_GET(self):
+        if self.path.startswith('/to?'):
+            self.send_response(302)
+            self.send_header('Location', self.path[len('/to?'):])
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'image bytes')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % server.server_port
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def loopback_allowed(monkeypatch):
+    # Treats the test server's address as public.
+    monkeypatch.setattr(images, '_allowed', lambda address: address == '127.0.0.1')
+
+
+def test_refuses_private_addresses(server):
+    with pytest.raises(ValueError):
+        images.http_fetch(server + '/image')
+
+
+def test_refuses_other_schemes():
+    with pytest.raises(ValueError):
+        images.http_fetch('file:///etc/passwd')
+
+
+def test_fetches_public_addresses(server, loopback_allowed):
+    assert images.http_fetch(server + '/image') == b'image bytes'
+
+
+def test_redirects_are_checked_on_every_hop(server, loopback_allowed):
+    assert images.http_fetch(server + '/to?/image') == b'image bytes'
+    # urllib itself already refuses non-http(s) redirects.
+    with pytest.raises((ValueError, URLError)):
+        images.http_fetch(server + '/to?file:///etc/passwd')
+    with pytest.raises(ValueError):
+        images.http_fetch(server + '/to?http://[::1]/image')
+
+
+def test_connects_to_the_checked_address(server, loopback_allowed, monkeypatch):
+    # A name that resolves once; resolving it again to connect would fail.
+    resolve = images.socket.getaddrinfo
+    answers = [resolve('127.0.0.1', None, type=images.socket.SOCK_STREAM)]
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host != 'images.example':
+            return resolve(host, port, *args, **kwargs)
+        if not answers:
+            raise images.socket.gaierror('rebound')
+        return answers.pop()
+
+    monkeypatch.setattr(images.socket, 'getaddrinfo', getaddrinfo)
+    url = server.replace('127.0.0.1', 'images.example') + '/image'
+    assert images.http_fetch(url) == b'image bytes'
+
+
+def test_failed_thumbnail_redirects_and_logs(app, client, monkeypatch, caplog):
+    def fetch(url):
+        raise ValueError('refusing to fetch %r' % url)
+
+    db.session.add(Artist(name='Matt Quevedo', image_link='http://images.example/matt.jpg'))
+    db.session.commit()
+    monkeypatch.setattr(images, 'has_pillow', lambda: True)
+    monkeypatch.setattr(app.extensions['images'], 'fetch', fetch)
+    response = client.get('/img/artist/1/tile')
+    assert response.status_code == 302
+    assert response.location == 'http://images.example/matt.jpg'
+    assert 'refusing to fetch' in caplog.text
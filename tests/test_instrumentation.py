@@ -0,0 +1,10 @@
+from app import create_app
+import instrumentation
+
+
+def test_log_handler_is_attached_once(app):
+    for _ in range(2):
+        create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SQLALCHEMY_ENGINE_OPTIONS': {},
+                    'TASK_WORKERS': 0})
+    assert instrumentation.logger.handlers.count(instrumentation.handler) == 1
+    assert app.logger.handlers.count(instrumentation.handler) == 1
@@ -0,0 +1,81 @@
+from itertools import cycle, islice
+
+import pytest
+from sqlalchemy import select, update
+
+from models import Artist, ArtistMatch, Venue, VenueMatch, db
+import matchmaking
+
+TOP_K = 3
+GENRES = [['Jazz'], ['Jazz', 'Blues'], ['Blues'], ['Folk', 'Jazz'], ['Folk']]
+PLACES = [('San Francisco', 'CA'), ('Oakland', 'CA'), ('New York', 'NY')]
+
+
+@pytest.fixture
+def matched(app):
+    # Few genres and places, so many pairs tie and every list is full.
+    places = cycle(PLACES)
+    genres = cycle(GENRES)
+    db.session.add_all([Venue(name='Venue %d' % n, genres=next(genres), city=city, state=state,
+                              seeking_talent=n % 4 != 0)
+                        for n, (city, state) in enumerate(islice(places, 10))])
+    db.session.add_all([Artist(name='Artist %d' % n, genres=next(genres), city=city, state=state,
+                               seeking_venue=n % 4 != 1)
+                        for n, (city, state) in enumerate(islice(places, 10))])
+    db.session.commit()
+    matchmaking.rebuild(TOP_K)
+    db.session.commit()
+
+
+def stored():
+    return dict((table.name, sorted(
+        (row[0], row[1], round(row[2], 6)) for row in db.session.execute(
+            select(*table.c[:2], table.c.score)))) for table in (VenueMatch, ArtistMatch))
+
+
+def rebuilt():
+    # The lists a fresh rebuild stores, leaving the incremental ones in place.
+    db.session.commit()
+    incremental = stored()
+    matchmaking.rebuild(TOP_K)
+    result = stored()
+    db.session.rollback()
+    assert stored() == incremental
+    return result
+
+
+def test_new_venue_matches_a_rebuild(matched):
+    # Same genres and place as Venue 1: ties with it everywhere.
+    venue = Venue(name='Newcomer', genres=['Jazz', 'Blues'], city='Oakland', state='CA',
+                  seeking_talent=True)
+    db.session.add(venue)
+    db.session.flush()
+    matchmaking.entity_changed(matchmaking.VENUES, venue.id, TOP_K)
+    assert stored() == rebuilt()
+
+
+def test_new_artist_matches_a_rebuild(matched):
+    artist = Artist(name='Newcomer', genres=['Jazz'], city='San Francisco', state='CA',
+                    seeking_venue=True)
+    db.session.add(artist)
+    db.session.flush()
+    matchmaking.entity_changed(matchmaking.ARTISTS, artist.id, TOP_K)
+    assert stored() == rebuilt()
+
+
+@pytest.mark.parametrize('side, model, values', [
+    (matchmaking.VENUES, Venue, {'genres': ['Jazz', 'Blues', 'Folk']}),
+    (matchmaking.VENUES, Venue, {'city': 'New York', 'state': 'NY'}),
+    (matchmaking.VENUES, Venue, {'seeking_talent': False}),
+    (matchmaking.VENUES, Venue, {'genres': ['Classical']}),
+    (matchmaking.ARTISTS, Artist, {'genres': ['Folk', 'Jazz'], 'seeking_venue': True}),
+    (matchmaking.ARTISTS, Artist, {'genres': ['Blues'], 'city': 'Oakland'}),
+    (matchmaking.ARTISTS, Artist, {'seeking_venue': False}),
+])
+def test_edit_matches_a_rebuild(matched, side, model, values):
+    # Edits that lower a score drop the entity from lists whose next-best
+    # entry was never stored; those lists are recomputed.
+    for id in (1, 2, 3):
+        db.session.execute(update(model).where(model.id == id).values(**values))
+        matchmaking.entity_changed(side, id, TOP_K)
+        assert stored() == rebuilt()
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+
+from models import Artist, Show, Venue, db
+
+
+def test_past_page_below_one_is_the_first_page(app, client):
+    app.config['PAST_SHOWS_PER_PAGE'] = 1
+    db.session.add_all([Venue(name='Park Square', genres=['Jazz']),
+                        Artist(name='Matt Quevedo', genres=['Jazz'])])
+    now = datetime.utcnow()
+    db.session.add_all([Show(venue_id=1, artist_id=1, start_time=now - timedelta(days=days),
+                             end_time=now - timedelta(days=days) + timedelta(hours=2))
+                        for days in (1, 2, 3)])
+    db.session.commit()
+    for url in ('/venues/1', '/artists/1'):
+        for past_page in ('0', '-3'):
+            page = client.get(url + '?past_page=' + past_page).data
+            assert b'?past_page=2' in page
+            assert b'Newer' not in page
@@ -0,0 +1,65 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import Artist, Show, Venue, db
+from queries import encode_show_cursor, upcoming_shows_page
+
+NOW = datetime(2030, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def shows(app):
+    # Seven shows, five of them starting at the same time.
+    db.session.add_all([Venue(name='Park Square'), Artist(name='Matt Quevedo')])
+    starts = [NOW + timedelta(hours=2)] * 5 + [NOW + timedelta(hours=1), NOW + timedelta(hours=3)]
+    db.session.add_all([Show(venue_id=1, artist_id=1, start_time=start,
+                             end_time=start + timedelta(hours=1)) for start in starts])
+    # Already started; never listed.
+    db.session.add(Show(venue_id=1, artist_id=1, start_time=NOW - timedelta(hours=1),
+                        end_time=NOW))
+    db.session.commit()
+    return [6, 1, 2, 3, 4, 5, 7]
+
+
+def test_pages_cover_equal_start_times_exactly_once(shows):
+    seen = []
+    after = None
+    for page in range(10):
+        data, after = upcoming_shows_page(2, after=after, now=NOW)
+        seen.extend(show['id'] for show in data)
+        if after is None:
+            break
+    assert seen == shows
+    assert page == 3
+
+
+def test_last_full_page_has_no_cursor(shows):
+    data, after = upcoming_shows_page(7, now=NOW)
+    assert [show['id'] for show in data] == shows
+    assert after is None
+
+
+@pytest.mark.parametrize('cursor', ['', 'not-a-cursor', '!!!', 'YWJj',
+                                    encode_show_cursor(NOW, 1)[:-3]])
+def test_malformed_cursor_starts_at_page_one(shows, cursor):
+    assert upcoming_shows_page(3, after=cursor, now=NOW) == upcoming_shows_page(3, now=NOW)
+
+
+def later_link_limit(client, query):
+    page = client.get('/shows?' + query).data.decode()
+    return int(re.search(r'limit=(\d+)', page).group(1))
+
+
+def test_limit_is_bounded(app, client):
+    app.config['SHOWS_MAX_PER_PAGE'] = 3
+    db.session.add_all([Venue(name='Park Square'), Artist(name='Matt Quevedo')])
+    start = datetime.utcnow() + timedelta(days=1)
+    db.session.add_all([Show(venue_id=1, artist_id=1, start_time=start + timedelta(hours=n),
+                             end_time=start + timedelta(hours=n, minutes=30)) for n in range(5)])
+    db.session.commit()
+    assert later_link_limit(client, 'limit=0') == 1
+    assert later_link_limit(client, 'limit=-4') == 1
+    assert later_link_limit(client, 'limit=2') == 2
+    assert later_link_limit(client, 'limit=1000') == 3
@@ -0,0 +1,93 @@
+from models import Artist, Venue, db
+import search
+
+
+def add_venues(*venues):
+    db.session.add_all([Venue(**fields) for fields in venues])
+    db.session.commit()
+    search.invalidate()
+
+
+def names(hits):
+    return [name for id, name in hits]
+
+
+def test_genres_round_trip_on_sqlite(app):
+    db.session.add(Artist(name='Guns N Petals', genres=['Rock n Roll', 'Jazz']))
+    db.session.commit()
+    assert db.session.query(Artist.genres).scalar() == ['Rock n Roll', 'Jazz']
+
+
+def test_name_outranks_city_outranks_genre(app):
+    add_venues(dict(name='Park Square', city='Oakland', genres=['Jazz']),
+               dict(name='The Dueling Pianos', city='Parksville', genres=['Jazz']),
+               dict(name='Blue Note', city='New York', genres=['Park Rock']))
+    hits, counts = search.venue_index.search('park', 10)
+    assert names(hits) == ['Park Square', 'The Dueling Pianos', 'Blue Note']
+
+
+def test_ties_are_ordered_by_name(app):
+    add_venues(dict(name='Zed Hall', city='Oakland'),
+               dict(name='Alpha Hall', city='Oakland'))
+    hits, counts = search.venue_index.search('hall', 10)
+    assert names(hits) == ['Alpha Hall', 'Zed Hall']
+
+
+def test_tokens_match_as_prefixes(app):
+    add_venues(dict(name='The Musical Hop', city='San Francisco'),
+               dict(name='Musicland', city='Oakland'),
+               dict(name='Park Square', city='San Jose'))
+    assert names(search.venue_index.search('mus', 10)[0]) == ['Musicland', 'The Musical Hop']
+    # Every token has to match.
+    assert names(search.venue_index.search('mus fran', 10)[0]) == ['The Musical Hop']
+    assert names(search.venue_index.search('mus jose', 10)[0]) == []
+
+
+def test_name_substrings_match(app):
+    add_venues(dict(name='The Musical Hop'), dict(name='Park Square'))
+    assert names(search.venue_index.search('sical', 10)[0]) == ['The Musical Hop']
+
+
+def test_genre_filter_and_facets(app):
+    add_venues(dict(name='Jazz Club', genres=['Jazz']),
+               dict(name='Jazz Bar', genres=['Jazz', 'Blues']),
+               dict(name='Rock Club', genres=['Rock n Roll']))
+    hits, counts = search.venue_index.search('', 10, genres=['Jazz'])
+    assert names(hits) == ['Jazz Bar', 'Jazz Club']
+    assert counts == [{'genre': 'Jazz', 'count': 2}, {'genre': 'Blues', 'count': 1}]
+
+
+def test_writes_are_seen_after_invalidate(app):
+    add_venues(dict(name='Park Square'))
+    assert names(search.venue_index.search('park', 10)[0]) == ['Park Square']
+    add_venues(dict(name='Parkside'))
+    assert names(search.venue_index.search('park', 10)[0]) == ['Park Square', 'Parkside']
+
+
+def test_search_venues_reports_upcoming_counts(app):
+    add_venues(dict(name='Park Square', upcoming_shows_count=3))
+    result = search.search_venues('park', 10)
+    assert result['count'] == 1
+    assert result['data'][0]['num_upcoming_shows'] == 3
+
+
+def test_postgres_name_match_escapes_wildcards(app):
+    from sqlalchemy.dialects import postgresql
+    plan = search.postgres_search_plan(Venue, '100%_off', 10)
+    compiled = plan.statements['hits'].compile(dialect=postgresql.dialect())
+    assert '100/%/_off' in compiled.params.values()
+    assert "ESCAPE '/'" in str(compiled)
+
+
+def test_rebuild_swaps_in_a_new_snapshot(app):
+    add_venues(dict(name='Park Square', genres=['Jazz']))
+    search.venue_index.search('park', 10)
+    before = search.venue_index.snapshot
+    db.session.execute(Venue.__table__.delete())
+    add_venues(dict(name='Blue Note', genres=['Blues']))
+    assert names(search.venue_index.search('', 10)[0]) == ['Blue Note']
+    # A search still holding the old snapshot sees it whole.
+    assert before is not search.venue_index.snapshot
+    assert before.names == {1: 'Park Square'}
+    assert list(before.prefix_scores('park')) == [1]
+    assert before.genres[1] == frozenset(['Jazz'])
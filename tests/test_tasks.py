@@ -0,0 +1,65 @@
+from sqlalchemy import select
+
+from models import Job, db
+import tasks
+
+done = []
+
+
+@tasks.task('tests.fail')
+def fail(message):
+    raise RuntimeError(message)
+
+
+@tasks.task('tests.record')
+def record(value):
+    done.append(value)
+
+
+def jobs():
+    return db.session.execute(select(Job.c.name, Job.c.status, Job.c.attempts)).all()
+
+
+def test_job_runs_once_and_is_deleted(app):
+    tasks.enqueue('tests.record', value=7)
+    db.session.commit()
+    assert tasks.work('test') == 1
+    assert done[-1:] == [7]
+    assert jobs() == []
+    assert tasks.work('test') == 0
+
+
+def test_failing_job_is_logged_retried_then_failed(app, caplog):
+    tasks.enqueue('tests.fail', max_attempts=2, message='boom')
+    db.session.commit()
+    assert tasks.work('test') == 1
+    assert 'job 1 (tests.fail) failed on attempt 1 of 2' in caplog.text
+    assert 'RuntimeError: boom' in caplog.text
+    assert jobs() == [('tests.fail', 'queued', 1)]
+    # Not runnable again until its backoff has passed.
+    assert tasks.work('test') == 0
+    db.session.execute(Job.update().values(run_at=Job.c.created_at))
+    db.session.commit()
+    assert tasks.work('test') == 1
+    assert jobs() == [('tests.fail', 'failed', 2)]
+
+
+def test_cli_worker_survives_errors(app, monkeypatch, caplog):
+    claim = tasks.claim
+    calls = []
+
+    def flaky_claim(worker_id, limit=1):
+        calls.append(worker_id)
+        if len(calls) == 1:
+            raise RuntimeError('database went away')
+        return claim(worker_id, limit)
+
+    monkeypatch.setattr(tasks, 'claim', flaky_claim)
+    monkeypatch.setattr(tasks, 'POLL_SECONDS', 0.01)
+    tasks.enqueue('tests.record', value=11)
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=['worker', '--once'])
+    assert result.exit_code == 0, result.output
+    assert 'database went away' in caplog.text
+    assert done[-1:] == [11]
+    assert jobs() == []
@@ -0,0 +1,224 @@
+#----------------------------------------------------------------------------#
+# Venue views.
+#----------------------------------------------------------------------------#
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from sqlalchemy import select, update
+
+from models import Venue, Show, ArtistMatch, db
+from queries import venue_areas, venue_detail
+import deletes
+import edits
+import facets
+import geo
+import matchmaking
+import search
+import cache
+import tasks
+
+blueprint = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues')
+def venues():
+    # done - replace with real venues data.
+    data = []
+    genre_facets = []
+    try:
+        genres = facets.parse_genres(request.args.getlist('genre'))
+    except ValueError:
+        abort(400)
+    try:
+        conditions = facets.conditions(Venue, genres)
+        data = venue_areas(conditions)
+        genre_facets = facets.genre_facets(Venue, conditions)
+    except Exception as error:
+        print(error)
+        pass
+    return render_template('pages/venues.html', areas=data, genres=genres, facets=genre_facets)
+
+
+@blueprint.route('/venues/search', methods=['POST'])
+def search_venues():
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    search_term = request.form.get("search_term", "")
+    try:
+        genres = facets.parse_genres(request.form.getlist('genre'))
+    except ValueError:
+        abort(400)
+    response = search.search_venues(search_term, current_app.config['SEARCH_RESULT_LIMIT'], genres)
+
+    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''),
+                           genres=genres)
+
+
+@blueprint.route('/venues/nearby')
+def nearby_venues():
+    # /venues/nearby?lat=37.77&lon=-122.42&radius=5 (km)
+    try:
+        lat, lon, radius = geo.nearby_args(request.args, current_app.config['NEARBY_RADIUS_KM'],
+                                           current_app.config['NEARBY_MAX_RADIUS_KM'])
+    except ValueError:
+        abort(400)
+    response = geo.nearby_venues(lat, lon, radius, current_app.config['SEARCH_RESULT_LIMIT'])
+    return render_template('pages/search_venues.html', results=response,
+                           search_term='within %g km of %g, %g' % (radius, lat, lon))
+
+
+@blueprint.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    past_page = max(1, request.args.get('past_page', 1, type=int))
+
+    def load():
+        return venue_detail(venue_id, past_limit=current_app.config.get('PAST_SHOWS_PER_PAGE'),
+                            past_page=past_page)
+
+    # Only the default page is cached; older past-show pages are rare.
+    if past_page == 1:
+        data = cache.get_or_set(cache.page_cache(), cache.venue_key(venue_id), load)
+    else:
+        data = load()
+    if data is None:
+        abort(404)
+
+    return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # Done insert form data as a new Venue record in the db, instead
+    # Done modify data to be the data object returned from db insertion
+    from forms import VenueForm
+    form = VenueForm()
+
+    name = form.name.data
+    genres = form.genres.data
+    phone = form.phone.data
+    address = form.address.data
+    city = form.city.data
+    state = form.state.data
+    website = form.website.data
+    image_url = form.image_link.data
+    facebook_url = form.facebook_link.data
+    seeking_talent = form.seeking_talent.data
+    seeking_description = form.seeking_description.data
+
+    new_venue = Venue(name=name, genres=genres, city=city, state=state, address=address, phone=phone, website=website,
+                      image_link=image_url, facebook_link=facebook_url, seeking_talent=seeking_talent, seeking_description=seeking_description)
+
+    try:
+        db.session.add(new_venue)
+        db.session.flush()
+        tasks.enqueue('matches.venue_changed', venue_id=new_venue.id)
+        db.session.commit()
+        search.invalidate()
+        geo.invalidate()
+        cache.invalidate_pages(venue_ids=[new_venue.id])
+        # on successful db insert, flash success
+        flash('Venue ' + name + ' was successfully listed!')
+    # Done on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    except Exception as error:
+        db.session.rollback()
+        flash('An error occurred. Venue ' + name + ' could not be listed.')
+        db.session.flush()
+        print(error)
+    return render_template('pages/home.html')
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    edits.read_primary()
+    response = edits.not_modified(Venue, venue_id)
+    if response is not None:
+        return response
+    venue = edits.load(Venue, venue_id, edits.VENUE_FIELDS)
+    if venue is None:
+        abort(404)
+    from forms import VenueForm
+    form = VenueForm(formdata=None)
+
+    for field in edits.VENUE_FIELDS:
+        getattr(form, field).data = getattr(venue, field)
+    return edits.edit_page(render_template('forms/edit_venue.html', form=form, venue=venue,
+                                           version=venue.version), Venue, venue_id, venue.version)
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+
+    try:
+        changes = edits.save(Venue, venue_id, edits.submitted(form, edits.VENUE_FIELDS),
+                             edits.expected_version())
+        if 'city' in changes or 'state' in changes:
+            # The coordinates came from the old city; `flask geo import`
+            # fills them in again.
+            db.session.execute(update(Venue).where(Venue.id == venue_id).values(
+                latitude=None, longitude=None).execution_options(synchronize_session=False))
+        if matchmaking.SCORED_COLUMNS.intersection(changes):
+            tasks.enqueue('matches.venue_changed', venue_id=venue_id)
+        db.session.commit()
+    except edits.StaleEdit as stale:
+        db.session.rollback()
+        if stale.current is None:
+            abort(404)
+        flash('Venue ' + form.name.data + ' was changed by someone else while you were editing. '
+              'Check your changes and save again.')
+        return edits.edit_page(render_template(
+            'forms/edit_venue.html', form=form, venue={'id': venue_id, 'name': form.name.data},
+            version=stale.current), Venue, venue_id, stale.current, 409)
+
+    if changes:
+        search.invalidate()
+        geo.invalidate()
+        artist_ids = []
+        if 'name' in changes or 'image_link' in changes:
+            # Artist pages show the venue's name and image on show and
+            # recommendation tiles.
+            artist_ids = db.session.execute(select(Show.artist_id).where(
+                Show.venue_id == venue_id).union(select(ArtistMatch.c.artist_id).where(
+                    ArtistMatch.c.venue_id == venue_id))).scalars().all()
+        cache.invalidate_pages(venue_ids=[venue_id], artist_ids=artist_ids)
+
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))
+
+
+@blueprint.route('/venues/<int:venue_id>', methods=['POST'])
+def delete_venue(venue_id):
+    # DONE: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    # The venue's shows go with it (ON DELETE CASCADE); see deletes.py.
+    try:
+        deleted = deletes.delete_venues(Venue.id == venue_id)
+        db.session.commit()
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    except Exception as error:
+        db.session.rollback()
+        print(error)
+        flash('An error occurred. Venue could not be removed.')
+        return redirect(url_for('venues.show_venue', venue_id=venue_id))
+    if not deleted:
+        abort(404)
+    flash('Venue is removed.')
+    return redirect(url_for('index'))
@@ -0,0 +1,12 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point for pre-forking servers.
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# The app is created and warmed up once in the master process; workers fork
+# with the modules and compiled templates already in memory.
+#----------------------------------------------------------------------------#
+from app import create_app, warm_up
+
+app = create_app()
+warm_up(app)